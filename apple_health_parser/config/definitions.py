@@ -44,6 +44,24 @@ class AllowedImageFormats(StrEnum):
     PDF = "pdf"
 
 
+class Builders(StrEnum):
+    MODELS = "models"
+    COLUMNAR = "columnar"
+
+
+class Engines(StrEnum):
+    LXML = "lxml"
+    FAST = "fast"
+
+
+class ExportFormats(StrEnum):
+    CSV = "csv"
+    PARQUET = "parquet"
+    FEATHER = "feather"
+    ARROW = "arrow"
+    SQLITE = "sqlite"
+
+
 class Operations(StrEnum):
     COUNT = "count"
     MAX = "max"
@@ -78,6 +96,12 @@ class OverviewSubtypes(Enum):
     ]
 
 
+class Validations(StrEnum):
+    FULL = "full"
+    BATCH = "batch"
+    NONE = "none"
+
+
 @dataclass
 class PlotSettings:
     """
@@ -1,13 +1,21 @@
 from apple_health_parser.config.definitions import (
     AllowedImageFormats,
+    Builders,
+    Engines,
+    ExportFormats,
     Operations,
     OverviewSubtypes,
     PlotType,
+    Validations,
     get_flag_metadata,
 )
 
 FLAG_METADATA = get_flag_metadata()
 ALLOWED_IMAGE_FORMATS = [fmt.value for fmt in AllowedImageFormats]
+BUILDERS = [builder.value for builder in Builders]
+ENGINES = [engine.value for engine in Engines]
+EXPORT_FORMATS = [fmt.value for fmt in ExportFormats]
 OPERATIONS = [op.value for op in Operations]
 PLOT_TYPES = [ptype.value for ptype in PlotType]
 OVERVIEW_TYPES = [overview.name.lower() for overview in OverviewSubtypes]
+VALIDATIONS = [validation.value for validation in Validations]
@@ -1,4 +1,12 @@
-from apple_health_parser.consts import ALLOWED_IMAGE_FORMATS, OPERATIONS, OVERVIEW_TYPES
+from apple_health_parser.consts import (
+    ALLOWED_IMAGE_FORMATS,
+    BUILDERS,
+    ENGINES,
+    EXPORT_FORMATS,
+    OPERATIONS,
+    OVERVIEW_TYPES,
+    VALIDATIONS,
+)
 
 
 class MissingFlag(Exception):
@@ -10,6 +18,51 @@ class MissingFlag(Exception):
         super().__init__(f"Flag '{flag}' is missing in the data.")
 
 
+class DiscardedFlag(Exception):
+    """
+    Exception to raise when the records of a flag were discarded at ingest.
+    """
+
+    def __init__(self, flag: str) -> None:
+        super().__init__(
+            f"Records with flag '{flag}' were discarded at ingest. "
+            "Include the flag with `Parser(flags=[...])` to parse them."
+        )
+
+
+class MissingDependency(Exception):
+    """
+    Exception to raise when an optional dependency is not installed.
+    """
+
+    def __init__(self, package: str, feature: str, extra: str) -> None:
+        super().__init__(
+            f"Package '{package}' is required for {feature}. "
+            f"Install it with `pip install apple-health-parser[{extra}]`."
+        )
+
+
+class MissingExportFile(Exception):
+    """
+    Exception to raise when the export.xml file is missing from the zip file.
+    """
+
+    def __init__(self, zip_file: str) -> None:
+        super().__init__(f"No export.xml file found in {zip_file}.")
+
+
+class MissingPreviousExport(Exception):
+    """
+    Exception to raise when the previous export of an incremental ingest is not cached.
+    """
+
+    def __init__(self, key: str) -> None:
+        super().__init__(
+            f"No previous export '{key}' found in the cache. "
+            "Parse the previous export with `Parser(cache=...)` first."
+        )
+
+
 class MissingRecords(Exception):
     """
     Exception to raise when records are missing.
@@ -28,6 +81,49 @@ class MissingYear(Exception):
         super().__init__(f"No record for the year {year}. Available years: {years}.")
 
 
+class InvalidBuilder(Exception):
+    """
+    Exception to raise when the record builder is invalid.
+    """
+
+    def __init__(self, builder: str) -> None:
+        super().__init__(
+            f"Builder '{builder}' is invalid. Allowed builders: {BUILDERS}."
+        )
+
+
+class InvalidDatabase(Exception):
+    """
+    Exception to raise when the database holds the records of another export.
+    """
+
+    def __init__(self, path: str, key: str) -> None:
+        super().__init__(
+            f"Database '{path}' holds another export than '{key}'. "
+            "Record the flags of the export first (see `RecordDatabase.set_flags`)."
+        )
+
+
+class InvalidEngine(Exception):
+    """
+    Exception to raise when the parsing engine is invalid.
+    """
+
+    def __init__(self, engine: str) -> None:
+        super().__init__(f"Engine '{engine}' is invalid. Allowed engines: {ENGINES}.")
+
+
+class InvalidExportFormat(Exception):
+    """
+    Exception to raise when the export format is invalid.
+    """
+
+    def __init__(self, format: str) -> None:
+        super().__init__(
+            f"Export format '{format}' is invalid. Allowed formats: {EXPORT_FORMATS}."
+        )
+
+
 class InvalidFileFormat(Exception):
     """
     Exception to raise when the file type is incorrect.
@@ -101,3 +197,14 @@ class InvalidSource(Exception):
         super().__init__(
             f"No records found for '{source}'. Available sources: {sources}."
         )
+
+
+class InvalidValidation(Exception):
+    """
+    Exception to raise when the validation mode is invalid.
+    """
+
+    def __init__(self, validation: str) -> None:
+        super().__init__(
+            f"Validation '{validation}' is invalid. Allowed validations: {VALIDATIONS}."
+        )
@@ -1,6 +1,7 @@
 from abc import ABC, abstractmethod
 from datetime import date
 from pathlib import Path
+from typing import Self
 
 from plotly.graph_objs import Figure
 
@@ -8,6 +9,7 @@ from apple_health_parser.config.definitions import AllowedImageFormats, PlotSett
 from apple_health_parser.consts import Operations, PlotType
 from apple_health_parser.exceptions import InvalidImageFormat
 from apple_health_parser.models.parsed import ParsedData
+from apple_health_parser.utils.parser import Parser
 from apple_health_parser.utils.preprocessor import Preprocessor
 
 
@@ -52,6 +54,42 @@ class PlotInterface(ABC):
         self.ptype: PlotType = self._get_plot_type()
         self.psets: PlotSettings = self._get_plot_settings()
 
+    @classmethod
+    def from_parser(
+        cls,
+        parser: Parser,
+        flag: str,
+        year: int = date.today().year,
+        source: str | None = None,
+        operation: str | None = None,
+        heatmap: bool = False,
+        title: bool = False,
+    ) -> Self:
+        """
+        Initialize the Plot object from a parser, only building the records of the year
+        (and of the source, see `Preprocessor.get_year_data`).
+
+        Args:
+            parser (Parser): Parser of the export
+            flag (str): Flag of the records
+            year (int): Year, defaults to date.today().year
+            source (str | None, optional): Source, defaults to None
+            operation (str | None, optional): Operation, defaults to None
+            heatmap (bool): Flag to plot a heatmap, defaults to False
+            title (bool): Flag to include the plot title, defaults to False
+
+        Returns:
+            Self: Plot object
+        """
+        return cls(
+            data=Preprocessor.get_year_data(parser, flag, year, source),
+            year=year,
+            source=source,
+            operation=operation,
+            heatmap=heatmap,
+            title=title,
+        )
+
     def _get_plot_settings(self) -> PlotSettings:
         """
         Get the plot settings.
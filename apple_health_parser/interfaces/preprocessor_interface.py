@@ -1,4 +1,6 @@
 from abc import ABC, abstractmethod
+from datetime import date
+from typing import Self
 
 import pandas as pd
 
@@ -12,6 +14,7 @@ from apple_health_parser.exceptions import (
     MissingYear,
 )
 from apple_health_parser.models.parsed import ParsedData
+from apple_health_parser.utils.parser import Parser
 
 
 class PreprocessorInterface(ABC):
@@ -43,6 +46,79 @@ class PreprocessorInterface(ABC):
         self.flag = data.flag
         self._validate()
 
+    @staticmethod
+    def get_year_data(
+        parser: Parser, flag: str, year: int, source: str | None = None
+    ) -> ParsedData:
+        """
+        Get the parsed data of a flag for a year (and a source).
+
+        The year and the source are validated with the manifest of the flag (see
+        `Parser.get_flag_manifest`), and passed down to the parser, so that only the
+        records of the year (and of the source) are built.
+
+        Args:
+            parser (Parser): Parser of the export
+            flag (str): Flag of the records
+            year (int): Year of the records
+            source (str | None, optional): Source of the records, defaults to None
+
+        Raises:
+            MissingYear: Missing year in the records
+            InvalidSource: Invalid source name
+
+        Returns:
+            ParsedData: Parsed data of the year (and of the source)
+        """
+        manifest = parser.get_flag_manifest(flag)
+        if (
+            flag != "HKCategoryTypeIdentifierSleepAnalysis"
+            and year not in manifest.years
+        ):
+            raise MissingYear(year, manifest.years)
+        if source and source not in manifest.sources:
+            raise InvalidSource(source, manifest.sources)
+
+        return parser.get_flag_records(
+            flag,
+            start=date(year, 1, 1),
+            end=date(year + 1, 1, 1),
+            sources=[source] if source else None,
+        )
+
+    @classmethod
+    def from_parser(
+        cls,
+        parser: Parser,
+        flag: str,
+        year: int,
+        source: str | None = None,
+        operation: str | None = None,
+        heatmap: bool = False,
+    ) -> Self:
+        """
+        Initialize the Preprocessor object from a parser, only building the records of
+        the year (and of the source, see `get_year_data`).
+
+        Args:
+            parser (Parser): Parser of the export
+            flag (str): Flag of the records
+            year (int): Year
+            source (str | None, optional): Source, defaults to None
+            operation (str | None, optional): Operation, defaults to None
+            heatmap (bool, optional): Flag to plot a heatmap, defaults to False
+
+        Returns:
+            Self: Preprocessor object
+        """
+        return cls(
+            data=cls.get_year_data(parser, flag, year, source),
+            year=year,
+            source=source,
+            operation=operation,
+            heatmap=heatmap,
+        )
+
     @property
     def meta(self) -> Metadata:
         """
@@ -70,7 +146,9 @@ class PreprocessorInterface(ABC):
             InvalidHeatmapOperation: Invalid operation for heatmap
             InvalidSource: Invalid source name
         """
-        years = self.data.records.start_date.dt.year.unique().tolist()
+        # Years and sources are looked up in the manifest of the records (built once)
+        manifest = self.data.manifest
+        years = manifest.years
 
         if (
             self.flag != "HKCategoryTypeIdentifierSleepAnalysis"
@@ -85,9 +163,8 @@ class PreprocessorInterface(ABC):
             if self.hmap:
                 raise InvalidHeatmapOperation
 
-        sources = self.data.records.source_name.unique()
-        if self.src and self.src not in sources:
-            raise InvalidSource(self.src, sources)
+        if self.src and self.src not in manifest.sources:
+            raise InvalidSource(self.src, manifest.sources)
 
     @abstractmethod
     def get_heatmap(self, data: pd.DataFrame) -> pd.DataFrame:
@@ -1,13 +1,25 @@
 from dataclasses import dataclass
 from datetime import date
+from functools import cached_property
+from itertools import count
 
 import pandas as pd
 
+from apple_health_parser.utils.manifest import FlagManifest, get_records_manifest
+
+# Fingerprints of ParsedData objects, never reused within the process (unlike `id`)
+_FINGERPRINTS = count()
+# Cached properties computed from the records (see `ParsedData.__setattr__`)
+_CACHED = ("manifest", "fingerprint")
+
 
 @dataclass
 class ParsedData:
     """
     Dataclass to store parsed data from the Apple Health export file.
+
+    The manifest and fingerprint are computed once, and computed again when the records
+    (or the flag) are replaced. Records modified in place are not detected.
     """
 
     flag: str
@@ -16,6 +28,49 @@ class ParsedData:
     dates: set[date]
     records: pd.DataFrame
 
+    def __setattr__(self, name: str, value: object) -> None:
+        """
+        Set an attribute, discarding the cached properties computed from the records
+        when the records (or the flag) are replaced.
+
+        Args:
+            name (str): Name of the attribute
+            value (object): Value of the attribute
+        """
+        super().__setattr__(name, value)
+        if name in ("flag", "records"):
+            for cached in _CACHED:
+                self.__dict__.pop(cached, None)
+
+    @cached_property
+    def manifest(self) -> FlagManifest:
+        """
+        Manifest of the records (e.g. their years and distinct sources), built once.
+        """
+        return get_records_manifest(self.flag, self.records)
+
+    @cached_property
+    def fingerprint(self) -> int:
+        """
+        Identifier of this ParsedData object and of its records, unique within the
+        process (e.g. to cache results computed from its records).
+        """
+        return next(_FINGERPRINTS)
+
+    def __getstate__(self) -> dict:
+        """
+        State of the ParsedData object, when pickled (e.g. by worker processes) or copied.
+
+        The fingerprint is left out, so that copies (and objects sent to other
+        processes) get their own fingerprint.
+
+        Returns:
+            dict: Attributes of the object
+        """
+        state = self.__dict__.copy()
+        state.pop("fingerprint", None)
+        return state
+
     def __str__(self) -> str:
         """
         String representation of the ParsedData class.
@@ -1,6 +1,7 @@
 from datetime import date
 from itertools import compress
 from pathlib import Path
+from typing import Self
 
 from plotly import graph_objects as go
 from plotly import subplots
@@ -18,6 +19,7 @@ from apple_health_parser.exceptions import (
     MissingFlag,
 )
 from apple_health_parser.models.parsed import ParsedData
+from apple_health_parser.utils.parser import Parser
 from apple_health_parser.utils.preprocessor import Preprocessor
 
 
@@ -52,6 +54,44 @@ class Overview:
             for k, v in data.items()
         }
 
+    @classmethod
+    def from_parser(
+        cls,
+        parser: Parser,
+        overview_type: OverviewType,
+        year: int = date.today().year,
+        source: str | None = None,
+        title: bool = False,
+    ) -> Self:
+        """
+        Initialize the Overview object from a parser, only building the records of the
+        year (and of the source) of each flag of the overview (see `Preprocessor.get_year_data`).
+
+        Args:
+            parser (Parser): Parser of the export
+            overview_type (OverviewType): Type of overview (e.g. "activity", "body")
+            year (int, optional): Year, defaults to date.today().year
+            source (str | None, optional):  Source, defaults to None
+            title (bool, optional): Flag to include the plot title, defaults to False
+
+        Raises:
+            InvalidOverviewType: Invalid overview type
+
+        Returns:
+            Self: Overview object
+        """
+        if overview_type not in OVERVIEW_TYPES:
+            raise InvalidOverviewType(overview_type)
+
+        # Flags missing from the export are reported when the data is validated
+        flags: list[str] = OverviewSubtypes[overview_type.upper()].value
+        data = {
+            flag: Preprocessor.get_year_data(parser, flag, year, source)
+            for flag in flags
+            if flag in parser.flags
+        }
+        return cls(data, overview_type, year=year, source=source, title=title)
+
     def _validate(self) -> None:
         """
         Validate the data.
@@ -1,11 +1,15 @@
-from datetime import datetime
+from datetime import datetime, timedelta
+from typing import Self
 
+import pandas as pd
 from plotly.graph_objects import Figure, Scatter
 
 from apple_health_parser.config.definitions import SleepColors
 from apple_health_parser.interfaces.plot_interface import PlotInterface
 from apple_health_parser.models.parsed import ParsedData
 from apple_health_parser.models.records import SleepType
+from apple_health_parser.utils.parser import Parser
+from apple_health_parser.utils.timestamps import get_offset_column, get_utc_time
 
 
 class SleepPlot(PlotInterface):
@@ -22,28 +26,86 @@ class SleepPlot(PlotInterface):
             timerange (tuple, optional): Start and end date for the plot in ISO format.
                 If provided, the data will be filtered to include only records within this range.
                 Must be a tuple of two strings in ISO format (e.g. `("2024-03-01T20:00:00+00:00", "2024-03-02T08:00:00+00:00")`).
+                Dates without a UTC offset are compared with the local time of the records.
                 Defaults to None, which means no filtering is applied.
         """
         super().__init__(data=data)
 
         if timerange is not None:
-            # Validate timerange
-            if not isinstance(timerange, tuple) or len(timerange) != 2:
-                raise ValueError("timerange must be a tuple of two date strings.")
-            if not all(isinstance(date, str) for date in timerange):
-                raise ValueError(
-                    "Both elements of timerange must be strings in ISO format."
-                )
-
-            # Convert strings to datetime objects
-            start_dt, end_dt = (datetime.fromisoformat(date) for date in timerange)
-            timerange_iso: tuple[datetime, datetime] = (start_dt, end_dt)
+            start_dt, end_dt = self._parse_timerange(timerange)
 
             # Filter the dataframe based on the timerange
-            self.dataframe = self.dataframe[
-                (self.dataframe["start_date"] >= timerange_iso[0])
-                & (self.dataframe["end_date"] <= timerange_iso[1])
-            ]
+            if start_dt.tzinfo is None:
+                start, end = self.dataframe["start_date"], self.dataframe["end_date"]
+            else:
+                start = self._get_dates("start_date")
+                end = self._get_dates("end_date")
+            self.dataframe = self.dataframe[(start >= start_dt) & (end <= end_dt)]
+
+    @classmethod
+    def from_parser(
+        cls, parser: Parser, timerange: tuple[str, str] | None = None
+    ) -> Self:
+        """
+        Initialize the SleepPlot from a parser, only building the sleep records which
+        start within the timerange.
+
+        Args:
+            parser (Parser): Parser of the export
+            timerange (tuple, optional): Start and end date for the plot in ISO format (see `SleepPlot`), defaults to None
+
+        Returns:
+            Self: SleepPlot object
+        """
+        start = end = None
+        if timerange is not None:
+            start, end = cls._parse_timerange(timerange)
+            # Records end before the end of the timerange, so they start before it too
+            # (dates have a precision of one second)
+            end += timedelta(seconds=1)
+
+        data = parser.get_flag_records(
+            "HKCategoryTypeIdentifierSleepAnalysis", start=start, end=end
+        )
+        return cls(data=data, timerange=timerange)
+
+    @staticmethod
+    def _parse_timerange(timerange: tuple[str, str]) -> tuple[datetime, datetime]:
+        """
+        Validate a timerange, and convert it to datetime objects.
+
+        Args:
+            timerange (tuple[str, str]): Start and end date in ISO format
+
+        Raises:
+            ValueError: Timerange is not a tuple of two strings in ISO format
+
+        Returns:
+            tuple[datetime, datetime]: Start and end date
+        """
+        if not isinstance(timerange, tuple) or len(timerange) != 2:
+            raise ValueError("timerange must be a tuple of two date strings.")
+        if not all(isinstance(date, str) for date in timerange):
+            raise ValueError(
+                "Both elements of timerange must be strings in ISO format."
+            )
+
+        start, end = (datetime.fromisoformat(date) for date in timerange)
+        return start, end
+
+    def _get_dates(self, column: str) -> pd.Series:
+        """
+        Get the UTC dates of a date column, which the preprocessor converts to local time.
+
+        Args:
+            column (str): Date column (e.g. `"start_date"`)
+
+        Returns:
+            pd.Series: UTC dates
+        """
+        return get_utc_time(
+            self.dataframe[column], self.dataframe[get_offset_column(column)]
+        )
 
     def _get_figure(self) -> Figure:
         """
@@ -1,5 +1,7 @@
 import click
 
+from apple_health_parser.consts import EXPORT_FORMATS
+from apple_health_parser.utils.cache import ParseCache
 from apple_health_parser.utils.logging import logger
 from apple_health_parser.utils.parser import Parser
 
@@ -9,18 +11,41 @@ from apple_health_parser.utils.parser import Parser
 @click.option(
     "--dir_name",
     default=".",
-    help="Directory to export the CSV files to, defaults to current directory",
+    help="Directory to export the files to, defaults to current directory",
 )
-def main(zip_file: str, dir_name: str) -> None:
+@click.option(
+    "--format",
+    type=click.Choice(EXPORT_FORMATS),
+    default="csv",
+    help="Format of the exported files, defaults to csv (parquet, feather and arrow require pyarrow)",
+)
+@click.option(
+    "--partition/--no-partition",
+    default=False,
+    help="Partition the exported files by flag and year, defaults to no partition",
+)
+@click.option(
+    "--cache/--no-cache",
+    default=False,
+    help="Cache the parsed records to speed up later runs, defaults to no cache",
+)
+def main(
+    zip_file: str, dir_name: str, format: str, partition: bool, cache: bool
+) -> None:
     """
-    CLI to export data from the Apple Health export file to CSV files.
+    CLI to export data from the Apple Health export file to CSV (or columnar) files.
     """
     logger.info(click.style("Apple Health Parser", bg="blue", fg="white", bold=True))
 
-    parser = Parser(export_file=zip_file, overwrite=True, verbose=True)
+    parser = Parser(
+        export_file=zip_file,
+        verbose=True,
+        extract=False,
+        cache=ParseCache() if cache else None,
+    )
 
     # Export all data
-    parser.export(dir_name=dir_name)
+    parser.export(dir_name=dir_name, format=format, partition=partition)
 
 
 if __name__ == "__main__":
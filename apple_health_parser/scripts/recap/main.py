@@ -14,6 +14,7 @@ from apple_health_parser.scripts.recap.recap_data import get_recap_data
 from apple_health_parser.scripts.recap.recap_pdf import PdfSectionData, get_recap_report
 from apple_health_parser.scripts.recap.recap_plot import get_recap_plots
 from apple_health_parser.scripts.recap.recap_stats import get_recap_stats
+from apple_health_parser.utils.cache import ParseCache
 from apple_health_parser.utils.logging import logger
 from apple_health_parser.utils.parser import Parser
 
@@ -55,20 +56,32 @@ def open_pdf(filepath: Path) -> None:
     default=date.today().year,
     help="Year to filter the data for, defaults to current year",
 )
-def main(zip_file: str, year: int = date.today().year) -> None:
+@click.option(
+    "--cache/--no-cache",
+    default=False,
+    help="Cache the parsed records to speed up later runs, defaults to no cache",
+)
+def main(zip_file: str, year: int = date.today().year, cache: bool = False) -> None:
     """
     CLI to export the year recap from the Apple Health export file to a PDF file.
 
     Args:
         zip_file (str): Path to the Apple Health export.zip file
         year (int, optional): Year to filter the data for, defaults to current year
+        cache (bool, optional): Flag to cache the parsed records, defaults to False
     """
     logger.info(
         click.style(f"Generating year recap report - {year}...", fg="green", bold=True)
     )
 
     # Parse data
-    parser = Parser(export_file=zip_file, overwrite=True, verbose=True)
+    parser = Parser(
+        export_file=zip_file,
+        verbose=True,
+        extract=False,
+        flags=list(METRIC_DEFINITIONS),
+        cache=ParseCache() if cache else None,
+    )
 
     # Get data and prepare for plotting
     pdf_section_data: dict[str, PdfSectionData] = {}
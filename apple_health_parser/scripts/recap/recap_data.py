@@ -1,4 +1,5 @@
 import typing
+from datetime import date
 
 import pandas as pd
 
@@ -6,6 +7,7 @@ from apple_health_parser.config.definitions import Operations
 from apple_health_parser.exceptions import MissingYear
 from apple_health_parser.models.parsed import ParsedData
 from apple_health_parser.utils.parser import Parser
+from apple_health_parser.utils.timestamps import get_local_time
 
 
 @typing.no_type_check
@@ -28,19 +30,17 @@ def get_recap_data(
             - week_labels (pd.Series): Series of week labels for plotting
             - month_annotations (list[dict]): List of annotation dicts for month labels
     """
-    # Get records for the specified flag
-    parsed: ParsedData = parser.get_flag_records(flag)
-    df = parsed.records
-
-    years = df.start_date.dt.year.unique().tolist()
+    # Years are looked up in the manifest of the flag, without building its records
+    years = parser.get_flag_manifest(flag).years
     if year not in years:
         raise MissingYear(year, years)
 
-    # Ensure start_date is datetime
-    df["start_date"] = pd.to_datetime(df["start_date"])
-
-    # Filter by year
-    df = df[df["start_date"].dt.year == year]
+    # Only the records of the year (in local time) are built
+    parsed: ParsedData = parser.get_flag_records(
+        flag, start=date(year, 1, 1), end=date(year + 1, 1, 1)
+    )
+    # Group by the local (wall-clock) time of the records, stored in UTC
+    df = parsed.records.assign(start_date=get_local_time(parsed.records))
 
     # Compute week start
     df["week_start"] = df["start_date"].dt.to_period("W").dt.start_time
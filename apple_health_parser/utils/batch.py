@@ -0,0 +1,140 @@
+from collections.abc import Iterator
+
+import lxml.etree as ET
+
+
+class RecordBatch:
+    """
+    Columnar batch of the records of a single flag.
+
+    Attributes are kept as raw strings, with one list per attribute (`None` when a
+    record does not have the attribute). The value of the first `MetadataEntry` of each
+    record (e.g. the motion context of heart rate records) is kept in the `METADATA` column.
+
+    Unlike lxml elements, batches can be pickled, so they can be sent between processes.
+    """
+
+    METADATA = "MetadataEntry"
+
+    def __init__(self, flag: str) -> None:
+        """
+        Initialize an empty RecordBatch for the given flag.
+
+        Args:
+            flag (str): Flag of the records (e.g. `"HKQuantityTypeIdentifierHeartRate"`)
+        """
+        self.flag = flag
+        self.count = 0
+        self.columns: dict[str, list[str | None]] = {self.METADATA: []}
+
+    def _get_column(self, key: str) -> list[str | None]:
+        """
+        Get the column of an attribute, adding it (filled with `None`) if missing.
+
+        Args:
+            key (str): Attribute name (e.g. `"sourceName"`)
+
+        Returns:
+            list[str | None]: Column of the attribute
+        """
+        column = self.columns.get(key)
+        if column is None:
+            column = self.columns[key] = [None] * self.count
+        return column
+
+    def append(self, rec: ET.Element) -> None:
+        """
+        Append a record to the batch.
+
+        Args:
+            rec (ET.Element): Record from the export.xml file
+        """
+        # Looking up children is only needed for the (few) records that have some
+        metadata = rec.find("MetadataEntry") if len(rec) else None
+        self.append_row(
+            dict(rec.items()), None if metadata is None else metadata.get("value")
+        )
+
+    def append_row(self, attrib: dict[str, str], metadata: str | None) -> None:
+        """
+        Append the attributes of a record to the batch.
+
+        Args:
+            attrib (dict[str, str]): Attributes of the record
+            metadata (str | None): Value of the first `MetadataEntry` of the record
+        """
+        for key in attrib:
+            if key not in self.columns:
+                self._get_column(key)
+
+        self.columns[self.METADATA].append(metadata)
+        for key, column in self.columns.items():
+            if key != self.METADATA:
+                column.append(attrib.get(key))
+
+        self.count += 1
+
+    def extend(self, other: "RecordBatch") -> None:
+        """
+        Append the records of another batch (of the same flag) to the batch.
+
+        Args:
+            other (RecordBatch): Batch to append
+        """
+        self.extend_columns(other.columns, other.count)
+
+    def extend_columns(self, columns: dict[str, list[str | None]], count: int) -> None:
+        """
+        Append records, given as columns of attributes, to the batch.
+
+        Args:
+            columns (dict[str, list[str | None]]): Column of each attribute (and of the `METADATA`), with one value per record
+            count (int): Number of records in the columns
+        """
+        for key in columns:
+            self._get_column(key)
+
+        for key, column in self.columns.items():
+            column.extend(columns.get(key, [None] * count))
+
+        self.count += count
+
+    def rows(self) -> Iterator[tuple[dict[str, str], str | None]]:
+        """
+        Iterate over the records of the batch.
+
+        Yields:
+            tuple[dict[str, str], str | None]: Attributes and metadata value of a record
+        """
+        metadata = self.columns[self.METADATA]
+        keys = [key for key in self.columns if key != self.METADATA]
+        columns = [self.columns[key] for key in keys]
+        for n, values in enumerate(zip(*columns)):
+            attrib = {
+                key: value for key, value in zip(keys, values) if value is not None
+            }
+            yield attrib, metadata[n]
+
+    @property
+    def keys(self) -> set[str]:
+        """
+        Attribute names of the records (e.g. `{"sourceName", "unit", ...}`).
+        """
+        return {key for key in self.columns if key != self.METADATA}
+
+    @property
+    def sources(self) -> set[str]:
+        """
+        Distinct sources of the records.
+        """
+        return set(self.columns.get("sourceName", [])) - {None}
+
+    @property
+    def devices(self) -> set[str]:
+        """
+        Distinct device strings of the records.
+        """
+        return set(self.columns.get("device", [])) - {None}
+
+    def __len__(self) -> int:
+        return self.count
@@ -0,0 +1,488 @@
+from collections.abc import Callable, Iterable, Mapping
+from datetime import date, timedelta
+from functools import cache
+from typing import Annotated, Any
+
+import numpy as np
+import pandas as pd
+from pydantic import TypeAdapter, ValidationError, ValidationInfo, WrapValidator
+from pydantic_core import PydanticOmit
+
+from apple_health_parser.config.definitions import Builders, Validations
+from apple_health_parser.models.records import (
+    MOTION_CONTEXTS,
+    SLEEP_TYPES,
+    HealthData,
+    HeartRateData,
+    SleepData,
+    parse_date,
+)
+from apple_health_parser.utils.categories import (
+    CATEGORY_COLUMNS,
+    categorize,
+    encode_categories,
+)
+from apple_health_parser.utils.store import RecordStore
+from apple_health_parser.utils.timestamps import (
+    DATE_COLUMNS,
+    get_offset_column,
+    normalize_dates,
+)
+
+HEART_RATE = "HKQuantityTypeIdentifierHeartRate"
+SLEEP_ANALYSIS = "HKCategoryTypeIdentifierSleepAnalysis"
+
+
+def get_model(flag: str) -> type[HealthData]:
+    """
+    Get the model of the records of a flag.
+
+    Args:
+        flag (str): Flag of the records
+
+    Returns:
+        type[HealthData]: Model of the records
+    """
+    if flag == HEART_RATE:
+        return HeartRateData
+    if flag == SLEEP_ANALYSIS:
+        return SleepData
+    return HealthData
+
+
+def get_attributes(
+    flag: str, attrib: Mapping[str, str], metadata: str | None
+) -> dict[str, str | None]:
+    """
+    Get the input of the model of a record, i.e. its attributes and metadata.
+
+    Args:
+        flag (str): Flag of the record
+        attrib (Mapping[str, str]): Attributes of the record
+        metadata (str | None): Value of the first `MetadataEntry` of the record
+
+    Returns:
+        dict[str, str | None]: Input of the model of the record
+    """
+    # Heart rate records can have additional metadata (motionContext)
+    if flag == HEART_RATE:
+        return {**attrib, "motionContext": metadata}
+    # Sleep records have additional metadata (timezone)
+    if flag == SLEEP_ANALYSIS:
+        return {**attrib, "timezone": metadata}
+    return dict(attrib)
+
+
+def build_model(
+    flag: str, attrib: Mapping[str, str], metadata: str | None
+) -> HealthData:
+    """
+    Build the model of a record.
+
+    Args:
+        flag (str): Flag of the record
+        attrib (Mapping[str, str]): Attributes of the record
+        metadata (str | None): Value of the first `MetadataEntry` of the record
+
+    Raises:
+        ValidationError: Record is invalid
+
+    Returns:
+        HealthData: Model of the record
+    """
+    return get_model(flag)(**get_attributes(flag, attrib, metadata))
+
+
+def _omit_invalid(value: Any, handler: Callable, info: ValidationInfo) -> Any:
+    """
+    Validate a record, or count its first error (in the `failed` context) and omit it.
+
+    Args:
+        value (Any): Attributes of the record
+        handler (Callable): Validator of the model
+        info (ValidationInfo): Validation info, with the failed records by error as context
+
+    Raises:
+        PydanticOmit: Record is invalid
+
+    Returns:
+        Any: Model of the record
+    """
+    try:
+        return handler(value)
+    except ValidationError as exc:
+        key = get_error_key(exc)
+        info.context[key] = info.context.get(key, 0) + 1
+        raise PydanticOmit from exc
+
+
+@cache
+def _get_adapter(model: type[HealthData]) -> TypeAdapter:
+    """
+    Get the adapter validating a list of records of a model (built once per model).
+
+    Invalid records are omitted from the list, and counted in the validation context
+    (see `_omit_invalid`).
+
+    Args:
+        model (type[HealthData]): Model of the records
+
+    Returns:
+        TypeAdapter: Adapter of `list[model]`
+    """
+    return TypeAdapter(list[Annotated[model, WrapValidator(_omit_invalid)]])  # type: ignore[valid-type]
+
+
+def validate_models(
+    flag: str, rows: Iterable[tuple[Mapping[str, str], str | None]]
+) -> tuple[list[HealthData], dict[str, int]]:
+    """
+    Build the models of the records of a flag, validated in batch.
+
+    The records are validated by a single `TypeAdapter` call, instead of a model
+    instantiation per record. Invalid records are dropped as they are validated, and
+    counted under their first error, as when the records are validated one by one, so
+    the valid records are never validated twice.
+
+    Args:
+        flag (str): Flag of the records
+        rows (Iterable[tuple[Mapping[str, str], str | None]]): Attributes and metadata value of the records
+
+    Returns:
+        tuple[list[HealthData], dict[str, int]]: Models, and count of failed records by error
+    """
+    adapter = _get_adapter(get_model(flag))
+    items = [get_attributes(flag, attrib, metadata) for attrib, metadata in rows]
+    failed: dict[str, int] = {}
+    return adapter.validate_python(items, context=failed), failed
+
+
+def construct_models(
+    flag: str, rows: Iterable[tuple[Mapping[str, str], str | None]]
+) -> tuple[list[HealthData], dict[str, int]]:
+    """
+    Build the models of the records of a flag, without validating them.
+
+    The dates, values and motion contexts are converted as by the validators of the
+    models, and the models are built with `model_construct`. Records are only dropped
+    when a required attribute is missing (or None) or a conversion fails, and the
+    types of the other attributes are not checked, so this is only meant for trusted
+    exports.
+
+    Args:
+        flag (str): Flag of the records
+        rows (Iterable[tuple[Mapping[str, str], str | None]]): Attributes and metadata value of the records
+
+    Returns:
+        tuple[list[HealthData], dict[str, int]]: Models, and count of failed records by error
+    """
+    model = get_model(flag)
+    fields = [
+        (name, field.alias or name, field.is_required())
+        for name, field in model.model_fields.items()
+    ]
+    converters: dict[str, Callable[[str], Any]] = {
+        "creation_date": parse_date,
+        "start_date": parse_date,
+        "end_date": parse_date,
+        "value": HealthData.validate_value,
+        "motion_context": HeartRateData.check_motion_context,
+    }
+
+    models: list[HealthData] = []
+    failed: dict[str, int] = {}
+    for attrib, metadata in rows:
+        item = get_attributes(flag, attrib, metadata)
+        values: dict[str, Any] = {}
+        for name, alias, required in fields:
+            value = item.get(alias)
+            if value is None and required:
+                error = f"missing_{(alias,)}"
+                break
+            if value is not None and name in converters:
+                try:
+                    value = converters[name](value)
+                except ValueError:
+                    error = f"value_error_{(alias,)}"
+                    break
+            values[name] = value
+        else:
+            models.append(model.model_construct(**values))
+            continue
+        failed[error] = failed.get(error, 0) + 1
+
+    return models, failed
+
+
+def get_error_key(exc: ValidationError) -> str:
+    """
+    Get the key under which a failed record is counted (e.g. `"missing_('device',)"`).
+
+    Args:
+        exc (ValidationError): Validation error of the record
+
+    Returns:
+        str: Type and location of the first error
+    """
+    error = exc.errors()[0]
+    return f"{error['type']}_{error['loc']}"
+
+
+def build_models(
+    flag: str, rows: Iterable[tuple[Mapping[str, str], str | None]]
+) -> tuple[list[HealthData], dict[str, int]]:
+    """
+    Build the models of the records of a flag, validated one by one.
+
+    Args:
+        flag (str): Flag of the records
+        rows (Iterable[tuple[Mapping[str, str], str | None]]): Attributes and metadata value of the records
+
+    Returns:
+        tuple[list[HealthData], dict[str, int]]: Models, and count of failed records by error
+    """
+    models: list[HealthData] = []
+    failed: dict[str, int] = {}
+    for attrib, metadata in rows:
+        try:
+            models.append(build_model(flag, dict(attrib), metadata))
+        except ValidationError as exc:
+            error = get_error_key(exc)
+            failed[error] = failed.get(error, 0) + 1
+    return models, failed
+
+
+def get_records_frame(models: list[HealthData]) -> pd.DataFrame:
+    """
+    Get the records of the models in a DataFrame, with UTC dates and offset columns (see
+    `normalize_dates`) and categorical columns (see `categorize`).
+
+    Args:
+        models (list[HealthData]): Models of the records
+
+    Returns:
+        pd.DataFrame: Records
+    """
+    return categorize(
+        normalize_dates(pd.DataFrame([model.model_dump() for model in models]))
+    )
+
+
+def get_empty_records(flag: str, values: list[str] | None = None) -> pd.DataFrame:
+    """
+    Get an empty DataFrame with the columns and dtypes of the records of a flag (as built
+    by `build_flag`), e.g. for a selection without any valid record.
+
+    The dtype of the values depends on the records (e.g. integers only if every value is
+    an integer), so it is parsed from the distinct values of the flag as the columnar
+    builder does (see `_parse_values`). Without values, numbers are floats.
+
+    Args:
+        flag (str): Flag of the records
+        values (list[str], optional): Distinct values of the records of the flag, defaults to None
+
+    Returns:
+        pd.DataFrame: Empty records
+    """
+    model = get_model(flag)
+    categories = pd.CategoricalDtype(pd.Index([], dtype=str))
+    columns: dict[str, pd.Series] = {}
+    for name in model.model_fields:
+        if name in DATE_COLUMNS:
+            columns[name] = pd.Series(dtype="datetime64[ns, UTC]")
+            if name == DATE_COLUMNS[-1]:
+                for column in DATE_COLUMNS:
+                    columns[get_offset_column(column)] = pd.Series(dtype=np.int16)
+        elif name in CATEGORY_COLUMNS:
+            columns[name] = pd.Series(dtype=categories)
+        elif name == "value" and values:
+            parsed = _parse_values(np.array(values, dtype=object))
+            columns[name] = pd.Series(
+                dtype=object if parsed is None else parsed[0].dtype
+            )
+        elif name == "value" and model is not SleepData:
+            columns[name] = pd.Series(dtype=np.float64)
+        else:
+            columns[name] = pd.Series(dtype=str)
+    if "range" in model.model_computed_fields:
+        # Same unit as the ranges pandas infers from the models (e.g. `timedelta64[us]`)
+        columns["range"] = pd.Series([timedelta()])[:0]
+    return pd.DataFrame(columns)
+
+
+def build_flag(
+    flag: str,
+    store: RecordStore,
+    builder: str = Builders.MODELS,
+    validation: str = Validations.FULL,
+) -> tuple[pd.DataFrame, set[date], dict[str, int]]:
+    """
+    Build the records of a flag, as `Parser.get_flag_records` does.
+
+    Only depends on the store of the records, so that flags can be built in other
+    processes (see `build_flags_parallel`).
+
+    Args:
+        flag (str): Flag of the records
+        store (RecordStore): Store of the records
+        builder (str): Builder of the records (`"models"` or `"columnar"`), defaults to `"models"`
+        validation (str): Validation mode of the models (`"full"`, `"batch"` or `"none"`), defaults to `"full"`
+
+    Returns:
+        tuple[pd.DataFrame, set[date], dict[str, int]]: Records, dates (year, month, day) and count of failed records by error
+    """
+    if builder == Builders.COLUMNAR:
+        built = build_records(flag, store)
+        if built is not None:
+            return built
+
+    if validation == Validations.FULL:
+        models, failed = build_models(flag, store.rows())
+    elif validation == Validations.BATCH:
+        models, failed = validate_models(flag, store.rows())
+    else:
+        models, failed = construct_models(flag, store.rows())
+    dates = {model.start_date.date() for model in models}
+    return get_records_frame(models), dates, failed
+
+
+def _parse_values(values: np.ndarray) -> tuple[pd.Series, np.ndarray] | None:
+    """
+    Parse a column of values into numbers, or sleep types.
+
+    Values are parsed with the same rules as the models (`int`, then `float`), so that
+    the dtype of the column is the one pandas infers from the models.
+
+    Args:
+        values (np.ndarray): Values as strings
+
+    Returns:
+        tuple[pd.Series, np.ndarray] | None: Parsed values and mask of the parsed values, or None if numbers and sleep types are mixed
+    """
+    sleep = pd.Series(values, dtype=object).isin(SLEEP_TYPES).to_numpy()
+    if sleep.all():
+        return pd.Series(values.tolist()), sleep
+    if sleep.any():
+        return None
+
+    text = values.astype(str)
+    for dtype in (np.int64, np.float64):
+        try:
+            return pd.Series(text.astype(dtype)), np.ones(len(values), dtype=bool)
+        except (ValueError, OverflowError):
+            continue
+
+    # Some values are invalid, so they are parsed one by one
+    numbers: list[int | float | None] = []
+    for value in values:
+        try:
+            numbers.append(int(value))
+        except ValueError:
+            try:
+                numbers.append(float(value))
+            except ValueError:
+                numbers.append(None)
+    parsed = np.array([number is not None for number in numbers], dtype=bool)
+    return pd.Series([number for number in numbers if number is not None]), parsed
+
+
+def build_records(
+    flag: str, store: RecordStore
+) -> tuple[pd.DataFrame, set[date], dict[str, int]] | None:
+    """
+    Build the records of a flag column by column, without building a model per record.
+
+    The encoded attributes of the store are checked and converted with vectorized
+    operations, into the same columns (and dtypes) as the records built from the models
+    (with UTC dates and offset columns, see `normalize_dates`, and categorical columns,
+    see `categorize`). Records that do not pass the checks (e.g. a missing attribute, or a non-numeric
+    value) are validated with their model, so that failures are counted the same way.
+    If one of them is valid anyway, or if the values mix numbers and sleep types, None
+    is returned so that the records of the flag are built from the models instead.
+
+    Args:
+        flag (str): Flag of the records
+        store (RecordStore): Store of the records
+
+    Returns:
+        tuple[pd.DataFrame, set[date], dict[str, int]] | None: Records, dates (year, month, day) and count of failed records by error, or None
+    """
+    model = get_model(flag)
+    fields = {name: field.alias or name for name, field in model.model_fields.items()}
+
+    def key(name: str) -> str:
+        if fields[name] in ("motionContext", "timezone"):
+            return RecordStore.METADATA
+        return fields[name]
+
+    # Dates were parsed when the records were stored (unparsed dates fail the checks)
+    dates = {}
+    regular = np.ones(store.count, dtype=bool)
+    for name in DATE_COLUMNS:
+        utc, offsets, parsed = store.get_dates(fields[name])
+        dates[name] = utc, offsets
+        regular &= parsed
+
+    raw = {name: store.get_strings(key(name)) for name in fields if name not in dates}
+    for name, field in model.model_fields.items():
+        if field.is_required() and name in raw:
+            regular &= pd.notna(raw[name])
+
+    if "motion_context" in raw:
+        motion_context = pd.Series(raw["motion_context"], dtype=object)
+        regular &= (
+            motion_context.isna() | motion_context.isin(MOTION_CONTEXTS)
+        ).to_numpy()
+
+    values = _parse_values(raw["value"][regular])
+    if values is None:
+        return None
+
+    value, parsed = values
+    regular[regular] = parsed
+
+    failed: dict[str, int] = {}
+    for row in store.get_rows(np.flatnonzero(~regular)):
+        try:
+            build_model(flag, *row)
+        except ValidationError as exc:
+            error = get_error_key(exc)
+            failed[error] = failed.get(error, 0) + 1
+            continue
+        # Valid after all (e.g. a date which is not zero-padded)
+        return None
+
+    if not regular.any():
+        return pd.DataFrame(), set(), failed
+
+    records: dict[str, pd.Series | list | np.ndarray] = {}
+    for name in fields:
+        if name in dates:
+            records[name] = (
+                pd.Series(dates[name][0][regular])
+                .dt.as_unit("ns")
+                .dt.tz_localize("UTC")
+            )
+            if name == DATE_COLUMNS[-1]:
+                for column in DATE_COLUMNS:
+                    records[get_offset_column(column)] = dates[column][1][regular]
+        elif name == "value":
+            records[name] = value
+        elif name in CATEGORY_COLUMNS:
+            # Categories are built from the codes of the store, not from the strings
+            codes, vocabulary = store.get_codes(key(name))
+            if name == "motion_context":
+                vocabulary = [MOTION_CONTEXTS.get(value) for value in vocabulary]
+            records[name] = encode_categories(codes[regular], vocabulary)
+        else:
+            records[name] = raw[name][regular].tolist()
+    if "range" in model.model_computed_fields:
+        records["range"] = pd.Series(
+            dates["end_date"][0][regular] - dates["start_date"][0][regular]
+        )
+
+    utc, offsets = dates["start_date"]
+    local = utc[regular] + offsets[regular].astype("timedelta64[m]")
+    days = np.unique(local.astype("datetime64[D]")).tolist()
+
+    return pd.DataFrame(records), set(days), failed
@@ -0,0 +1,486 @@
+import hashlib
+import json
+import os
+from collections.abc import Iterable
+from datetime import date, datetime, timedelta, timezone
+from importlib.metadata import PackageNotFoundError, version
+from pathlib import Path
+from shutil import rmtree
+from tempfile import mkdtemp
+from zipfile import ZipFile, is_zipfile
+
+import numpy as np
+import pandas as pd
+
+from apple_health_parser.models.parsed import ParsedData
+from apple_health_parser.models.records import DATE_FORMAT
+from apple_health_parser.utils.loader import Loader, ZipMember
+from apple_health_parser.utils.logging import logger
+from apple_health_parser.utils.timestamps import localize_dates
+
+DEFAULT_CACHE_DIR = (
+    Path(os.environ.get("XDG_CACHE_HOME", Path.home() / ".cache"))
+    / "apple-health-parser"
+)
+DEFAULT_MAX_SIZE = 4 * 1024**3
+
+MANIFEST = "manifest.json"
+
+
+def get_version() -> str:
+    """
+    Get the version of the library, which is part of the cache keys.
+
+    Returns:
+        str: Version of the library (e.g. `"2.0.0"`)
+    """
+    try:
+        return version("apple-health-parser")
+    except PackageNotFoundError:
+        return "unknown"
+
+
+class ParseCache:
+    """
+    On-disk cache of parsed records, keyed by the fingerprint of the export file.
+
+    Each flag is stored column by column as NumPy `.npy` files, which are memory-mapped
+    when loaded. Strings are dictionary-encoded (integer codes and a vocabulary), as
+    categorical columns are, and dates are stored as UTC timestamps plus their UTC offset.
+
+    ```bash
+    <cache_dir>/<key>/manifest.json
+    <cache_dir>/<key>/<flag>/<column>.npy
+    ```
+
+    When the cache grows over `max_size`, the least recently used exports (i.e. the ones
+    whose records were loaded or stored the longest ago) are evicted. The size of each
+    flag is recorded in the manifest when it is stored, and manifests are only read
+    again when their file changes, so that looking up the cache stays cheap.
+    """
+
+    def __init__(
+        self,
+        cache_dir: str | Path = DEFAULT_CACHE_DIR,
+        max_size: int = DEFAULT_MAX_SIZE,
+    ) -> None:
+        """
+        Initialize the cache.
+
+        Args:
+            cache_dir (str | Path): Directory of the cache, defaults to `~/.cache/apple-health-parser`
+            max_size (int): Maximum size of the cache (in bytes), defaults to 4 GiB
+        """
+        self.cache_dir = Path(cache_dir)
+        self.max_size = max_size
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        # Manifests read by cache key, with the modification time and size of their file
+        self._manifests: dict[str, tuple[tuple[int, int], dict]] = {}
+
+    @staticmethod
+    def fingerprint(export_file: str | Path | ZipMember) -> str:
+        """
+        Get the cache key of an export file.
+
+        For zip files, the key is computed from the CRC-32 and size of export.xml, which are
+        read from the central directory of the zip file. Otherwise, the whole file is hashed.
+        The version of the library is always part of the key.
+
+        Args:
+            export_file (str | Path | ZipMember): Path to the export.zip (or export.xml) file, or export.xml file in a zip file
+
+        Returns:
+            str: Cache key
+        """
+        digest = hashlib.blake2b(get_version().encode(), digest_size=16)
+
+        if isinstance(export_file, (str, Path)) and is_zipfile(export_file):
+            with ZipFile(export_file) as archive:
+                export_file = Loader.find_export_xml(archive)
+                info = archive.getinfo(export_file.name)
+        elif isinstance(export_file, ZipMember):
+            info = export_file.archive.getinfo(export_file.name)
+        else:
+            with open(export_file, "rb") as file:
+                digest.update(hashlib.file_digest(file, "blake2b").digest())
+            return digest.hexdigest()
+
+        digest.update(f"{info.CRC:08x}:{info.file_size}".encode())
+        return digest.hexdigest()
+
+    def _get_entry(self, key: str) -> Path:
+        return self.cache_dir / key
+
+    @staticmethod
+    def _get_stamp(path: Path) -> tuple[int, int]:
+        stat = path.stat()
+        return stat.st_mtime_ns, stat.st_size
+
+    def get_manifest(self, key: str) -> dict | None:
+        """
+        Get the manifest of a cached export.
+
+        The manifest is read once, and only read again if its file changes (e.g. when
+        another process stores a flag). It must not be modified.
+
+        Args:
+            key (str): Cache key
+
+        Returns:
+            dict | None: Manifest of the cached export, or None if the export is not cached
+        """
+        path = self._get_entry(key) / MANIFEST
+        try:
+            stamp = self._get_stamp(path)
+        except FileNotFoundError:
+            self._manifests.pop(key, None)
+            return None
+        cached = self._manifests.get(key)
+        if cached is None or cached[0] != stamp:
+            cached = self._manifests[key] = (stamp, json.loads(path.read_text()))
+        return cached[1]
+
+    def _copy_manifest(self, key: str) -> dict:
+        """
+        Get a copy of the manifest of an export to update, or a new manifest.
+
+        Args:
+            key (str): Cache key
+
+        Returns:
+            dict: Manifest of the export
+        """
+        manifest = self.get_manifest(key)
+        if manifest is None:
+            return {"version": get_version(), "data": {}}
+        return {**manifest, "data": dict(manifest["data"])}
+
+    def _write_manifest(self, key: str, manifest: dict) -> None:
+        entry = self._get_entry(key)
+        entry.mkdir(parents=True, exist_ok=True)
+        tmp = entry / f"{MANIFEST}.tmp"
+        tmp.write_text(json.dumps(manifest))
+        os.replace(tmp, entry / MANIFEST)
+        self._manifests[key] = (self._get_stamp(entry / MANIFEST), manifest)
+
+    def _touch(self, key: str) -> None:
+        """
+        Mark a cached export as recently used.
+
+        Args:
+            key (str): Cache key
+        """
+        path = self._get_entry(key) / MANIFEST
+        os.utime(path)
+        if key in self._manifests:
+            self._manifests[key] = (self._get_stamp(path), self._manifests[key][1])
+
+    def set_flags(
+        self, key: str, flags: dict[str, int], export_date: str | None = None
+    ) -> None:
+        """
+        Record the flags found in an export.
+
+        Args:
+            key (str): Cache key
+            flags (dict[str, int]): Record count of each flag found in the export
+            export_date (str, optional): Export date of the export, defaults to None
+        """
+        manifest = self._copy_manifest(key)
+        manifest["flags"] = flags
+        manifest["export_date"] = export_date
+        self._write_manifest(key, manifest)
+
+    def latest(self) -> str | None:
+        """
+        Get the cache key of the most recent export in the cache (by export date).
+
+        This is typically the previous export to ingest a newer export against
+        (see `Parser(previous=...)`).
+
+        Returns:
+            str | None: Cache key of the most recent export, or None if there is none
+        """
+        exports: dict[str, datetime] = {}
+        for entry in self._get_entries():
+            manifest = self.get_manifest(entry.name)
+            export_date = manifest.get("export_date") if manifest else None
+            if export_date is not None:
+                exports[entry.name] = datetime.strptime(export_date, DATE_FORMAT)
+        return max(exports, key=exports.__getitem__, default=None)
+
+    def has(self, key: str, flag: str) -> bool:
+        """
+        Check whether the records of a flag are cached.
+
+        Args:
+            key (str): Cache key
+            flag (str): Flag of the records
+
+        Returns:
+            bool: True if the records are cached, False otherwise
+        """
+        manifest = self.get_manifest(key)
+        return manifest is not None and flag in manifest["data"]
+
+    def load(self, key: str, flag: str) -> ParsedData | None:
+        """
+        Load the parsed data of a flag from the cache.
+
+        Args:
+            key (str): Cache key
+            flag (str): Flag of the records
+
+        Returns:
+            ParsedData | None: Parsed data, or None if the flag is not cached
+        """
+        manifest = self.get_manifest(key)
+        if manifest is None or flag not in manifest["data"]:
+            return None
+
+        self._touch(key)
+        meta = manifest["data"][flag]
+        directory = self._get_entry(key) / meta["directory"]
+        records = pd.DataFrame(
+            {
+                column["name"]: _load_column(directory, n, column)
+                for n, column in enumerate(meta["columns"])
+            },
+            index=pd.RangeIndex(meta["count"]),
+        )
+        return ParsedData(
+            flag=flag,
+            sources=meta["sources"],
+            devices=meta["devices"],
+            dates={date.fromisoformat(day) for day in meta["dates"]},
+            records=records,
+        )
+
+    def store(
+        self,
+        key: str,
+        data: ParsedData,
+        keys: Iterable[str] | None = None,
+        digest: str | None = None,
+    ) -> None:
+        """
+        Store the parsed data of a flag in the cache, then evict old exports if needed.
+
+        Args:
+            key (str): Cache key
+            data (ParsedData): Parsed data to store
+            keys (Iterable[str], optional): Attributes of the records in the export (e.g. `"sourceName"`), defaults to None
+            digest (str, optional): Digest of the records in the export (see `RecordStore.get_digest`), defaults to None
+        """
+        entry = self._get_entry(key)
+        entry.mkdir(parents=True, exist_ok=True)
+
+        # Columns are written to a temporary directory which is then moved in place
+        directory = Path(mkdtemp(prefix="flag-", dir=entry))
+        columns = [
+            _save_column(directory, n, name, data.records[name])
+            for n, name in enumerate(data.records.columns)
+        ]
+
+        manifest = self._copy_manifest(key)
+        previous = manifest["data"].get(data.flag)
+        manifest["data"][data.flag] = {
+            "directory": directory.name,
+            "size": _get_size(directory),
+            "count": len(data.records),
+            "sources": list(data.sources),
+            "devices": list(data.devices),
+            "dates": sorted(day.isoformat() for day in data.dates),
+            "columns": columns,
+        }
+        if keys is not None:
+            manifest["data"][data.flag]["keys"] = sorted(keys)
+        if digest is not None:
+            manifest["data"][data.flag]["digest"] = digest
+        self._write_manifest(key, manifest)
+        if previous is not None:
+            rmtree(entry / previous["directory"], ignore_errors=True)
+
+        logger.info(f"Cached {data.flag} ({len(data.records):,} records)")
+        self._evict(keep=key)
+
+    def invalidate(self, key: str | None = None) -> None:
+        """
+        Remove a cached export, or the whole cache if no key is given.
+
+        Args:
+            key (str, optional): Cache key, defaults to None (i.e. all exports)
+        """
+        entries = [self._get_entry(key)] if key else self._get_entries()
+        for entry in entries:
+            rmtree(entry, ignore_errors=True)
+            self._manifests.pop(entry.name, None)
+            logger.info(f"Invalidated cached export {entry.name}")
+
+    def _get_entries(self) -> list[Path]:
+        return [entry for entry in self.cache_dir.iterdir() if entry.is_dir()]
+
+    def _get_entry_size(self, entry: Path) -> int:
+        """
+        Get the size of a cached export (in bytes), from the sizes of its flags in its
+        manifest.
+
+        Args:
+            entry (Path): Directory of the cached export
+
+        Returns:
+            int: Size of the cached export
+        """
+        manifest = self.get_manifest(entry.name)
+        if manifest is None:
+            # Leftover of an export which was never fully stored
+            return _get_size(entry)
+        return sum(
+            meta["size"] if "size" in meta else _get_size(entry / meta["directory"])
+            for meta in manifest["data"].values()
+        )
+
+    @property
+    def size(self) -> int:
+        """
+        Size of the cache (in bytes).
+        """
+        return sum(self._get_entry_size(entry) for entry in self._get_entries())
+
+    def _evict(self, keep: str) -> None:
+        """
+        Evict the least recently used exports until the cache fits in `max_size`.
+
+        Args:
+            keep (str): Cache key of the export to keep (i.e. the one in use)
+        """
+
+        def last_used(entry: Path) -> float:
+            manifest = entry / MANIFEST
+            return manifest.stat().st_mtime if manifest.exists() else 0.0
+
+        sizes = {entry: self._get_entry_size(entry) for entry in self._get_entries()}
+        total = sum(sizes.values())
+        if total <= self.max_size:
+            return
+        for entry in sorted(sizes, key=last_used):
+            if total <= self.max_size:
+                break
+            if entry.name == keep:
+                continue
+            rmtree(entry, ignore_errors=True)
+            self._manifests.pop(entry.name, None)
+            total -= sizes[entry]
+            logger.info(f"Evicted cached export {entry.name}")
+
+
+def _get_size(directory: Path) -> int:
+    """
+    Get the size of the files in a directory (in bytes).
+
+    Args:
+        directory (Path): Directory
+
+    Returns:
+        int: Size of the files
+    """
+    return sum(f.stat().st_size for f in directory.glob("**/*") if f.is_file())
+
+
+def _save_column(directory: Path, n: int, name: str, series: pd.Series) -> dict:
+    """
+    Save a column of a DataFrame to `.npy` file(s).
+
+    Args:
+        directory (Path): Directory to save the column to
+        n (int): Position of the column, used for the file names
+        name (str): Name of the column
+        series (pd.Series): Column to save
+
+    Returns:
+        dict: Specification of the column, to load it back
+    """
+    column: dict = {"name": name, "dtype": str(series.dtype)}
+
+    if isinstance(series.dtype, pd.DatetimeTZDtype):
+        tz = series.dtype.tz
+        column["kind"] = "datetime"
+        column["tz"] = (
+            tz.utcoffset(None) // timedelta(minutes=1)
+            if isinstance(tz, timezone)
+            else str(tz)
+        )
+        np.save(directory / f"{n}.npy", series.dt.tz_convert(None).to_numpy())
+
+    elif series.dtype == object and isinstance(
+        series.dropna().iloc[0] if series.notna().any() else None, datetime
+    ):
+        # Dates with mixed UTC offsets (e.g. across DST changes)
+        column["kind"] = "datetime_mixed"
+        utc = pd.to_datetime(series, utc=True)
+        offsets = [value.utcoffset() // timedelta(minutes=1) for value in series]
+        np.save(directory / f"{n}.npy", utc.dt.tz_convert(None).to_numpy())
+        np.save(directory / f"{n}.offset.npy", np.asarray(offsets, dtype=np.int16))
+
+    elif isinstance(series.dtype, pd.CategoricalDtype):
+        # Categorical columns are already dictionary-encoded
+        column["kind"] = "category"
+        column["values"] = series.cat.categories.tolist()
+        column["categories"] = str(series.cat.categories.dtype)
+        np.save(directory / f"{n}.npy", series.cat.codes.to_numpy(dtype=np.int32))
+
+    elif series.dtype.kind in "biufmM":
+        column["kind"] = "array"
+        np.save(directory / f"{n}.npy", series.to_numpy())
+
+    else:
+        column["kind"] = "dictionary"
+        codes, uniques = pd.factorize(series, use_na_sentinel=True)
+        column["values"] = [
+            value.item() if isinstance(value, np.generic) else value
+            for value in uniques
+        ]
+        np.save(directory / f"{n}.npy", codes.astype(np.int32))
+
+    return column
+
+
+def _load_column(directory: Path, n: int, column: dict) -> pd.Series:
+    """
+    Load a column saved with `_save_column`.
+
+    Args:
+        directory (Path): Directory the column was saved to
+        n (int): Position of the column
+        column (dict): Specification of the column
+
+    Returns:
+        pd.Series: Column
+    """
+    values = np.load(directory / f"{n}.npy", mmap_mode="r")
+
+    match column["kind"]:
+        case "datetime":
+            tz = column["tz"]
+            if isinstance(tz, int):
+                tz = timezone(timedelta(minutes=tz))
+            return pd.Series(values).dt.tz_localize("UTC").dt.tz_convert(tz)
+
+        case "datetime_mixed":
+            offsets = np.load(directory / f"{n}.offset.npy")
+            return localize_dates(np.asarray(values), offsets)
+
+        case "array":
+            return pd.Series(values, dtype=column["dtype"])
+
+        case "category":
+            categories = pd.Index(column["values"], dtype=column["categories"])
+            return pd.Series(
+                pd.Categorical.from_codes(np.asarray(values), categories=categories)
+            )
+
+        case _:
+            vocabulary = np.empty(len(column["values"]) + 1, dtype=object)
+            vocabulary[:-1] = column["values"]
+            # Missing values are encoded as -1, i.e. the last (None) entry
+            return pd.Series(vocabulary[values], dtype=column["dtype"])
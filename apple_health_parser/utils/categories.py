@@ -0,0 +1,90 @@
+import numpy as np
+import pandas as pd
+
+# Columns of the records with only a few distinct values (e.g. the sources), which are
+# kept as pandas `Categorical` columns
+CATEGORY_COLUMNS = [
+    "type",
+    "source_name",
+    "source_version",
+    "unit",
+    "device",
+    "motion_context",
+]
+
+
+def encode_categories(
+    codes: np.ndarray, vocabulary: list[str | None]
+) -> pd.Categorical:
+    """
+    Build a categorical column from dictionary-encoded strings (see `RecordStore`).
+
+    Only the values which are used are kept as categories, sorted as when pandas
+    converts strings to a categorical column, so that both columns are equal.
+
+    Args:
+        codes (np.ndarray): Code of each value in the vocabulary (-1 if the value is missing)
+        vocabulary (list[str | None]): Distinct values (several codes may share a value, or map to None or NaN)
+
+    Returns:
+        pd.Categorical: Categorical column
+    """
+    values = np.empty(len(vocabulary) + 1, dtype=object)
+    values[:-1] = vocabulary
+    # Missing values may be None or NaN (e.g. from a column with a str dtype)
+    categories = sorted(
+        {values[code] for code in np.unique(codes) if not pd.isna(values[code])}
+    )
+    index = {value: n for n, value in enumerate(categories)}
+    # Missing values (-1) map to the last entry (None), i.e. a missing category
+    mapping = np.array([index.get(value, -1) for value in values], dtype=np.int32)
+    return pd.Categorical.from_codes(
+        mapping[codes], categories=pd.Index(categories, dtype=str)
+    )
+
+
+def categorize(records: pd.DataFrame) -> pd.DataFrame:
+    """
+    Convert the columns of records with only a few distinct values to categorical columns.
+
+    Args:
+        records (pd.DataFrame): Records (e.g. built from the models)
+
+    Returns:
+        pd.DataFrame: Records with categorical columns (see `CATEGORY_COLUMNS`)
+    """
+    columns = [
+        column
+        for column in CATEGORY_COLUMNS
+        if column in records.columns
+        and not isinstance(records[column].dtype, pd.CategoricalDtype)
+    ]
+    if not columns:
+        return records
+
+    records = records.copy(deep=False)
+    for column in columns:
+        categorical = records[column].astype("category")
+        # Categories of empty columns would be objects, instead of strings
+        records[column] = categorical.cat.set_categories(
+            categorical.cat.categories.astype(str)
+        )
+    return records
+
+
+def remove_unused_categories(records: pd.DataFrame) -> pd.DataFrame:
+    """
+    Remove the categories which are not used anymore (e.g. once records are selected).
+
+    Only the categories of the selected records are then kept, as when they are parsed.
+
+    Args:
+        records (pd.DataFrame): Records with categorical columns
+
+    Returns:
+        pd.DataFrame: Records with only the used categories
+    """
+    for column, dtype in records.dtypes.items():
+        if isinstance(dtype, pd.CategoricalDtype):
+            records[column] = records[column].cat.remove_unused_categories()
+    return records
@@ -0,0 +1,483 @@
+import json
+import sqlite3
+from collections.abc import Iterator
+from contextlib import closing, contextmanager
+from dataclasses import astuple
+from datetime import date, datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from apple_health_parser.exceptions import InvalidDatabase
+from apple_health_parser.models.parsed import ParsedData
+from apple_health_parser.utils.categories import categorize
+from apple_health_parser.utils.devices import (
+    DEVICE_COLUMNS,
+    DEVICE_FIELDS,
+    add_device_columns,
+    parse_device,
+)
+from apple_health_parser.utils.logging import logger
+from apple_health_parser.utils.timestamps import (
+    filter_dates,
+    get_local_time,
+    get_utc_bound,
+)
+from apple_health_parser.utils.writer import iter_slices
+
+# File name of the database written by `Parser.export(format="sqlite")`
+DATABASE = "export.sqlite"
+
+# Number of records inserted per `executemany` call
+BATCH_SIZE = 10_000
+
+# Columns of the records table (besides `record_id`), with the source and device
+# referenced by id. Other columns of the records (e.g. `motion_context`) are stored as
+# metadata entries, and the device columns (see `DEVICE_COLUMNS`) are rebuilt.
+RECORD_COLUMNS = [
+    "type",
+    "source_name",
+    "source_version",
+    "unit",
+    "creation_date",
+    "start_date",
+    "end_date",
+    "creation_date_offset",
+    "start_date_offset",
+    "end_date_offset",
+    "value",
+    "device",
+]
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS export (
+    key TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS flags (
+    flag TEXT PRIMARY KEY,
+    count INTEGER NOT NULL,
+    columns TEXT,
+    sources TEXT,
+    devices TEXT
+);
+CREATE TABLE IF NOT EXISTS sources (
+    source_id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS devices (
+    device_id INTEGER PRIMARY KEY,
+    device TEXT NOT NULL UNIQUE,
+    {", ".join(f"{field} TEXT" for field in DEVICE_FIELDS)}
+);
+CREATE TABLE IF NOT EXISTS records (
+    record_id INTEGER PRIMARY KEY,
+    type TEXT NOT NULL,
+    source_id INTEGER REFERENCES sources (source_id),
+    source_version TEXT,
+    unit TEXT,
+    creation_date INTEGER,
+    start_date INTEGER,
+    end_date INTEGER,
+    creation_date_offset INTEGER,
+    start_date_offset INTEGER,
+    end_date_offset INTEGER,
+    value,
+    device_id INTEGER REFERENCES devices (device_id)
+);
+CREATE TABLE IF NOT EXISTS metadata (
+    record_id INTEGER NOT NULL REFERENCES records (record_id),
+    key TEXT NOT NULL,
+    value,
+    PRIMARY KEY (record_id, key)
+) WITHOUT ROWID;
+"""
+
+INDEXES = """
+CREATE INDEX IF NOT EXISTS records_type_start_date ON records (type, start_date);
+CREATE INDEX IF NOT EXISTS records_type_source_id ON records (type, source_id);
+"""
+
+
+class RecordDatabase:
+    """
+    SQLite database of parsed records, with one normalized schema for all flags.
+
+    ```sql
+    records (record_id, type, source_id, source_version, unit, creation_date, ...)
+    sources (source_id, name)
+    devices (device_id, device, name, manufacturer, model, hardware, software)
+    metadata (record_id, key, value)
+    ```
+
+    Columns of the records other than those of the records table (e.g. the motion
+    context of heart rate records) are stored as metadata entries. The dtypes of the
+    columns, and the sources and devices of each flag, are kept in a `flags` table.
+
+    Dates are stored as UTC timestamps (in nanoseconds) plus their UTC offset (in
+    minutes), and the records are indexed by flag and start date, and by flag and
+    source. The database holds a single export, identified by its fingerprint (see
+    `ParseCache.fingerprint`), so that a `Parser` can load the records of its export
+    from it (optionally for a date range) instead of parsing the export.
+    """
+
+    def __init__(self, path: str | Path) -> None:
+        """
+        Initialize the database, creating its tables if needed.
+
+        Args:
+            path (str | Path): Path to the SQLite database file
+        """
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as connection:
+            connection.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """
+        Connect to the database, in a transaction which is committed on exit.
+
+        Yields:
+            sqlite3.Connection: Connection to the database
+        """
+        with closing(sqlite3.connect(self.path)) as connection, connection:
+            yield connection
+
+    def _get_key(self, connection: sqlite3.Connection) -> str | None:
+        row = connection.execute("SELECT key FROM export").fetchone()
+        return None if row is None else row[0]
+
+    def set_flags(self, key: str, flags: dict[str, int]) -> None:
+        """
+        Record the flags found in an export, clearing the records of any other export.
+
+        Args:
+            key (str): Fingerprint of the export
+            flags (dict[str, int]): Record count of each flag found in the export
+        """
+        with self._connect() as connection:
+            if self._get_key(connection) != key:
+                for table in ("metadata", "records", "sources", "devices", "flags"):
+                    connection.execute(f"DELETE FROM {table}")
+                connection.execute("DELETE FROM export")
+                connection.execute("INSERT INTO export (key) VALUES (?)", (key,))
+            connection.executemany(
+                "INSERT INTO flags (flag, count) VALUES (?, ?) "
+                "ON CONFLICT (flag) DO UPDATE SET count = excluded.count",
+                flags.items(),
+            )
+
+    def get_manifest(self, key: str) -> dict | None:
+        """
+        Get the manifest of the export in the database, as for a cached export.
+
+        Args:
+            key (str): Fingerprint of the export
+
+        Returns:
+            dict | None: Manifest of the export, or None if the database holds another export
+        """
+        with self._connect() as connection:
+            if self._get_key(connection) != key:
+                return None
+            flags = dict(connection.execute("SELECT flag, count FROM flags"))
+            rows = connection.execute(
+                "SELECT flag, sources, devices FROM flags WHERE columns IS NOT NULL"
+            )
+            return {
+                "flags": flags,
+                "data": {
+                    flag: {
+                        "sources": json.loads(sources),
+                        "devices": json.loads(devices),
+                    }
+                    for flag, sources, devices in rows
+                },
+            }
+
+    def has(self, key: str, flag: str) -> bool:
+        """
+        Check whether the records of a flag are in the database.
+
+        Args:
+            key (str): Fingerprint of the export
+            flag (str): Flag of the records
+
+        Returns:
+            bool: True if the records are in the database, False otherwise
+        """
+        with self._connect() as connection:
+            return (
+                self._get_key(connection) == key
+                and connection.execute(
+                    "SELECT 1 FROM flags WHERE flag = ? AND columns IS NOT NULL",
+                    (flag,),
+                ).fetchone()
+                is not None
+            )
+
+    def store(self, key: str, data: ParsedData, batch_size: int = BATCH_SIZE) -> None:
+        """
+        Store the records of a flag, replacing its previous records, in one transaction.
+
+        The records are inserted in batches of `batch_size` records (see `iter_slices`).
+
+        Args:
+            key (str): Fingerprint of the export
+            data (ParsedData): Parsed data to store
+            batch_size (int): Number of records per batch, defaults to `BATCH_SIZE`
+
+        Raises:
+            InvalidDatabase: Database holds another export
+        """
+        records = data.records
+        extra = [
+            column
+            for column in records.columns
+            if column not in RECORD_COLUMNS and column not in DEVICE_COLUMNS
+        ]
+        columns = [[column, str(dtype)] for column, dtype in records.dtypes.items()]
+
+        with self._connect() as connection:
+            if self._get_key(connection) != key:
+                raise InvalidDatabase(str(self.path), key)
+            connection.execute(
+                "DELETE FROM metadata WHERE record_id IN "
+                "(SELECT record_id FROM records WHERE type = ?)",
+                (data.flag,),
+            )
+            connection.execute("DELETE FROM records WHERE type = ?", (data.flag,))
+
+            # Sources and devices are referenced by id
+            ids = {
+                "source_name": self._get_ids(
+                    connection, "sources", records.get("source_name")
+                ),
+                "device": self._get_ids(connection, "devices", records.get("device")),
+            }
+            (first,) = connection.execute(
+                "SELECT COALESCE(MAX(record_id), 0) + 1 FROM records"
+            ).fetchone()
+
+            for start, chunk in zip(
+                range(first, first + max(len(records), 1), batch_size),
+                iter_slices(records, size=batch_size),
+            ):
+                record_ids = range(start, start + len(chunk))
+                values = []
+                for column in RECORD_COLUMNS:
+                    if column not in chunk.columns:
+                        values.append([None] * len(chunk))
+                    elif column in ids:
+                        values.append(
+                            [
+                                None if value is None else ids[column][value]
+                                for value in _to_sql_values(chunk[column])
+                            ]
+                        )
+                    else:
+                        values.append(_to_sql_values(chunk[column]))
+                connection.executemany(
+                    f"INSERT INTO records VALUES (?, {', '.join('?' * len(values))})",
+                    zip(record_ids, *values),
+                )
+                for column in extra:
+                    connection.executemany(
+                        "INSERT INTO metadata VALUES (?, ?, ?)",
+                        (
+                            (record_id, column, value)
+                            for record_id, value in zip(
+                                record_ids, _to_sql_values(chunk[column])
+                            )
+                            if value is not None
+                        ),
+                    )
+
+            connection.execute(
+                "INSERT INTO flags (flag, count, columns, sources, devices) "
+                "VALUES (?, ?, ?, ?, ?) ON CONFLICT (flag) DO UPDATE SET "
+                "columns = excluded.columns, sources = excluded.sources, "
+                "devices = excluded.devices",
+                (
+                    data.flag,
+                    len(records),
+                    json.dumps(columns),
+                    json.dumps(list(data.sources)),
+                    json.dumps(list(data.devices)),
+                ),
+            )
+
+        logger.info(f"Stored {data.flag} ({len(records):,} records) in {self.path}")
+
+    @staticmethod
+    def _get_ids(
+        connection: sqlite3.Connection, table: str, values: pd.Series | None
+    ) -> dict[str, int]:
+        """
+        Get the ids of the distinct sources or devices of the records, inserting new ones.
+
+        Args:
+            connection (sqlite3.Connection): Connection to the database
+            table (str): Table of the values (`"sources"` or `"devices"`)
+            values (pd.Series, optional): Source names or device strings of the records
+
+        Returns:
+            dict[str, int]: Id of each distinct value
+        """
+        if values is None:
+            return {}
+        distinct = values.dropna().unique().tolist()
+        if table == "sources":
+            connection.executemany(
+                "INSERT OR IGNORE INTO sources (name) VALUES (?)",
+                ((name,) for name in distinct),
+            )
+            rows = connection.execute("SELECT name, source_id FROM sources")
+        else:
+            connection.executemany(
+                f"INSERT OR IGNORE INTO devices (device, {', '.join(DEVICE_FIELDS)}) "
+                f"VALUES ({', '.join('?' * (len(DEVICE_FIELDS) + 1))})",
+                ((device, *astuple(parse_device(device))) for device in distinct),
+            )
+            rows = connection.execute("SELECT device, device_id FROM devices")
+        return dict(rows)
+
+    def create_indexes(self) -> None:
+        """
+        Create the indexes of the records (once they are bulk-loaded).
+        """
+        with self._connect() as connection:
+            connection.executescript(INDEXES)
+
+    def load(
+        self,
+        key: str,
+        flag: str,
+        start: date | datetime | str | None = None,
+        end: date | datetime | str | None = None,
+    ) -> ParsedData | None:
+        """
+        Load the parsed data of a flag, optionally for the records with a start date in
+        `[start, end)` (see `filter_dates`).
+
+        The date range is looked up in the index of the records by flag and start date.
+
+        Args:
+            key (str): Fingerprint of the export
+            flag (str): Flag of the records
+            start (date | datetime | str, optional): Start of the date range, defaults to None
+            end (date | datetime | str, optional): End of the date range (excluded), defaults to None
+
+        Returns:
+            ParsedData | None: Parsed data, or None if the flag is not in the database
+        """
+        with self._connect() as connection:
+            if self._get_key(connection) != key:
+                return None
+            row = connection.execute(
+                "SELECT columns, sources, devices FROM flags "
+                "WHERE flag = ? AND columns IS NOT NULL",
+                (flag,),
+            ).fetchone()
+            if row is None:
+                return None
+            columns: list[list[str]] = json.loads(row[0])
+
+            conditions = ["r.type = ?"]
+            params: list = [flag]
+            for bound, operator, sign in ((start, ">=", -1), (end, "<", 1)):
+                if bound is not None:
+                    conditions.append(f"r.start_date {operator} ?")
+                    params.append(get_utc_bound(bound, sign).as_unit("ns").value)
+            where = " AND ".join(conditions)
+
+            cursor = connection.execute(
+                "SELECT r.record_id, r.type, s.name, "
+                + ", ".join(f"r.{column}" for column in RECORD_COLUMNS[2:-1])
+                + ", d.device FROM records r "
+                "LEFT JOIN sources s ON s.source_id = r.source_id "
+                "LEFT JOIN devices d ON d.device_id = r.device_id "
+                f"WHERE {where} ORDER BY r.record_id",
+                params,
+            )
+            rows = cursor.fetchall()
+            metadata = connection.execute(
+                "SELECT m.record_id, m.key, m.value FROM metadata m "
+                f"JOIN records r ON r.record_id = m.record_id WHERE {where}",
+                params,
+            ).fetchall()
+
+        ids = np.array([row[0] for row in rows], dtype=np.int64)
+        values = {
+            column: [row[n + 1] for row in rows]
+            for n, column in enumerate(RECORD_COLUMNS)
+        }
+        # Other columns (e.g. `motion_context`) are stored as metadata entries
+        for column, _ in columns:
+            if column not in values and column not in DEVICE_COLUMNS:
+                values[column] = [None] * len(rows)
+        positions = {record_id: n for n, record_id in enumerate(ids.tolist())}
+        for record_id, column, value in metadata:
+            values[column][positions[record_id]] = value
+
+        records = pd.DataFrame(
+            {
+                column: _from_sql_values(values[column], dtype)
+                for column, dtype in columns
+                if column not in DEVICE_COLUMNS
+            },
+            index=pd.RangeIndex(len(rows)),
+        )
+        records = add_device_columns(categorize(records))
+        records = filter_dates(records, start=start, end=end)
+        logger.info(f"Loaded {flag} ({len(records):,} records) from {self.path}")
+        return ParsedData(
+            flag=flag,
+            sources=json.loads(row[1]),
+            devices=json.loads(row[2]),
+            dates=set(get_local_time(records).dt.date) if len(records) else set(),
+            records=records,
+        )
+
+
+def _to_sql_values(series: pd.Series) -> list:
+    """
+    Convert a column of records to values of the database (None for missing values).
+
+    Dates and durations are stored as integers (in nanoseconds).
+
+    Args:
+        series (pd.Series): Column of records
+
+    Returns:
+        list: Values of the column
+    """
+    if isinstance(series.dtype, pd.DatetimeTZDtype):
+        series = series.dt.tz_convert(None)
+    if series.dtype.kind in "mM":
+        values = series.to_numpy()
+        ints = values.astype(f"{values.dtype.kind}8[ns]").view(np.int64)
+        return np.where(np.isnat(values), None, ints).tolist()
+    return series.astype(object).where(series.notna(), None).tolist()
+
+
+def _from_sql_values(values: list, dtype: str) -> pd.Series:
+    """
+    Convert values of the database back to a column of records, i.e. the inverse of
+    `_to_sql_values`. Categorical columns are converted afterwards (see `categorize`).
+
+    Args:
+        values (list): Values of the column
+        dtype (str): Dtype of the column (e.g. `"datetime64[ns, UTC]"`)
+
+    Returns:
+        pd.Series: Column of records
+    """
+    if dtype.startswith("datetime64"):
+        return pd.Series(pd.to_datetime(values, unit="ns", utc=True)).astype(dtype)
+    if dtype.startswith("timedelta64"):
+        return pd.Series(pd.to_timedelta(values, unit="ns")).astype(dtype)
+    if dtype == "category":
+        return pd.Series(values, dtype=object)
+    return pd.Series(values).astype(dtype)
@@ -0,0 +1,123 @@
+import re
+from dataclasses import asdict, dataclass, fields
+from functools import cache
+
+import pandas as pd
+
+from apple_health_parser.utils.categories import encode_categories
+from apple_health_parser.utils.logging import logger
+
+# Separator of the fields of a device string (e.g. `", hardware:"`)
+DEVICE_FIELD = re.compile(r", (\w+):")
+
+
+@dataclass(frozen=True)
+class Device:
+    """
+    Device of a record, parsed from its device string.
+
+    For example, `<<HKDevice: 0x9999zz000>, name:Apple Watch, manufacturer:Apple Inc.,
+    model:Watch, hardware:Watch6,7, software:10.6>` has the name `"Apple Watch"`, the
+    manufacturer `"Apple Inc."`, the model `"Watch"`, the hardware `"Watch6,7"` and the
+    software `"10.6"`. Missing fields are None.
+
+    Attributes:
+        name (str | None): Name of the device (e.g. `"Apple Watch"`)
+        manufacturer (str | None): Manufacturer of the device (e.g. `"Apple Inc."`)
+        model (str | None): Model of the device (e.g. `"Watch"`)
+        hardware (str | None): Hardware version of the device (e.g. `"Watch6,7"`)
+        software (str | None): Software version of the device (e.g. `"10.6"`)
+    """
+
+    name: str | None = None
+    manufacturer: str | None = None
+    model: str | None = None
+    hardware: str | None = None
+    software: str | None = None
+
+    @property
+    def label(self) -> str:
+        """
+        Name of the device with its hardware and software versions (e.g. `"Apple Watch (Watch6,7; 10.6)"`).
+        """
+        if self.software is None:
+            logger.debug(f"No software version found for {self.name} ({self.hardware})")
+            return f"{self.name} ({self.hardware})"
+        return f"{self.name} ({self.hardware}; {self.software})"
+
+
+# Fields of the devices, i.e. the columns of the device table
+DEVICE_FIELDS = [field.name for field in fields(Device)]
+# Columns of the records with the fields of their device
+DEVICE_COLUMNS = [f"device_{field}" for field in DEVICE_FIELDS]
+
+
+@cache
+def parse_device(device: str) -> Device:
+    """
+    Parse a device string, once per distinct string.
+
+    Args:
+        device (str): Device string of a record from the export.xml file
+
+    Returns:
+        Device: Parsed device
+    """
+    # e.g. ["<<HKDevice: 0x9999zz000>", "name", "Apple Watch", "manufacturer", ...]
+    parts = DEVICE_FIELD.split(device.removesuffix(">"))
+    values = dict(zip(parts[1::2], parts[2::2]))
+    return Device(**{field: values.get(field) for field in DEVICE_FIELDS})
+
+
+def get_device_table(devices: pd.Series) -> pd.DataFrame:
+    """
+    Get the device table of a device column, with the fields of each distinct device.
+
+    The table has one row per category of the (categorical) device column, so the codes
+    of the column are the ids of the devices in the table.
+
+    Args:
+        devices (pd.Series): Device strings of the records (e.g. `records.device`)
+
+    Returns:
+        pd.DataFrame: Fields of the devices (see `DEVICE_FIELDS`), indexed by device id
+    """
+    categories = devices.astype("category").cat.categories
+    # Object columns, so that missing fields stay None (and are not converted to NaN)
+    return pd.DataFrame(
+        [asdict(parse_device(device)) for device in categories],
+        columns=DEVICE_FIELDS,
+        index=pd.RangeIndex(len(categories), name="device_id"),
+        dtype=object,
+    )
+
+
+def add_device_columns(records: pd.DataFrame) -> pd.DataFrame:
+    """
+    Add the fields of the device of each record, as categorical columns after `device`.
+
+    Each distinct device is only parsed once (see `get_device_table`), and the columns
+    are built from the codes of the device column.
+
+    Args:
+        records (pd.DataFrame): Records, with or without a device column
+
+    Returns:
+        pd.DataFrame: Records with the device columns (see `DEVICE_COLUMNS`)
+    """
+    if "device" not in records.columns:
+        return records
+
+    records = records.drop(columns=DEVICE_COLUMNS, errors="ignore")
+    devices = records.device.astype("category")
+    table = get_device_table(devices)
+    codes = devices.cat.codes.to_numpy()
+
+    position = records.columns.get_loc("device") + 1
+    for n, field in enumerate(DEVICE_FIELDS):
+        records.insert(
+            position + n,
+            DEVICE_COLUMNS[n],
+            encode_categories(codes, table[field].tolist()),
+        )
+    return records
@@ -0,0 +1,559 @@
+import mmap
+import re
+from array import array
+from collections.abc import Iterator
+from datetime import date, datetime
+from functools import cached_property
+from html import unescape
+from pathlib import Path
+
+import lxml.etree as ET
+import numpy as np
+import pandas as pd
+
+from apple_health_parser.decorators import timeit
+from apple_health_parser.utils.logging import logger
+from apple_health_parser.utils.store import RecordStore
+
+RECORD_START = b"<Record"
+# Attributes of a start tag (single or double-quoted)
+ATTRIBUTES = rb"((?:\s+[^\s=/>]+\s*=\s*(?:\"[^\"]*\"|'[^']*'))*)"
+# Start tag of a record, with its attributes and whether it is empty
+RECORD = re.compile(RECORD_START + ATTRIBUTES + rb"\s*(/?)>")
+RECORD_END = b"</Record>"
+CORRELATION = re.compile(rb"<Correlation[\s>]")
+CORRELATION_END = b"</Correlation>"
+TYPE = b'type="'
+START_DATE = b'startDate="'
+SOURCE_NAME = b' sourceName="'
+DEVICE = b' device="'
+# Whitespace characters in attribute values, normalized to spaces by XML parsers
+WHITESPACE = str.maketrans("\t\n\r", "   ")
+
+# Code of a missing source or device
+MISSING = -1
+
+# Number of records parsed at once when reading slices
+BATCH_SIZE = 10_000
+# Minimum size of the chunks of records scanned at once (in bytes)
+CHUNK_SIZE = 16 * 1024 * 1024
+
+
+class RecordIndex:
+    """
+    Byte-offset index of the top-level records of an export.xml file.
+
+    For every record, the index holds its byte offset and length in the file, its flag,
+    its start date (in UTC), and its source and device (dictionary-encoded), in file
+    order. The records of a flag (and date range) can then be read by parsing only their
+    slices of the file, instead of the whole file, and the sources and devices of a flag
+    are known without parsing any record.
+
+    The index is persisted next to the XML file (e.g. `export.xml.index.npz`), and is
+    rebuilt whenever the size or modification time of the XML file changes.
+    """
+
+    SUFFIX = ".index.npz"
+
+    def __init__(
+        self,
+        xml_file: Path,
+        flags: list[str],
+        flag_ids: np.ndarray,
+        offsets: np.ndarray,
+        lengths: np.ndarray,
+        start_dates: np.ndarray,
+        sources: list[str],
+        source_ids: np.ndarray,
+        devices: list[str],
+        device_ids: np.ndarray,
+    ) -> None:
+        """
+        Initialize the RecordIndex.
+
+        Args:
+            xml_file (Path): Path to the XML file
+            flags (list[str]): Flags of the records, in order of first appearance
+            flag_ids (np.ndarray): Position in `flags` of the flag of each record
+            offsets (np.ndarray): Byte offset of each record
+            lengths (np.ndarray): Length (in bytes) of each record
+            start_dates (np.ndarray): Start date of each record (UTC `datetime64[s]`)
+            sources (list[str]): Sources of the records, in order of first appearance
+            source_ids (np.ndarray): Position in `sources` of the source of each record (`MISSING` if none)
+            devices (list[str]): Device strings of the records, in order of first appearance
+            device_ids (np.ndarray): Position in `devices` of the device of each record (`MISSING` if none)
+        """
+        self.xml_file = xml_file
+        self.flags = flags
+        self.flag_ids = flag_ids
+        self.offsets = offsets
+        self.lengths = lengths
+        self.start_dates = start_dates
+        self.sources = sources
+        self.source_ids = source_ids
+        self.devices = devices
+        self.device_ids = device_ids
+
+    @staticmethod
+    def get_path(xml_file: Path) -> Path:
+        """
+        Get the path of the index of an XML file.
+
+        Args:
+            xml_file (Path): Path to the XML file
+
+        Returns:
+            Path: Path to the index (e.g. `export.xml.index.npz`)
+        """
+        return xml_file.with_name(xml_file.name + RecordIndex.SUFFIX)
+
+    @staticmethod
+    def _get_stamp(xml_file: Path) -> np.ndarray:
+        stat = xml_file.stat()
+        return np.array([stat.st_size, stat.st_mtime_ns], dtype=np.int64)
+
+    @classmethod
+    def get(cls, xml_file: Path) -> "RecordIndex":
+        """
+        Load the index of an XML file, or build (and save) it if missing or outdated.
+
+        Args:
+            xml_file (Path): Path to the XML file
+
+        Returns:
+            RecordIndex: Index of the XML file
+        """
+        index = cls.load(xml_file)
+        if index is None:
+            index = cls.build(xml_file)
+            index.save()
+        return index
+
+    @classmethod
+    def load(cls, xml_file: Path) -> "RecordIndex | None":
+        """
+        Load the index of an XML file.
+
+        Args:
+            xml_file (Path): Path to the XML file
+
+        Returns:
+            RecordIndex | None: Index of the XML file, or None if missing or outdated
+        """
+        path = cls.get_path(xml_file)
+        if not path.exists():
+            return None
+
+        with np.load(path) as data:
+            # Indexes saved without the sources and devices of the records are outdated
+            if "device_ids" not in data or not np.array_equal(
+                data["stamp"], cls._get_stamp(xml_file)
+            ):
+                logger.info(f"Index {path} is outdated")
+                return None
+            logger.info(f"Loaded index {path}")
+            return cls(
+                xml_file=xml_file,
+                flags=data["flags"].tolist(),
+                flag_ids=data["flag_ids"],
+                offsets=data["offsets"],
+                lengths=data["lengths"],
+                start_dates=data["start_dates"],
+                sources=data["sources"].tolist(),
+                source_ids=data["source_ids"],
+                devices=data["devices"].tolist(),
+                device_ids=data["device_ids"],
+            )
+
+    def save(self) -> None:
+        """
+        Save the index next to the XML file.
+        """
+        path = self.get_path(self.xml_file)
+        with open(path, "wb") as file:
+            np.savez(
+                file,
+                stamp=self._get_stamp(self.xml_file),
+                flags=np.array(self.flags, dtype=str),
+                flag_ids=self.flag_ids,
+                offsets=self.offsets,
+                lengths=self.lengths,
+                start_dates=self.start_dates,
+                sources=np.array(self.sources, dtype=str),
+                source_ids=self.source_ids,
+                devices=np.array(self.devices, dtype=str),
+                device_ids=self.device_ids,
+            )
+        logger.info(f"Saved index to {path}")
+
+    @classmethod
+    @timeit
+    def build(cls, xml_file: Path) -> "RecordIndex":
+        """
+        Build the index of an XML file, scanning the (memory-mapped) file for records.
+
+        Records nested in a `Correlation` element are not top-level records, so they are
+        not indexed (as with `Loader.read_xml`).
+
+        Args:
+            xml_file (Path): Path to the XML file
+
+        Returns:
+            RecordIndex: Index of the XML file
+        """
+        logger.info(f"Indexing {xml_file}...")
+
+        flags: dict[bytes, int] = {}
+        flag_ids = array("h")
+        offsets = array("q")
+        lengths = array("i")
+        start_dates: list[bytes] = []
+        sources: dict[bytes, int] = {}
+        source_ids = array("i")
+        devices: dict[bytes, int] = {}
+        device_ids = array("i")
+
+        with (
+            open(xml_file, "rb") as file,
+            mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data,
+        ):
+            for start, _, end, attributes in iter_record_tags(data):
+                flag = get_attribute(attributes, TYPE)
+                flag_ids.append(flags.setdefault(flag, len(flags)))
+                start_dates.append(get_attribute(attributes, START_DATE))
+                offsets.append(start)
+                lengths.append(end - start)
+                for values, ids, name in (
+                    (sources, source_ids, SOURCE_NAME),
+                    (devices, device_ids, DEVICE),
+                ):
+                    if name in attributes:
+                        value = get_attribute(attributes, name)
+                        ids.append(values.setdefault(value, len(values)))
+                    else:
+                        ids.append(MISSING)
+
+        index = cls(
+            xml_file=xml_file,
+            flags=[flag.decode() for flag in flags],
+            flag_ids=np.frombuffer(flag_ids, dtype=np.int16),
+            offsets=np.frombuffer(offsets, dtype=np.int64),
+            lengths=np.frombuffer(lengths, dtype=np.int32),
+            start_dates=_parse_dates(start_dates),
+            sources=[_decode_value(source) for source in sources],
+            source_ids=np.frombuffer(source_ids, dtype=np.int32),
+            devices=[_decode_value(device) for device in devices],
+            device_ids=np.frombuffer(device_ids, dtype=np.int32),
+        )
+        logger.info(f"Indexed {len(index.flags)} flags with {len(offsets):,} records")
+        return index
+
+    @property
+    def counts(self) -> dict[str, int]:
+        """
+        Record count of each flag.
+        """
+        counts = np.bincount(self.flag_ids, minlength=len(self.flags))
+        return dict(zip(self.flags, counts.tolist()))
+
+    def get_sources(self, flag: str) -> list[str]:
+        """
+        Get the distinct sources of the records of a flag, without parsing them.
+
+        Args:
+            flag (str): Flag of the records
+
+        Returns:
+            list[str]: Distinct sources of the records
+        """
+        return self._get_values(flag, self.sources, self.source_ids)
+
+    def get_devices(self, flag: str) -> list[str]:
+        """
+        Get the distinct device strings of the records of a flag, without parsing them.
+
+        Args:
+            flag (str): Flag of the records
+
+        Returns:
+            list[str]: Distinct device strings of the records
+        """
+        return self._get_values(flag, self.devices, self.device_ids)
+
+    def _get_values(self, flag: str, values: list[str], ids: np.ndarray) -> list[str]:
+        codes = np.unique(ids[self.select(flag)])
+        return sorted(values[code] for code in codes.tolist() if code != MISSING)
+
+    def select(
+        self,
+        flag: str,
+        start: date | datetime | str | None = None,
+        end: date | datetime | str | None = None,
+    ) -> np.ndarray:
+        """
+        Select the records of a flag, optionally starting within a date range.
+
+        Dates without a timezone are taken as UTC.
+
+        Args:
+            flag (str): Flag of the records
+            start (date | datetime | str, optional): Start of the range (inclusive), defaults to None
+            end (date | datetime | str, optional): End of the range (exclusive), defaults to None
+
+        Returns:
+            np.ndarray: Positions of the selected records in the index
+        """
+        if flag not in self.flags:
+            return np.empty(0, dtype=np.intp)
+
+        mask = self.flag_ids == self.flags.index(flag)
+        if start is not None:
+            mask &= self.start_dates >= _to_utc(start)
+        if end is not None:
+            mask &= self.start_dates < _to_utc(end)
+        return np.flatnonzero(mask)
+
+    def read(
+        self,
+        flag: str,
+        start: date | datetime | str | None = None,
+        end: date | datetime | str | None = None,
+    ) -> list[ET.Element]:
+        """
+        Read the records of a flag (see `select`), parsing only their slices of the file.
+
+        Args:
+            flag (str): Flag of the records
+            start (date | datetime | str, optional): Start of the range (inclusive), defaults to None
+            end (date | datetime | str, optional): End of the range (exclusive), defaults to None
+
+        Returns:
+            list[ET.Element]: Records of the flag, in file order
+        """
+        return list(self.iter_records(self.select(flag, start, end)))
+
+    def iter_records(self, positions: np.ndarray) -> Iterator[ET.Element]:
+        """
+        Parse the records at the given positions of the index, in batches.
+
+        Args:
+            positions (np.ndarray): Positions of the records in the index
+
+        Yields:
+            ET.Element: Record element
+        """
+        with (
+            open(self.xml_file, "rb") as file,
+            mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data,
+        ):
+            for n in range(0, len(positions), BATCH_SIZE):
+                batch = positions[n : n + BATCH_SIZE]
+                chunk = b"".join(
+                    data[offset : offset + length]
+                    for offset, length in zip(
+                        self.offsets[batch].tolist(), self.lengths[batch].tolist()
+                    )
+                )
+                yield from ET.fromstring(
+                    b"<HealthData>" + chunk + b"</HealthData>",
+                    parser=ET.XMLParser(huge_tree=True),
+                )
+
+    def __len__(self) -> int:
+        return len(self.offsets)
+
+
+class IndexedRecords:
+    """
+    Records of a single flag, read from the export.xml file with a `RecordIndex`.
+
+    The slices of the records are only parsed when the records are needed, straight into
+    a `RecordStore` (see `read_store`), so the parsed elements are freed batch by batch.
+    """
+
+    def __init__(self, index: RecordIndex, flag: str) -> None:
+        """
+        Initialize the IndexedRecords for the given flag.
+
+        Args:
+            index (RecordIndex): Index of the export.xml file
+            flag (str): Flag of the records (e.g. `"HKQuantityTypeIdentifierHeartRate"`)
+        """
+        self.index = index
+        self.flag = flag
+        self.positions = index.select(flag)
+
+    def __len__(self) -> int:
+        return len(self.positions)
+
+    @cached_property
+    def sources(self) -> set[str]:
+        """
+        Distinct sources of the records (see `RecordIndex.get_sources`).
+        """
+        return set(self.index.get_sources(self.flag))
+
+    @cached_property
+    def devices(self) -> set[str]:
+        """
+        Distinct device strings of the records (see `RecordIndex.get_devices`).
+        """
+        return set(self.index.get_devices(self.flag))
+
+    def __iter__(self) -> Iterator[ET.Element]:
+        # The slices are parsed again on every iteration, and the elements are not kept
+        return self.index.iter_records(self.positions)
+
+    def read_store(
+        self,
+        start: date | datetime | str | None = None,
+        end: date | datetime | str | None = None,
+        limit: int | None = None,
+    ) -> RecordStore:
+        """
+        Parse the records of the flag (optionally starting within a date range, see
+        `RecordIndex.select`) into a store, only parsing their slices of the file.
+
+        Args:
+            start (date | datetime | str, optional): Start of the range (inclusive), defaults to None
+            end (date | datetime | str, optional): End of the range (exclusive), defaults to None
+            limit (int, optional): Maximum number of records to read, defaults to None (i.e. all records)
+
+        Returns:
+            RecordStore: Store of the records, in file order
+        """
+        positions = (
+            self.positions
+            if start is None and end is None
+            else self.index.select(self.flag, start, end)
+        )[:limit]
+        store = RecordStore(self.flag)
+        for rec in self.index.iter_records(positions):
+            store.append(rec)
+        store.flush()
+        return store
+
+
+def iter_record_chunks(
+    data: bytes | mmap.mmap, size: int = CHUNK_SIZE
+) -> Iterator[tuple[int, int]]:
+    """
+    Split an XML document into chunks of whole top-level records, without parsing it.
+
+    Chunks start at a record and end right before another record (or a `Correlation`
+    element), so that records nested in a `Correlation` element are left out.
+
+    Args:
+        data (bytes | mmap.mmap): XML document (e.g. a memory-mapped export.xml file)
+        size (int): Minimum size of the chunks (in bytes), defaults to `CHUNK_SIZE`
+
+    Yields:
+        tuple[int, int]: Start and end offsets of a chunk
+    """
+    # Correlation elements are rare, so their spans are located upfront
+    spans = [
+        (match.start(), data.find(CORRELATION_END, match.end()) + len(CORRELATION_END))
+        for match in CORRELATION.finditer(data)
+    ]
+    spans.append((len(data), len(data)))
+
+    find = data.find
+    pos = find(RECORD_START)
+    for span_start, span_end in spans:
+        while -1 < pos < span_start:
+            end = find(RECORD_START, pos + size, span_start)
+            if end == -1:
+                end = span_start
+            yield pos, end
+            pos = find(RECORD_START, end)
+        if pos != -1 and pos < span_end:
+            pos = find(RECORD_START, span_end)
+
+
+def iter_record_tags(
+    data: bytes | mmap.mmap,
+) -> Iterator[tuple[int, int, int, bytes]]:
+    """
+    Scan an XML document for its top-level records, without parsing it.
+
+    Records nested in a `Correlation` element are skipped.
+
+    Args:
+        data (bytes | mmap.mmap): XML document (e.g. a memory-mapped export.xml file)
+
+    Yields:
+        tuple[int, int, int, bytes]: Start offset of a record, end offset of its start tag, end offset of the record, and the attributes of its start tag (e.g. `b' type="..." value="..."'`)
+    """
+    find = data.find
+    for pos, endpos in iter_record_chunks(data):
+        for match in RECORD.finditer(data, pos, endpos):
+            attributes, closed = match.group(1, 2)
+            tag_end = match.end()
+            if closed:  # The record has no children
+                yield match.start(), tag_end, tag_end, attributes
+            else:
+                end = find(RECORD_END, tag_end) + len(RECORD_END)
+                yield match.start(), tag_end, end, attributes
+
+
+def get_attribute(tag: bytes, name: bytes) -> bytes:
+    """
+    Get the raw value of a (double-quoted) attribute from the start tag of an element.
+
+    Args:
+        tag (bytes): Start tag of the element, or its attributes (e.g. `b' type="..." ...'`)
+        name (bytes): Name of the attribute, followed by `="` (e.g. `b'type="'`)
+
+    Returns:
+        bytes: Value of the attribute (not unescaped)
+    """
+    start = tag.find(name) + len(name)
+    return tag[start : tag.find(b'"', start)]
+
+
+def _decode_value(value: bytes) -> str:
+    """
+    Decode the raw value of an attribute, as parsed by lxml (i.e. with whitespace
+    characters normalized to spaces, and entities unescaped).
+
+    Args:
+        value (bytes): Raw value of the attribute (e.g. `b"&lt;&lt;HKDevice...&gt;"`)
+
+    Returns:
+        str: Value of the attribute
+    """
+    return unescape(value.decode().translate(WHITESPACE))
+
+
+def _parse_dates(dates: list[bytes]) -> np.ndarray:
+    """
+    Parse dates of the export.xml file (e.g. `b"2024-05-29 22:20:35 +0200"`) to UTC.
+
+    Args:
+        dates (list[bytes]): Dates from the export.xml file
+
+    Returns:
+        np.ndarray: UTC dates (`datetime64[s]`)
+    """
+    parsed = pd.to_datetime(
+        pd.Series(dates, dtype=object).str.decode("ascii"),
+        format="%Y-%m-%d %H:%M:%S %z",
+        utc=True,
+    )
+    return parsed.dt.tz_convert(None).to_numpy(dtype="datetime64[s]")
+
+
+def _to_utc(value: date | datetime | str) -> np.datetime64:
+    """
+    Convert a date to a UTC `datetime64[s]`, taking dates without a timezone as UTC.
+
+    Args:
+        value (date | datetime | str): Date
+
+    Returns:
+        np.datetime64: UTC date
+    """
+    timestamp = pd.Timestamp(value)
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.tz_convert(None)
+    return np.datetime64(timestamp, "s")
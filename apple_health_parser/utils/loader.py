@@ -1,13 +1,68 @@
+import json
 import re
-from pathlib import Path
+from collections.abc import Iterator
+from dataclasses import dataclass
+from pathlib import Path, PurePosixPath
 from shutil import rmtree
-from zipfile import ZipFile
+from typing import IO
+from zipfile import ZipFile, ZipInfo
 
 import click
 import lxml.etree as ET
 
 from apple_health_parser.decorators import timeit
+from apple_health_parser.exceptions import MissingExportFile
 from apple_health_parser.utils.logging import logger
+from apple_health_parser.utils.manifest import ManifestBuilder
+from apple_health_parser.utils.pipeline import DecompressionPipeline
+
+
+@dataclass(frozen=True)
+class ZipMember:
+    """
+    File inside a zip archive, decompressed on the fly whenever it is opened.
+
+    Attributes:
+        archive (ZipFile): The (open) zip archive
+        name (str): The name of the file in the archive (e.g. `"apple_health_export/export.xml"`)
+    """
+
+    archive: ZipFile
+    name: str
+
+    def open(self, mode: str = "rb") -> IO[bytes]:
+        """
+        Open the file for (streamed) binary reading.
+
+        Args:
+            mode (str): Mode to open the file with, only `"rb"` is supported
+
+        Raises:
+            ValueError: Mode is not `"rb"`
+
+        Returns:
+            IO[bytes]: File object decompressing the file as it is read
+        """
+        if mode != "rb":
+            raise ValueError(
+                f"Zip members can only be opened with mode 'rb', not {mode!r}"
+            )
+        return self.archive.open(self.name)
+
+    def close(self) -> None:
+        """
+        Close the zip archive (a file object given to `Loader.open_zip` is left open).
+        """
+        self.archive.close()
+
+    def __enter__(self) -> "ZipMember":
+        return self
+
+    def __exit__(self, *args: object) -> None:
+        self.close()
+
+    def __str__(self) -> str:
+        return f"{self.archive.filename or '<zip>'}/{self.name}"
 
 
 class Loader:
@@ -15,17 +70,31 @@ class Loader:
     Loader class to extract and read an XML file from the Apple Health `export.zip` file.
     """
 
+    # Manifest of the last extraction, written in the extracted export directory
+    EXTRACTION_MANIFEST = ".extraction.json"
+
     @staticmethod
     def extract_zip(
-        zip_file: str | Path, output_dir: str | Path, overwrite: bool | None = None
+        zip_file: str | Path,
+        output_dir: str | Path,
+        overwrite: bool | None = None,
+        members: list[str] | None = None,
     ) -> Path:
         """
-        Extracts a zip file to an output directory.
+        Extracts the export.xml file (and optionally other members) of a zip file to an output directory.
+
+        The CRCs and sizes of the extracted members (from the central directory of the zip
+        file) are written to a manifest in the export directory. When a later extraction
+        finds the same members there, the zip file is not extracted again.
 
         Args:
             zip_file (str | Path): The zip file to extract
             output_dir (str | Path): The output directory to extract the file to
             overwrite (bool, optional): Flag to overwrite the existing data, defaults to None
+            members (list[str], optional): Other members to extract, relative to the export directory (e.g. `["workout-routes", "export_cda.xml"]`), defaults to None
+
+        Raises:
+            MissingExportFile: No export.xml file in the zip file
 
         Returns:
             Path: The absolute path to the extracted file
@@ -36,24 +105,167 @@ class Loader:
         if isinstance(output_dir, str):
             output_dir = Path(output_dir)
 
-        export_dir = output_dir / "apple_health_export"
+        with ZipFile(zip_file, "r") as data:
+            member = Loader.find_export_xml(data)
+            xml_file = (output_dir / member.name).resolve()
+            export_dir = output_dir / PurePosixPath(member.name).parent
 
-        # Check if output directory exists and delete it if it does and "y" or "yes" is entered
-        if export_dir.exists():
-            Loader.delete_previous_export(export_dir, overwrite)
+            infos = Loader._get_members(data, member.name, members)
+            fingerprint = {info.filename: [info.CRC, info.file_size] for info in infos}
+            if Loader._is_extracted(output_dir, export_dir, fingerprint):
+                logger.info(f"Reusing the export extracted at {export_dir}...")
+                return xml_file
 
-        # Extract the zip file
-        with ZipFile(zip_file, "r") as data:
+            # Check if output directory exists and delete it if it does and "y" or "yes" is entered
+            if export_dir.exists() and export_dir != output_dir:
+                Loader.delete_previous_export(export_dir, overwrite)
+
+            # Extract the zip file
             logger.info(f"Extracting {zip_file} to {output_dir}...")
-            data.extractall(output_dir)
+            for info in infos:
+                data.extract(info, output_dir)
+
+            # Log the compressed and uncompressed file sizes
+            Loader._log_zip_sizes(data)
+
+        with open(export_dir / Loader.EXTRACTION_MANIFEST, "w") as file:
+            json.dump(fingerprint, file)
+
+        return xml_file
+
+    @staticmethod
+    def _get_members(
+        archive: ZipFile, xml_name: str, members: list[str] | None
+    ) -> list[ZipInfo]:
+        """
+        Get the members of a zip file to extract: the export.xml file, and the requested members.
+
+        Args:
+            archive (ZipFile): The zip file
+            xml_name (str): Name of the export.xml file in the zip file
+            members (list[str] | None): Other members (or directories) to extract, relative to the export directory
+
+        Returns:
+            list[ZipInfo]: Members to extract
+        """
+        root = PurePosixPath(xml_name).parent
+        prefixes = [member.strip("/") for member in members or []]
+        infos = []
+        for info in archive.infolist():
+            # Parent directories are created when extracting their files
+            if info.is_dir():
+                continue
+            # e.g. "apple_health_export/workout-routes/route.gpx" -> "workout-routes/route.gpx"
+            path = PurePosixPath(info.filename)
+            if not path.is_relative_to(root):
+                continue
+            name = path.relative_to(root).as_posix()
+            if info.filename == xml_name or any(
+                name == prefix or name.startswith(prefix + "/") for prefix in prefixes
+            ):
+                infos.append(info)
+        return infos
+
+    @staticmethod
+    def _is_extracted(
+        output_dir: Path, export_dir: Path, fingerprint: dict[str, list[int]]
+    ) -> bool:
+        """
+        Check whether members of a zip file were already extracted, from the manifest of the last extraction.
+
+        Args:
+            output_dir (Path): The output directory the files were extracted to
+            export_dir (Path): The extracted export directory
+            fingerprint (dict[str, list[int]]): CRC and size of each member, by name
+
+        Returns:
+            bool: Whether every member was extracted, and is unchanged since
+        """
+        path = export_dir / Loader.EXTRACTION_MANIFEST
+        if not path.exists():
+            return False
+
+        with open(path) as file:
+            extracted = json.load(file)
+
+        for name, (crc, size) in fingerprint.items():
+            if extracted.get(name) != [crc, size]:
+                return False
+            target = output_dir / name
+            if not target.is_file() or target.stat().st_size != size:
+                return False
+        return True
+
+    @staticmethod
+    def open_zip(zip_file: str | Path | IO[bytes]) -> ZipMember:
+        """
+        Locate the export.xml file in a zip file, without extracting anything to disk.
+
+        The export.xml file is decompressed on the fly whenever it is read. The zip file is
+        kept open until the member is closed (e.g. `with Loader.open_zip(...) as member:`).
+
+        Args:
+            zip_file (str | Path | IO[bytes]): The zip file, or a binary file object of the zip file
+
+        Raises:
+            MissingExportFile: No export.xml file in the zip file
 
-        # Log the compressed and uncompressed file sizes
-        file_size = zip_file.stat().st_size
-        dir_size = sum(f.stat().st_size for f in output_dir.glob("**/*") if f.is_file())
-        logger.info(f"Compressed: {file_size / 1e6:.2f} MB")
-        logger.info(f"Uncompressed: {dir_size / 1e6:.2f} MB")
+        Returns:
+            ZipMember: The export.xml file in the zip file
+        """
+        archive = ZipFile(zip_file, "r")
+        try:
+            member = Loader.find_export_xml(archive)
+        except MissingExportFile:
+            archive.close()
+            raise
+        logger.info(f"Reading {member} without extracting...")
+        Loader._log_zip_sizes(member.archive)
 
-        return (export_dir / "export.xml").resolve()
+        return member
+
+    @staticmethod
+    def find_export_xml(archive: ZipFile) -> ZipMember:
+        """
+        Find the export.xml file in an (open) zip file.
+
+        Args:
+            archive (ZipFile): The zip file
+
+        Raises:
+            MissingExportFile: No export.xml file in the zip file
+
+        Returns:
+            ZipMember: The export.xml file in the zip file
+        """
+        # Skip macOS resource forks (e.g. "__MACOSX/apple_health_export/._export.xml")
+        candidates = [
+            name
+            for name in archive.namelist()
+            if PurePosixPath(name).name == "export.xml"
+            and not name.startswith("__MACOSX/")
+        ]
+        if not candidates:
+            raise MissingExportFile(str(archive.filename or "zip file"))
+
+        return ZipMember(
+            archive=archive,
+            name=min(candidates, key=lambda name: len(PurePosixPath(name).parts)),
+        )
+
+    @staticmethod
+    def _log_zip_sizes(archive: ZipFile) -> None:
+        """
+        Log the compressed and uncompressed sizes of a zip file from its central directory.
+
+        Args:
+            archive (ZipFile): The zip file
+        """
+        infos = archive.infolist()
+        compressed = sum(info.compress_size for info in infos)
+        uncompressed = sum(info.file_size for info in infos)
+        logger.info(f"Compressed: {compressed / 1e6:.2f} MB")
+        logger.info(f"Uncompressed: {uncompressed / 1e6:.2f} MB")
 
     @staticmethod
     def delete_previous_export(output_dir: Path, overwrite: bool | None) -> None:
@@ -75,24 +287,198 @@ class Loader:
                 rmtree(output_dir)
                 logger.warning(f"Deleted previous export at {output_dir}...")
 
+    @staticmethod
+    def _open_xml(xml_file: str | Path | ZipMember) -> IO[bytes]:
+        """
+        Open an XML file for binary reading, either from disk or from a zip file.
+
+        Args:
+            xml_file (str | Path | ZipMember): Path to the XML file, or XML file in a zip file
+
+        Returns:
+            IO[bytes]: File object
+        """
+        if isinstance(xml_file, str):
+            xml_file = Path(xml_file)
+        return xml_file.open("rb")
+
     @staticmethod
     @timeit
-    def read_xml(xml_file: Path) -> list[ET.Element]:
+    def read_xml(
+        xml_file: Path | ZipMember, pipeline: DecompressionPipeline | None = None
+    ) -> list[ET.Element]:
         """
         Read an XML file and return the root element.
 
+        With a pipeline, the file is read (i.e. decompressed) in a background thread,
+        and fed to the parser as it comes.
+
         Args:
-            xml_file (Path): Path to the XML file
+            xml_file (Path | ZipMember): Path to the XML file, or XML file in a zip file
+            pipeline (DecompressionPipeline, optional): Pipeline to read the file with, defaults to None
 
         Returns:
             list[ET.Element]: List of records
         """
         logger.info(f"Processing {xml_file}...")
-        with open(xml_file, "r") as file:
-            root = ET.parse(file).getroot()
+        with Loader._open_xml(xml_file) as file:
+            if pipeline is None:
+                root = ET.parse(file).getroot()
+            else:
+                parser = ET.XMLParser()
+                with pipeline.stream(file) as buffers:
+                    for buffer in buffers:
+                        parser.feed(buffer)
+                root = parser.close()
             Loader._log_metadata(root)
             return root.findall("Record")
 
+    @staticmethod
+    def iter_xml(
+        xml_file: Path | ZipMember,
+        log_metadata: bool = True,
+        retain: bool = False,
+        pipeline: DecompressionPipeline | None = None,
+    ) -> Iterator[ET.Element]:
+        """
+        Stream the records of an XML file, one at a time.
+
+        Unlike `read_xml`, the tree is never fully held in memory: every top-level element
+        is detached from the root once it has been consumed, so peak memory stays flat
+        regardless of the size of the export. The `ExportDate` and `Me` elements are kept
+        until the first record is reached, so that metadata can still be logged.
+
+        By default, a yielded record is also cleared as soon as the next one is requested,
+        so its attributes and children must be read before advancing the iterator.
+        With `retain=True`, records are left intact instead, and are freed once the
+        caller no longer holds a reference to them.
+
+        Args:
+            xml_file (Path | ZipMember): Path to the XML file, or XML file in a zip file
+            log_metadata (bool): Flag to log metadata from the XML file, defaults to True
+            retain (bool): Flag to keep the yielded records intact, defaults to False
+            pipeline (DecompressionPipeline, optional): Pipeline to read the file with (see `read_xml`), defaults to None
+
+        Yields:
+            ET.Element: Record element
+        """
+        if log_metadata:
+            logger.info(f"Streaming {xml_file}...")
+
+        with Loader._open_xml(xml_file) as file:
+            yield from Loader._iter_records(file, log_metadata, retain, pipeline)
+
+    @staticmethod
+    def _iter_events(
+        file: IO[bytes], pipeline: DecompressionPipeline | None = None
+    ) -> Iterator[tuple[str, ET.Element]]:
+        """
+        Parse the start and end events of an open XML file, optionally through a pipeline.
+
+        Args:
+            file (IO[bytes]): XML file object
+            pipeline (DecompressionPipeline, optional): Pipeline to read the file with, defaults to None
+
+        Yields:
+            tuple[str, ET.Element]: Event (`"start"` or `"end"`) and element
+        """
+        if pipeline is None:
+            yield from ET.iterparse(file, events=("start", "end"), huge_tree=True)
+            return
+
+        parser = ET.XMLPullParser(events=("start", "end"), huge_tree=True)
+        with pipeline.stream(file) as buffers:
+            for buffer in buffers:
+                parser.feed(buffer)
+                yield from parser.read_events()
+        parser.close()
+        yield from parser.read_events()
+
+    @staticmethod
+    def _iter_records(
+        file: IO[bytes],
+        log_metadata: bool,
+        retain: bool,
+        pipeline: DecompressionPipeline | None = None,
+    ) -> Iterator[ET.Element]:
+        """
+        Stream the records of an open XML file (see `iter_xml`).
+
+        Args:
+            file (IO[bytes]): XML file object
+            log_metadata (bool): Flag to log metadata from the XML file
+            retain (bool): Flag to keep the yielded records intact
+            pipeline (DecompressionPipeline, optional): Pipeline to read the file with, defaults to None
+
+        Yields:
+            ET.Element: Record element
+        """
+        root: ET.Element | None = None
+        depth = 0
+        seen_record = False
+
+        for event, elem in Loader._iter_events(file, pipeline):
+            if event == "start":
+                if root is None:
+                    root = elem
+                depth += 1
+                continue
+
+            depth -= 1
+            # Only top-level elements (i.e. direct children of the root) are handled
+            if depth != 1:
+                continue
+
+            if elem.tag == "Record":
+                if not seen_record:
+                    seen_record = True
+                    if log_metadata:
+                        Loader._log_metadata(root)
+                    # Free the elements preceding the first record (e.g. `ExportDate`, `Me`)
+                    while elem.getprevious() is not None:
+                        del root[0]
+                yield elem
+
+            if seen_record:
+                # Free the consumed element, unless it is a record retained by the caller
+                if not (retain and elem.tag == "Record"):
+                    elem.clear()
+                root.remove(elem)
+
+        if not seen_record and log_metadata and root is not None:
+            Loader._log_metadata(root)
+
+    @staticmethod
+    def _log_header(xml_file: Path | ZipMember, end: int | None) -> None:
+        """
+        Log metadata from the header of an XML file (i.e. everything before the first record).
+
+        Args:
+            xml_file (Path | ZipMember): Path to the XML file, or XML file in a zip file
+            end (int | None): Offset of the first record, or None to read the whole file
+        """
+        with Loader._open_xml(xml_file) as file:
+            header = file.read() if end is None else file.read(end) + b"</HealthData>"
+        Loader._log_metadata(ET.fromstring(header))
+
+    @staticmethod
+    def get_export_date(xml_file: Path | ZipMember) -> str | None:
+        """
+        Get the export date of an XML file, only reading the file up to the first record.
+
+        Args:
+            xml_file (Path | ZipMember): Path to the XML file, or XML file in a zip file
+
+        Returns:
+            str | None: Export date (e.g. `"2024-05-29 22:20:35 +0200"`), or None if missing
+        """
+        with Loader._open_xml(xml_file) as file:
+            for _, elem in ET.iterparse(file, tag=("ExportDate", "Record")):
+                if elem.tag == "ExportDate":
+                    return elem.attrib.get("value")
+                return None
+        return None
+
     @staticmethod
     def _log_metadata(root: ET.Element) -> None:
         """
@@ -153,3 +539,80 @@ class Loader:
         get_locale()
         get_export_date()
         get_user()
+
+
+class RecordStream:
+    """
+    Re-iterable view over the records of a single flag, streamed from the XML file.
+
+    Only a small summary of the records (see `ManifestBuilder`, e.g. count, attribute
+    keys, distinct sources and devices) is kept in memory. Every iteration streams the
+    records again from disk with `Loader.iter_xml`, so the same caveat applies: a
+    yielded record is cleared as soon as the next one is requested.
+    """
+
+    def __init__(
+        self,
+        xml_file: Path | ZipMember,
+        flag: str,
+        pipeline: DecompressionPipeline | None = None,
+    ) -> None:
+        """
+        Initialize the RecordStream for the given flag.
+
+        Args:
+            xml_file (Path | ZipMember): Path to the XML file, or XML file in a zip file
+            flag (str): Flag of the records (e.g. `"HKQuantityTypeIdentifierHeartRate"`)
+            pipeline (DecompressionPipeline, optional): Pipeline to read the file with, defaults to None
+        """
+        self.xml_file = xml_file
+        self.flag = flag
+        self.pipeline = pipeline
+        self.summary = ManifestBuilder(flag)
+
+    def add(self, rec: ET.Element) -> None:
+        """
+        Add a record to the summary.
+
+        Args:
+            rec (ET.Element): Record from the export.xml file
+        """
+        self.summary.add(rec)
+
+    @property
+    def count(self) -> int:
+        """
+        Number of records.
+        """
+        return self.summary.count
+
+    @property
+    def keys(self) -> set[str]:
+        """
+        Attribute names of the records (e.g. `{"sourceName", "unit", ...}`).
+        """
+        return self.summary.keys
+
+    @property
+    def sources(self) -> set[str]:
+        """
+        Distinct sources of the records.
+        """
+        return self.summary.sources
+
+    @property
+    def devices(self) -> set[str]:
+        """
+        Distinct device strings of the records.
+        """
+        return self.summary.devices
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __iter__(self) -> Iterator[ET.Element]:
+        for rec in Loader.iter_xml(
+            self.xml_file, log_metadata=False, pipeline=self.pipeline
+        ):
+            if rec.attrib["type"] == self.flag:
+                yield rec
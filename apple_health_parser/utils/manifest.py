@@ -0,0 +1,202 @@
+from collections.abc import Iterable
+from dataclasses import dataclass
+from datetime import datetime
+
+import lxml.etree as ET
+import numpy as np
+import pandas as pd
+
+from apple_health_parser.utils.store import RecordStore
+from apple_health_parser.utils.timestamps import get_local_time
+
+# Local (wall-clock) part of a date of the export (e.g. `"2024-03-31 01:30:00"`)
+LOCAL_DATE_LENGTH = 19
+
+
+@dataclass(frozen=True)
+class FlagManifest:
+    """
+    Summary of the records of a flag, built once so that it can be looked up for free.
+
+    Dates are local (wall-clock) start dates, as used to select the records of a year.
+
+    Attributes:
+        flag (str): Flag of the records
+        count (int): Number of records
+        first (datetime | None): Earliest local start date (None if there is no record)
+        last (datetime | None): Latest local start date (None if there is no record)
+        years (list[int]): Years of the local start dates
+        sources (list[str]): Distinct sources of the records
+        devices (list[str]): Distinct device strings of the records
+        units (list[str]): Distinct units of the records
+        keys (list[str]): Attributes of the records (e.g. `"sourceName"`), or columns of parsed records
+    """
+
+    flag: str
+    count: int
+    first: datetime | None
+    last: datetime | None
+    years: list[int]
+    sources: list[str]
+    devices: list[str]
+    units: list[str]
+    keys: list[str]
+
+
+class ManifestBuilder:
+    """
+    Builder of the manifest of a flag, updated record by record (e.g. while streaming).
+
+    Dates are compared as strings, which are zero-padded (`YYYY-MM-DD HH:MM:SS`).
+    """
+
+    def __init__(self, flag: str) -> None:
+        """
+        Initialize the ManifestBuilder for the given flag.
+
+        Args:
+            flag (str): Flag of the records
+        """
+        self.flag = flag
+        self.count = 0
+        self.first: str | None = None
+        self.last: str | None = None
+        self.years: set[int] = set()
+        self.sources: set[str] = set()
+        self.devices: set[str] = set()
+        self.units: set[str] = set()
+        self.keys: set[str] = set()
+
+    def add(self, rec: ET.Element) -> None:
+        """
+        Add a record to the manifest.
+
+        Args:
+            rec (ET.Element): Record from the export.xml file
+        """
+        # Element methods are used, as `rec.attrib` builds a new proxy on every access
+        self.count += 1
+        self.keys.update(rec.keys())
+        self.sources.add(rec.get("sourceName"))
+        for values, key in ((self.devices, "device"), (self.units, "unit")):
+            value = rec.get(key)
+            if value is not None:
+                values.add(value)
+        start = rec.get("startDate")
+        if start is not None:
+            local = start[:LOCAL_DATE_LENGTH]
+            if self.first is None or local < self.first:
+                self.first = local
+            if self.last is None or local > self.last:
+                self.last = local
+            self.years.add(int(start[:4]))
+
+    def build(self) -> FlagManifest:
+        """
+        Build the manifest of the records added so far.
+
+        Returns:
+            FlagManifest: Manifest of the records
+        """
+        return FlagManifest(
+            flag=self.flag,
+            count=self.count,
+            first=None if self.first is None else datetime.fromisoformat(self.first),
+            last=None if self.last is None else datetime.fromisoformat(self.last),
+            years=sorted(self.years),
+            sources=sorted(self.sources),
+            devices=sorted(self.devices),
+            units=sorted(self.units),
+            keys=sorted(self.keys),
+        )
+
+
+def get_elements_manifest(flag: str, records: Iterable[ET.Element]) -> FlagManifest:
+    """
+    Get the manifest of the records of a flag, as lxml elements.
+
+    Args:
+        flag (str): Flag of the records
+        records (Iterable[ET.Element]): Records from the export.xml file
+
+    Returns:
+        FlagManifest: Manifest of the records
+    """
+    builder = ManifestBuilder(flag)
+    for rec in records:
+        builder.add(rec)
+    return builder.build()
+
+
+def get_store_manifest(store: RecordStore) -> FlagManifest:
+    """
+    Get the manifest of the records of a store.
+
+    The distinct values are the vocabularies of the store, and the dates are found from
+    the encoded dates (dates which do not follow the usual format are left out).
+
+    Args:
+        store (RecordStore): Store of the records
+
+    Returns:
+        FlagManifest: Manifest of the records
+    """
+    keys = store.keys
+    first = last = None
+    years: list[int] = []
+    if "startDate" in keys:
+        utc, offsets, parsed = store.get_dates("startDate")
+        local = utc[parsed] + offsets[parsed].astype("timedelta64[m]")
+        if len(local):
+            first, last = local.min().item(), local.max().item()
+            # Years since 1970 of the local dates
+            years = (
+                np.unique(local.astype("datetime64[Y]").astype(int)) + 1970
+            ).tolist()
+
+    return FlagManifest(
+        flag=store.flag,
+        count=len(store),
+        first=first,
+        last=last,
+        years=years,
+        sources=sorted(store.sources),
+        devices=sorted(store.devices),
+        units=sorted(store.vocabularies.get("unit", {})),
+        keys=sorted(keys),
+    )
+
+
+def get_records_manifest(flag: str, records: pd.DataFrame) -> FlagManifest:
+    """
+    Get the manifest of parsed records (e.g. `ParsedData.records`).
+
+    Args:
+        flag (str): Flag of the records
+        records (pd.DataFrame): Parsed records
+
+    Returns:
+        FlagManifest: Manifest of the records
+    """
+    if records.empty:
+        return FlagManifest(flag, 0, None, None, [], [], [], [], list(records.columns))
+
+    local = get_local_time(records)
+
+    def distinct(column: str) -> list[str]:
+        if column not in records.columns:
+            return []
+        # Distinct values of categorical columns are found from their codes
+        return sorted(records[column].dropna().unique().tolist())
+
+    return FlagManifest(
+        flag=flag,
+        count=len(records),
+        first=local.min().to_pydatetime(),
+        last=local.max().to_pydatetime(),
+        years=sorted(local.dt.year.unique().tolist()),
+        sources=distinct("source_name"),
+        devices=distinct("device"),
+        units=distinct("unit"),
+        keys=list(records.columns),
+    )
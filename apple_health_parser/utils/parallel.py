@@ -0,0 +1,224 @@
+import mmap
+import re
+from concurrent.futures import Future, ProcessPoolExecutor
+from datetime import date
+from io import BytesIO
+from itertools import repeat
+from pathlib import Path
+
+import pandas as pd
+
+from apple_health_parser.decorators import timeit
+from apple_health_parser.utils.batch import RecordBatch
+from apple_health_parser.utils.builder import build_flag
+from apple_health_parser.utils.loader import Loader
+from apple_health_parser.utils.logging import logger
+from apple_health_parser.utils.store import RecordStore
+
+# Minimum size of a chunk (in bytes), smaller files are parsed in fewer chunks
+MIN_CHUNK_SIZE = 1 << 22
+
+# Number of chunks per worker, to balance the load between workers
+CHUNKS_PER_WORKER = 4
+
+RECORD_TAG = re.compile(rb"<Record[\s/>]")
+CORRELATION_START = b"<Correlation"
+CORRELATION_END = b"</Correlation>"
+ROOT_END = b"</HealthData>"
+
+
+def get_chunks(
+    xml_file: Path, n_chunks: int, min_chunk_size: int = MIN_CHUNK_SIZE
+) -> list[tuple[int, int]]:
+    """
+    Split an XML file into byte ranges aligned on top-level `<Record` tags.
+
+    The ranges cover the file from the first record up to the closing `</HealthData>` tag.
+    Records nested in a `Correlation` element are not top-level records, so ranges never
+    start inside a `Correlation` element.
+
+    Args:
+        xml_file (Path): Path to the XML file
+        n_chunks (int): Number of chunks to split the file into
+        min_chunk_size (int): Minimum size of a chunk (in bytes), defaults to `MIN_CHUNK_SIZE`
+
+    Returns:
+        list[tuple[int, int]]: Start and end offsets of each chunk
+    """
+    with (
+        open(xml_file, "rb") as file,
+        mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data,
+    ):
+        end = data.rfind(ROOT_END)
+
+        offsets: list[int] = []
+        chunk_size = 0
+        target = 0
+        while target < end:
+            match = RECORD_TAG.search(data, target, end)
+            if match is None:
+                break
+            offset = match.start()
+
+            # Move past the end of the Correlation element the offset falls in, if any
+            previous = offsets[-1] if offsets else 0
+            if data.rfind(CORRELATION_START, previous, offset) > data.rfind(
+                CORRELATION_END, previous, offset
+            ):
+                target = data.find(CORRELATION_END, offset, end)
+                if target == -1:
+                    break
+                continue
+
+            if not offsets:
+                chunk_size = max((end - offset) // max(n_chunks, 1), min_chunk_size, 1)
+            offsets.append(offset)
+            target = offset + chunk_size
+
+        if not offsets:
+            return []
+
+        offsets.append(end)
+        return list(zip(offsets[:-1], offsets[1:]))
+
+
+def parse_chunk(
+    xml_file: Path,
+    start: int,
+    end: int,
+    include_flags: set[str] | None = None,
+    exclude_flags: set[str] | None = None,
+) -> tuple[dict[str, RecordBatch], dict[str, int]]:
+    """
+    Parse the top-level records in a byte range of an XML file into per-flag batches.
+
+    Args:
+        xml_file (Path): Path to the XML file
+        start (int): Start offset of the chunk (at a top-level `<Record` tag)
+        end (int): End offset of the chunk
+        include_flags (set[str], optional): Flags to keep the records of, defaults to None (i.e. all flags)
+        exclude_flags (set[str], optional): Flags to discard the records of, defaults to None
+
+    Returns:
+        tuple[dict[str, RecordBatch], dict[str, int]]: Batches by flag, and count of discarded records by flag
+    """
+    with open(xml_file, "rb") as file:
+        file.seek(start)
+        chunk = b"<HealthData>" + file.read(end - start) + ROOT_END
+
+    batches: dict[str, RecordBatch] = {}
+    discarded: dict[str, int] = {}
+    for rec in Loader._iter_records(BytesIO(chunk), log_metadata=False, retain=False):
+        flag = rec.attrib["type"]
+        if (include_flags is not None and flag not in include_flags) or (
+            exclude_flags and flag in exclude_flags
+        ):
+            discarded[flag] = discarded.get(flag, 0) + 1
+            continue
+        if flag not in batches:
+            batches[flag] = RecordBatch(flag)
+        batches[flag].append(rec)
+
+    return batches, discarded
+
+
+@timeit
+def read_xml_parallel(
+    xml_file: Path,
+    workers: int,
+    include_flags: set[str] | None = None,
+    exclude_flags: set[str] | None = None,
+) -> tuple[dict[str, RecordBatch], dict[str, int]]:
+    """
+    Parse the records of an XML file in parallel, with one process per worker.
+
+    The file is split into byte ranges aligned on top-level records (see `get_chunks`),
+    which are parsed into per-flag batches by a pool of processes. The batches are merged
+    in file order, so the result is identical to parsing the file serially.
+
+    Args:
+        xml_file (Path): Path to the XML file
+        workers (int): Number of worker processes
+        include_flags (set[str], optional): Flags to keep the records of, defaults to None (i.e. all flags)
+        exclude_flags (set[str], optional): Flags to discard the records of, defaults to None
+
+    Returns:
+        tuple[dict[str, RecordBatch], dict[str, int]]: Batches by flag, and count of discarded records by flag
+    """
+    chunks = get_chunks(xml_file, n_chunks=workers * CHUNKS_PER_WORKER)
+    logger.info(
+        f"Processing {xml_file} in {len(chunks)} chunks with {workers} workers..."
+    )
+    Loader._log_header(xml_file, chunks[0][0] if chunks else None)
+
+    batches: dict[str, RecordBatch] = {}
+    discarded: dict[str, int] = {}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = pool.map(
+            parse_chunk,
+            repeat(xml_file),
+            [start for start, _ in chunks],
+            [end for _, end in chunks],
+            repeat(include_flags),
+            repeat(exclude_flags),
+        )
+        # Results are returned in chunk order
+        for chunk_batches, chunk_discarded in results:
+            for flag, batch in chunk_batches.items():
+                if flag in batches:
+                    batches[flag].extend(batch)
+                else:
+                    batches[flag] = batch
+            for flag, count in chunk_discarded.items():
+                discarded[flag] = discarded.get(flag, 0) + count
+
+    return batches, discarded
+
+
+@timeit
+def build_flags_parallel(
+    stores: dict[str, RecordStore],
+    workers: int,
+    builder: str,
+    validation: str,
+) -> dict[str, tuple[pd.DataFrame, set[date], dict[str, int]] | Exception]:
+    """
+    Build the records of several flags in parallel, with one process per worker.
+
+    The workers receive the columnar stores of the records (see `RecordStore`) and
+    build their DataFrame (see `build_flag`). The largest flags are submitted first, to
+    balance the load between workers, but the results are returned in the order of the
+    stores. The error of a flag is returned instead of its records, without cancelling
+    the other flags.
+
+    Args:
+        stores (dict[str, RecordStore]): Stores of the records by flag
+        workers (int): Number of worker processes
+        builder (str): Builder of the records (`"models"` or `"columnar"`)
+        validation (str): Validation mode of the models (`"full"`, `"batch"` or `"none"`)
+
+    Returns:
+        dict[str, tuple[pd.DataFrame, set[date], dict[str, int]] | Exception]: Records, dates and count of failed records by error, or error, by flag
+    """
+    if not stores:
+        return {}
+
+    logger.info(f"Building {len(stores)} flags with {workers} workers...")
+
+    futures: dict[str, Future] = {}
+    with ProcessPoolExecutor(max_workers=min(workers, len(stores))) as pool:
+        for flag in sorted(stores, key=lambda flag: len(stores[flag]), reverse=True):
+            futures[flag] = pool.submit(
+                build_flag, flag, stores[flag], builder, validation
+            )
+
+        results: dict[
+            str, tuple[pd.DataFrame, set[date], dict[str, int]] | Exception
+        ] = {}
+        for flag in stores:
+            try:
+                results[flag] = futures[flag].result()
+            except Exception as exc:
+                results[flag] = exc
+
+    return results
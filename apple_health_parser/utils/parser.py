@@ -1,23 +1,63 @@
-from collections import defaultdict
-from datetime import date
+from collections.abc import Iterator, Mapping
+from datetime import date, datetime, timedelta
 from pathlib import Path
-from typing import overload
+from typing import IO, overload
 
 import click
-import lxml.etree as ET
 import pandas as pd
-from pydantic import ValidationError
 
+from apple_health_parser.config.definitions import (
+    Builders,
+    Engines,
+    ExportFormats,
+    Validations,
+)
+from apple_health_parser.consts import BUILDERS, ENGINES, EXPORT_FORMATS, VALIDATIONS
 from apple_health_parser.decorators import timeit
 from apple_health_parser.exceptions import (
+    DiscardedFlag,
+    InvalidBuilder,
+    InvalidEngine,
+    InvalidExportFormat,
     InvalidFileFormat,
     InvalidFlag,
+    InvalidValidation,
+    MissingPreviousExport,
     MissingRecords,
 )
 from apple_health_parser.models.parsed import ParsedData
-from apple_health_parser.models.records import HealthData, HeartRateData, SleepData
-from apple_health_parser.utils.loader import Loader
+from apple_health_parser.utils.batch import RecordBatch
+from apple_health_parser.utils.builder import (
+    build_flag,
+    build_models,
+    build_records,
+    construct_models,
+    get_empty_records,
+    get_records_frame,
+    validate_models,
+)
+from apple_health_parser.utils.cache import DATE_FORMAT, ParseCache
+from apple_health_parser.utils.categories import categorize
+from apple_health_parser.utils.database import DATABASE, RecordDatabase
+from apple_health_parser.utils.devices import add_device_columns, parse_device
+from apple_health_parser.utils.index import IndexedRecords, RecordIndex
+from apple_health_parser.utils.loader import Loader, RecordStream, ZipMember
 from apple_health_parser.utils.logging import logger
+from apple_health_parser.utils.manifest import (
+    FlagManifest,
+    get_store_manifest,
+)
+from apple_health_parser.utils.parallel import build_flags_parallel, read_xml_parallel
+from apple_health_parser.utils.pipeline import DecompressionPipeline
+from apple_health_parser.utils.query import SortedRecords, filter_sources
+from apple_health_parser.utils.scanner import scan_xml
+from apple_health_parser.utils.store import EMPTY_DIGEST, RecordStore, add_digests
+from apple_health_parser.utils.timestamps import (
+    filter_dates,
+    get_local_time,
+    get_utc_bound,
+)
+from apple_health_parser.utils.writer import import_pyarrow, write_parsed_data
 
 # https://pandas.pydata.org/pandas-docs/stable/user_guide/indexing.html#returning-a-view-versus-a-copy
 pd.options.mode.copy_on_write = True
@@ -32,49 +72,732 @@ class Parser(Loader):
 
     def __init__(
         self,
-        export_file: str | Path,
+        export_file: str | Path | IO[bytes],
         output_dir: str | Path = "data",
         verbose: bool = False,
         overwrite: bool | None = None,
+        streaming: bool = False,
+        extract: bool = True,
+        flags: list[str] | None = None,
+        exclude_flags: list[str] | None = None,
+        workers: int = 1,
+        cache: ParseCache | None = None,
+        previous: str | None = None,
+        lazy: bool = False,
+        indexed: bool = False,
+        engine: str = "lxml",
+        pipeline: DecompressionPipeline | None = None,
+        builder: str = "models",
+        database: RecordDatabase | None = None,
     ) -> None:
         """
         Initialize the Parser class with the path to the export.zip file.
 
+        If `extract` is False (or if a file object is given), the export.xml file is
+        decompressed on the fly from the zip file and nothing is written to disk. With a
+        `DecompressionPipeline`, the decompression then runs in a background thread,
+        overlapping with the parsing.
+
+        In streaming mode, the records are not kept in memory at ingest: the export is
+        streamed once to index the flags, and the records of a flag are only streamed
+        into a store when the flag is first used (see `_load_store`). This keeps peak
+        memory at ingest flat regardless of the size of the export.
+
+        If `flags` and/or `exclude_flags` are given, records of other flags are discarded
+        as soon as they are read, so that memory usage and parsing time only depend on
+        the flags that are actually used. `flags` still lists every flag in the export.
+
+        In lazy mode, the export is only indexed at construction (as in streaming mode).
+        The records of a flag are parsed the first time the flag is requested, and the
+        parsed data is memoized, so later requests for the same flag are free.
+
+        In indexed mode, the extracted export.xml file is indexed by byte offset (see
+        `RecordIndex`, persisted next to the file), and the records of a flag are only
+        parsed from their slices of the file when the flag is first used.
+
+        With the `"fast"` engine, records are scanned straight from the bytes of the
+        export.xml file into per-flag columns (see `scan_xml`), instead of building an lxml
+        tree. Irregular records are still parsed with lxml. The scanner works on the whole
+        file at once, so a `DecompressionPipeline` is not used with this engine.
+
+        With the `"columnar"` builder, the records of a flag are built column by column
+        with vectorized operations (see `build_records`), instead of building a model per
+        record. The records, dtypes and failed records are the same as with the models.
+
+        With more than one worker, the extracted export.xml file is split into chunks
+        which are parsed in parallel processes (see `read_xml_parallel`).
+
+        With a cache, parsed records are stored on disk the first time each flag is
+        requested, and loaded from there afterwards (see `ParseCache`). Once every selected
+        flag is cached, the export is neither extracted nor parsed anymore.
+
+        With a database written by `export(format="sqlite")` for the same export (see
+        `RecordDatabase`), the records of its flags are loaded from the database instead,
+        and only the records in the requested date range are read.
+
+        Since Apple Health exports are cumulative, a newer export can be ingested against
+        a `previous` export in the cache: only the records created after the export date
+        of the previous export are parsed, and appended to its cached records. If the older
+        records do not match the previous export anymore (i.e. some were deleted, added or
+        edited since), the whole export is parsed.
+
+        Options which have no effect in combination with the others (e.g. `indexed=True`
+        with `workers=4`, or with a file object) are reported with a warning (see
+        `_check_options`).
+
         Args:
-            export_file (str): Path to the export.zip file
+            export_file (str | Path | IO[bytes]): Path to the export.zip file, or binary file object of the export.zip file
             output_dir (str): Directory to export the parsed data to, defaults to "data"
             verbose (bool): Flag to enable verbose logging, defaults to False
             overwrite (bool, optional): Flag to overwrite the existing data, defaults to None
+            streaming (bool): Flag to stream the records instead of loading them, defaults to False
+            extract (bool): Flag to extract the export.zip file to `output_dir`, defaults to True
+            flags (list[str], optional): Flags to keep the records of, defaults to None (i.e. all flags)
+            exclude_flags (list[str], optional): Flags to discard the records of, defaults to None
+            workers (int): Number of processes to parse the export.xml file with, defaults to 1
+            cache (ParseCache, optional): Cache of parsed records, defaults to None
+            previous (str, optional): Cache key of the previous export (e.g. `cache.latest()`), defaults to None
+            lazy (bool): Flag to only parse the records of a flag when it is first requested, defaults to False
+            indexed (bool): Flag to read the records of each flag from a byte-offset index of the export, defaults to False
+            engine (str): Engine to parse the export.xml file with (`"lxml"` or `"fast"`), defaults to `"lxml"`
+            pipeline (DecompressionPipeline, optional): Pipeline to read the export.xml file with (see `Loader.read_xml`), defaults to None
+            builder (str): Builder of the records of a flag (`"models"` or `"columnar"`), defaults to `"models"`
+            database (RecordDatabase, optional): Database of the parsed records of the export, defaults to None
+
+        Raises:
+            InvalidBuilder: Builder is not allowed
+            InvalidEngine: Engine is not allowed
+            MissingPreviousExport: The previous export is not in the cache
+            ValueError: Number of workers is lower than 1
         """
         if verbose is False:
             logger.propagate = False
 
-        self.xml_file = self.extract_zip(
-            zip_file=export_file, output_dir=output_dir, overwrite=overwrite
+        if engine not in ENGINES:
+            raise InvalidEngine(engine)
+
+        if builder not in BUILDERS:
+            raise InvalidBuilder(builder)
+
+        if workers < 1:
+            raise ValueError(f"Number of workers must be at least 1, not {workers}")
+
+        self.export_file = export_file
+        self.output_dir = output_dir
+        self.overwrite = overwrite
+        self.extract = extract
+        self.streaming = streaming
+        self.lazy = lazy
+        self.indexed = indexed
+        self.engine = engine
+        self.pipeline = pipeline
+        self.builder = builder
+        self.index: RecordIndex | None = None
+        self.workers = workers
+        self.xml_file: Path | ZipMember | None = None
+        self._check_options()
+
+        self.include_flags = set(flags) if flags is not None else None
+        self.exclude_flags = set(exclude_flags) if exclude_flags is not None else set()
+        # Record count of the flags found in the export but discarded at ingest
+        self.discarded: dict[str, int] = {}
+        # Parsed data memoized by flag (in lazy mode)
+        self.parsed: dict[str, ParsedData] = {}
+        # Manifest of the records of each flag, built at ingest (see `get_flag_manifest`)
+        self.manifests: dict[str, FlagManifest] = {}
+        # Records of each flag sorted by start date, built when first queried
+        self.sorted: dict[str, SortedRecords] = {}
+
+        self.cache = cache
+        self.database = database
+        self.cache_key: str | None = None
+        self.manifest: dict | None = None
+        if self.cache is not None or self.database is not None:
+            self.cache_key = self._get_export_key()
+            self.manifest = self._get_cached_manifest()
+
+        # Manifest of the previous export, and record count by flag of the records it has
+        self.previous_manifest: dict | None = None
+        self.history: dict[str, int] = {}
+        if previous is not None and previous != self.cache_key:
+            if self.cache is not None:
+                self.previous_manifest = self.cache.get_manifest(previous)
+            if self.previous_manifest is None or not self.previous_manifest.get(
+                "export_date"
+            ):
+                raise MissingPreviousExport(previous)
+        self.previous = previous
+
+        # Records are only parsed if some of the selected flags are not cached yet
+        self.from_cache = self.manifest is not None
+        if self.from_cache:
+            logger.info("All selected flags found in the cache, skipping parsing...")
+            self.records = {}
+            self.flags = list(self.manifest["flags"])
+            self.discarded = {
+                flag: count
+                for flag, count in self.manifest["flags"].items()
+                if not self._is_selected(flag)
+            }
+            self.close()
+        else:
+            self._load_records()
+
+    def _check_options(self) -> None:
+        """
+        Warn about the options which have no effect in combination with the others.
+
+        The records are read with the first of the indexed, streaming (or lazy), fast
+        engine and parallel modes which is enabled (see `_get_records`), and the others
+        are ignored. Indexed and parallel parsing also require the export.xml file to
+        be extracted.
+        """
+        extracted = self.extract and isinstance(self.export_file, (str, Path))
+        if self.indexed and not extracted:
+            logger.warning(
+                "Indexed parsing requires an extracted export.xml file, "
+                "ignoring indexed=True..."
+            )
+        if self.workers > 1 and not extracted:
+            logger.warning(
+                "Parallel parsing requires an extracted export.xml file, "
+                f"ignoring workers={self.workers}..."
+            )
+
+        indexed = self.indexed and extracted
+        # Lazy mode still memoizes the parsed data of indexed records
+        streamed = self.streaming or (self.lazy and not indexed)
+        modes = [
+            name
+            for name, enabled in (
+                ("indexed=True", indexed),
+                ("streaming=True" if self.streaming else "lazy=True", streamed),
+                ('engine="fast"', self.engine == Engines.FAST),
+                (f"workers={self.workers}", self.workers > 1 and extracted),
+            )
+            if enabled
+        ]
+        if len(modes) > 1:
+            logger.warning(
+                f"Reading the records with {modes[0]}, ignoring {', '.join(modes[1:])}..."
+            )
+
+        if self.pipeline is not None and modes[:1] == ['engine="fast"']:
+            logger.warning(
+                "The fast engine scans the whole export.xml file at once, "
+                "ignoring the decompression pipeline..."
+            )
+
+    def _get_xml_file(self) -> Path | ZipMember:
+        """
+        Get the export.xml file, extracting the export.zip file if needed.
+
+        Returns:
+            Path | ZipMember: Path to the extracted export.xml file, or export.xml file in the zip file
+        """
+        if self.xml_file is None:
+            if self.extract and isinstance(self.export_file, (str, Path)):
+                self.xml_file = self.extract_zip(
+                    zip_file=self.export_file,
+                    output_dir=self.output_dir,
+                    overwrite=self.overwrite,
+                )
+            else:
+                self.xml_file = self.open_zip(zip_file=self.export_file)
+        return self.xml_file
+
+    def close(self) -> None:
+        """
+        Close the zip file of the export, if it is read without extracting it.
+
+        The zip file is closed once the records are read, unless they are streamed from
+        it (in streaming or lazy mode), in which case it is only closed here. It is
+        reopened if the export has to be parsed again.
+        """
+        if isinstance(self.xml_file, ZipMember):
+            self.xml_file.close()
+            self.xml_file = None
+
+    def _get_export_key(self) -> str:
+        """
+        Get the fingerprint of the export, i.e. its key in the cache and the database.
+
+        Returns:
+            str: Fingerprint of the export (see `ParseCache.fingerprint`)
+        """
+        return ParseCache.fingerprint(
+            self.export_file
+            if isinstance(self.export_file, (str, Path))
+            else self._get_xml_file()
         )
+
+    def _get_cached_manifest(self) -> dict | None:
+        """
+        Get the manifest of the export from the cache (or else the database), if every
+        selected flag is in it.
+
+        Returns:
+            dict | None: Manifest of the cached export, or None if some flags are not cached
+        """
+        for store in (self.cache, self.database):
+            if store is None:
+                continue
+            manifest = store.get_manifest(self.cache_key)
+            if manifest is None or "flags" not in manifest:
+                continue
+            selected = [flag for flag in manifest["flags"] if self._is_selected(flag)]
+            if all(flag in manifest["data"] for flag in selected):
+                return manifest
+        return None
+
+    def _load_records(self) -> None:
+        """
+        Parse the records of the export file, and record the flags found in the cache.
+        """
+        self._get_xml_file()
+        self.discarded = {}
         self.records = self._get_records()
         self.flags = list(self.records.keys()) if self.records else []
+        self.flags += list(self.discarded.keys())
+        self.from_cache = False
+        self.sorted = {}
+        # Indexed records are only read when the manifest of their flag is first used
+        self.manifests = {}
+        for flag in self._get_selected_flags():
+            if not isinstance(self.records[flag], IndexedRecords):
+                self._get_ingest_manifest(flag)
+
+        if self.cache is not None:
+            self.cache.set_flags(
+                self.cache_key,
+                self._get_flag_counts(),
+                export_date=self.get_export_date(self.xml_file),
+            )
+
+        # Streamed records are read from the zip file when their flag is first used
+        if not (self.streaming or self.lazy):
+            self.close()
+
+    def _get_ingest_manifest(self, flag: str) -> FlagManifest:
+        """
+        Get the manifest of the records of a flag read from the export, built once.
+
+        Args:
+            flag (str): Flag of the records
+
+        Returns:
+            FlagManifest: Manifest of the records
+        """
+        if flag not in self.manifests:
+            records = self.records[flag]
+            if isinstance(records, RecordStream):
+                manifest = records.summary.build()
+            else:
+                # Indexed records are read into their store (see `_load_store`)
+                manifest = get_store_manifest(self._load_store(flag))
+            self.manifests[flag] = manifest
+        return self.manifests[flag]
+
+    def _get_flag_summary(self, flag: str) -> FlagManifest | IndexedRecords:
+        """
+        Get the distinct sources and devices of the records of a flag read from the
+        export, i.e. its manifest, or its indexed records which are not parsed for them.
+
+        Args:
+            flag (str): Flag of the records
+
+        Returns:
+            FlagManifest | IndexedRecords: Object with the `sources` and `devices` of the records
+        """
+        records = self.records[flag]
+        if isinstance(records, IndexedRecords) and flag not in self.manifests:
+            return records
+        return self._get_ingest_manifest(flag)
+
+    def get_flag_manifest(self, flag: str) -> FlagManifest:
+        """
+        Get the manifest of the records of a flag, e.g. their count, first and last dates,
+        years, distinct sources, devices and units, and attributes.
+
+        The manifest is built once from the records read from the export, so it is
+        available without parsing the records. If the records are not read from the export
+        (i.e. loaded from the cache or the database, or appended to a previous export),
+        the manifest of the parsed data is used instead (see `ParsedData.manifest`).
+
+        Args:
+            flag (str): Flag of the records
+
+        Raises:
+            InvalidFlag: Flag is not in the export
+            DiscardedFlag: Records of the flag were discarded at ingest
+
+        Returns:
+            FlagManifest: Manifest of the records
+        """
+        if flag in self.records and not self._has_previous(flag):
+            return self._get_ingest_manifest(flag)
+        return self.get_flag_records(flag).manifest
+
+    def _get_flag_counts(self) -> dict[str, int]:
+        """
+        Get the record count of each flag found in the export, including discarded flags.
+
+        Returns:
+            dict[str, int]: Record count by flag
+        """
+        if self.from_cache:
+            return dict(self.manifest["flags"])
+        counts = {
+            flag: len(rec) + self.history.get(flag, 0)
+            for flag, rec in self.records.items()
+        }
+        return {**counts, **self.discarded}
+
+    def _get_selected_flags(self) -> list[str]:
+        """
+        Get the flags of the records kept at ingest.
+
+        Returns:
+            list[str]: Flags of the records kept at ingest
+        """
+        return [flag for flag in self.flags if flag not in self.discarded]
+
+    def _is_selected(self, flag: str) -> bool:
+        """
+        Check whether the records of a flag are kept at ingest.
+
+        Args:
+            flag (str): Flag of the records
+
+        Returns:
+            bool: True if the records are kept, False otherwise
+        """
+        if self.include_flags is not None and flag not in self.include_flags:
+            return False
+        return flag not in self.exclude_flags
+
+    def _discard(self, flag: str) -> None:
+        """
+        Count a record discarded at ingest.
+
+        Args:
+            flag (str): Flag of the record
+        """
+        self.discarded[flag] = self.discarded.get(flag, 0) + 1
 
     @timeit
-    def _get_records(self) -> defaultdict[str, list[ET.Element]]:
+    def _get_records(
+        self,
+    ) -> dict[str, RecordStore | RecordStream | IndexedRecords]:
         """
         Get records from the Apple Health export file.
-        The records are grouped by flags as keys and list of records as values.
+        The records are grouped by flags as keys and `RecordStore` objects as values, which
+        keep the attributes of the records as typed arrays. The export is streamed into
+        the stores, so the tree of the export.xml file is freed as it is read.
+
+        In streaming (or lazy) mode, the values are `RecordStream` objects instead, which
+        stream the records of their flag from the export file when the flag is first used.
+
+        With the `"fast"` engine or more than one worker, the records are scanned from the
+        bytes of the file or parsed in parallel into batches, which are then stored.
+
+        In indexed mode, the values are `IndexedRecords` objects, which parse the records of
+        their flag from the export file when the flag is first used.
+
+        When ingesting against a previous export, only the new records are kept (see
+        `_get_new_records`), regardless of the streaming mode and number of workers.
 
         Returns:
-            defaultdict[str, list[ET.Element]]: Records from the export.xml file
+            dict[str, RecordStore | RecordStream | IndexedRecords]: Records from the export.xml file
         """
-        data = self.read_xml(self.xml_file)
-        records: defaultdict[str, list[ET.Element]] = defaultdict(list)
-        for rec in data:
+        if self.previous_manifest is not None:
+            records = self._get_new_records()
+            if records is not None:
+                return records
+
+        # Options without effect are reported at initialization (see `_check_options`)
+        if self.indexed and isinstance(self.xml_file, Path):
+            return self._get_indexed_records()
+
+        if self.streaming or self.lazy:
+            return self._get_record_streams()
+
+        if self.engine == Engines.FAST:
+            return self._get_scanned_records()
+
+        if self.workers > 1 and isinstance(self.xml_file, Path):
+            return self._get_record_batches()
+
+        records: dict[str, RecordStore] = {}
+        for rec in self.iter_xml(self.xml_file, pipeline=self.pipeline):
             # Match record "type" to flag
-            records[rec.attrib["type"]].append(rec)
+            flag = rec.get("type")
+            if not self._is_selected(flag):
+                self._discard(flag)
+                continue
+            store = records.get(flag)
+            if store is None:
+                store = records[flag] = RecordStore(flag)
+            store.append(rec)
+        for store in records.values():
+            store.flush()
         record_count = sum(len(rec) for rec in records.values())
         logger.info(
             f"Processed {len(records.keys())} flags with {record_count:,} records"
         )
         return records
 
+    def _get_new_records(self) -> dict[str, RecordStore] | None:
+        """
+        Stream the Apple Health export file, only keeping the records created after the
+        export date of the previous export (for the flags cached with the previous export).
+
+        Older records are counted, and kept in a store to get their digest: if their count
+        or their digest (see `RecordStore.get_digest`) differs from the previous export for
+        any flag, the history has changed (e.g. records were deleted or edited) and None is
+        returned, so that the whole export is parsed again. Previous exports cached
+        without digests are only checked by their record count.
+
+        Returns:
+            dict[str, RecordStore] | None: New records, or None if the history has changed
+        """
+        since = datetime.strptime(self.previous_manifest["export_date"], DATE_FORMAT)
+        cached = self.previous_manifest["data"]
+
+        # Dates are compared as strings first, and only parsed near the export date
+        # (UTC offsets are always less than a day)
+        before = (since - timedelta(days=1)).strftime("%Y-%m-%d")
+        after = (since + timedelta(days=1)).strftime("%Y-%m-%d")
+
+        def is_new(creation_date: str) -> bool:
+            day = creation_date[:10]
+            if day < before:
+                return False
+            if day > after:
+                return True
+            return datetime.strptime(creation_date, DATE_FORMAT) > since
+
+        records: dict[str, RecordStore] = {}
+        # Older records, only kept until their digest is compared
+        older: dict[str, RecordStore] = {}
+        self.history = {}
+        for rec in self.iter_xml(self.xml_file, pipeline=self.pipeline):
+            flag = rec.get("type")
+            if not self._is_selected(flag):
+                self._discard(flag)
+                continue
+            store = records.get(flag)
+            if store is None:
+                store = records[flag] = RecordStore(flag)
+            if flag in cached and not is_new(rec.get("creationDate")):
+                self.history[flag] = self.history.get(flag, 0) + 1
+                if flag not in older:
+                    older[flag] = RecordStore(flag)
+                older[flag].append(rec)
+            else:
+                store.append(rec)
+        for store in records.values():
+            store.flush()
+
+        previous_counts = self.previous_manifest["flags"]
+
+        def is_changed(flag: str) -> bool:
+            if self.history.get(flag, 0) != previous_counts.get(flag):
+                return True
+            digest = cached[flag].get("digest")
+            return digest is not None and digest != (
+                older[flag].get_digest() if flag in older else EMPTY_DIGEST
+            )
+
+        changed = [
+            flag for flag in cached if self._is_selected(flag) and is_changed(flag)
+        ]
+        if changed:
+            logger.warning(
+                f"History changed since the previous export for {len(changed)} flags, "
+                "parsing the whole export..."
+            )
+            self.previous_manifest = None
+            self.history = {}
+            self.discarded = {}
+            return None
+
+        record_count = sum(len(rec) for rec in records.values())
+        logger.info(
+            f"Found {record_count:,} new records since "
+            f"{click.style(since.isoformat(sep=' '), fg='green')}"
+        )
+        return records
+
+    def _get_indexed_records(self) -> dict[str, IndexedRecords]:
+        """
+        Index the Apple Health export file by byte offset, or load its existing index.
+
+        Returns:
+            dict[str, IndexedRecords]: Indexed records from the export.xml file
+        """
+        self.index = RecordIndex.get(self.xml_file)
+        self._log_header(
+            self.xml_file, int(self.index.offsets[0]) if len(self.index) else None
+        )
+
+        records: dict[str, IndexedRecords] = {}
+        for flag, count in self.index.counts.items():
+            if self._is_selected(flag):
+                records[flag] = IndexedRecords(self.index, flag)
+            else:
+                self.discarded[flag] = count
+        record_count = sum(len(rec) for rec in records.values())
+        logger.info(
+            f"Indexed {len(records.keys())} flags with {record_count:,} records"
+        )
+        return records
+
+    def _get_record_streams(self) -> dict[str, RecordStream]:
+        """
+        Stream the Apple Health export file once to index the records by flag.
+
+        Returns:
+            dict[str, RecordStream]: Record streams from the export.xml file
+        """
+        records: dict[str, RecordStream] = {}
+        for rec in self.iter_xml(self.xml_file, pipeline=self.pipeline):
+            flag = rec.attrib["type"]
+            if not self._is_selected(flag):
+                self._discard(flag)
+                continue
+            if flag not in records:
+                records[flag] = RecordStream(self.xml_file, flag, self.pipeline)
+            records[flag].add(rec)
+        record_count = sum(len(rec) for rec in records.values())
+        logger.info(
+            f"Streamed {len(records.keys())} flags with {record_count:,} records"
+        )
+        return records
+
+    def _get_scanned_records(self) -> dict[str, RecordStore]:
+        """
+        Scan the Apple Health export file into per-flag batches with the fast engine.
+
+        Returns:
+            dict[str, RecordStore]: Stored records from the export.xml file
+        """
+        batches, discarded = scan_xml(
+            xml_file=self.xml_file,
+            include_flags=self.include_flags,
+            exclude_flags=self.exclude_flags,
+        )
+        for flag, count in discarded.items():
+            self.discarded[flag] = self.discarded.get(flag, 0) + count
+        records = self._store_batches(batches)
+        record_count = sum(len(rec) for rec in records.values())
+        logger.info(
+            f"Scanned {len(records.keys())} flags with {record_count:,} records"
+        )
+        return records
+
+    def _get_record_batches(self) -> dict[str, RecordStore]:
+        """
+        Parse the Apple Health export file in parallel into per-flag batches.
+
+        Returns:
+            dict[str, RecordStore]: Stored records from the export.xml file
+        """
+        batches, discarded = read_xml_parallel(
+            xml_file=self.xml_file,
+            workers=self.workers,
+            include_flags=self.include_flags,
+            exclude_flags=self.exclude_flags,
+        )
+        for flag, count in discarded.items():
+            self.discarded[flag] = self.discarded.get(flag, 0) + count
+        records = self._store_batches(batches)
+        record_count = sum(len(rec) for rec in records.values())
+        logger.info(
+            f"Processed {len(records.keys())} flags with {record_count:,} records"
+        )
+        return records
+
+    @staticmethod
+    def _store_batches(batches: dict[str, RecordBatch]) -> dict[str, RecordStore]:
+        """
+        Store batches of records, freeing each batch once it is stored.
+
+        Args:
+            batches (dict[str, RecordBatch]): Record batches by flag
+
+        Returns:
+            dict[str, RecordStore]: Stored records by flag
+        """
+        records: dict[str, RecordStore] = {}
+        for flag in list(batches):
+            records[flag] = RecordStore.from_batch(batches.pop(flag))
+        return records
+
+    def _iter_rows(self, flag: str) -> Iterator[tuple[Mapping[str, str], str | None]]:
+        """
+        Iterate over the records of a flag, whichever way they were read (see `_load_store`).
+
+        Args:
+            flag (str): Flag of the records
+
+        Yields:
+            tuple[Mapping[str, str], str | None]: Attributes and first metadata value of a record
+        """
+        yield from self._load_store(flag).rows()
+
+    def _load_store(self, flag: str) -> RecordStore:
+        """
+        Get the records of a flag in a store, whatever the mode they were read in.
+
+        Streamed (or lazy) and indexed records are read into a store the first time they
+        are needed, which then replaces them, so the export is only streamed (or the
+        slices parsed) once per flag.
+
+        Args:
+            flag (str): Flag of the records
+
+        Returns:
+            RecordStore: Store of the records of the flag
+        """
+        records = self.records[flag]
+        if isinstance(records, RecordStore):
+            records.flush()
+            return records
+
+        if isinstance(records, IndexedRecords):
+            store = records.read_store()
+        else:
+            store = RecordStore(flag)
+            for rec in records:
+                store.append(rec)
+            store.flush()
+        self.records[flag] = store
+        return store
+
+    def _check_flag(self, flag: str) -> None:
+        """
+        Check that the records of a flag can be parsed, loading the records if needed.
+
+        Args:
+            flag (str): Flag to parse the records
+
+        Raises:
+            InvalidFlag: Flag is not in the export
+            DiscardedFlag: Records of the flag were discarded at ingest
+        """
+        logger.info(f"Parsing records with flag: {click.style(flag, fg='magenta')}")
+
+        if flag not in self.flags:
+            raise InvalidFlag(flag, self.flags)
+
+        if flag in self.discarded:
+            raise DiscardedFlag(flag)
+
+        if self.from_cache:
+            logger.info("Flag missing from the cache, parsing the export...")
+            self._load_records()
+
     def _build_models(self, flag: str) -> list:
         """
         Build models from the records based on the flag.
@@ -85,58 +808,79 @@ class Parser(Loader):
         Returns:
             list: List of models based on the flag
         """
-        logger.info(f"Parsing records with flag: {click.style(flag, fg='magenta')}")
+        self._check_flag(flag)
 
-        if flag not in self.flags:
-            raise InvalidFlag(flag, self.flags)
+        models, failed = build_models(flag, self._iter_rows(flag))
 
-        models: list[HealthData | HeartRateData] = []
-        failed: dict[str, int] = {}
+        self._log_failed(failed)
+        return models
 
-        for rec in self.records[flag]:
-            try:
-                # Heart rate records can have additional metadata (motionContext)
-                if flag == "HKQuantityTypeIdentifierHeartRate":
-                    if rec.find("MetadataEntry") is not None:
-                        motion_context = rec.find("MetadataEntry").attrib["value"]
-                    else:
-                        motion_context = None
-                    models.append(
-                        HeartRateData(**rec.attrib, motionContext=motion_context)
-                    )
-                elif flag == "HKCategoryTypeIdentifierSleepAnalysis":
-                    # Sleep records have additional metadata (value)
-                    models.append(
-                        SleepData(
-                            **{
-                                **rec.attrib,
-                                **{
-                                    "timezone": rec.find("MetadataEntry").attrib[
-                                        "value"
-                                    ]
-                                },
-                            }
-                        )
-                    )
-                else:
-                    models.append(HealthData(**rec.attrib))
+    def _build_models_in_batch(self, flag: str, validation: str) -> list:
+        """
+        Build models from the records of a flag, validated at once or not at all.
 
-            except ValidationError as exc:
-                error_type = exc.errors()[0]["type"]
-                loc = exc.errors()[0]["loc"]
-                try:
-                    failed[f"{error_type}_{loc}"] += 1
-                except KeyError:
-                    failed[f"{error_type}_{loc}"] = 1
-                continue
+        Args:
+            flag (str): Flag to parse the records
+            validation (str): Validation mode (`"batch"` or `"none"`)
 
+        Returns:
+            list: List of models based on the flag
+        """
+        self._check_flag(flag)
+
+        if validation == Validations.BATCH:
+            models, failed = validate_models(flag, self._iter_rows(flag))
+        else:
+            models, failed = construct_models(flag, self._iter_rows(flag))
+
+        self._log_failed(failed)
+        return models
+
+    def _get_store(self, flag: str) -> RecordStore:
+        """
+        Get the records of a flag in a store, whatever the mode they were loaded in.
+
+        Args:
+            flag (str): Flag to parse the records
+
+        Returns:
+            RecordStore: Store of the records of the flag
+        """
+        self._check_flag(flag)
+        return self._load_store(flag)
+
+    def _build_columns(self, flag: str) -> tuple[pd.DataFrame, set[date]] | None:
+        """
+        Build the records of a flag column by column (see `build_records`).
+
+        Args:
+            flag (str): Flag to parse the records
+
+        Returns:
+            tuple[pd.DataFrame, set[date]] | None: Records and dates, or None if they must be built from the models
+        """
+        built = build_records(flag, self._get_store(flag))
+        if built is None:
+            logger.debug("Irregular records, building the records from the models...")
+            return None
+
+        data, dates, failed = built
+        self._log_failed(failed)
+        return data, dates
+
+    @staticmethod
+    def _log_failed(failed: dict[str, int]) -> None:
+        """
+        Log the records which failed to parse.
+
+        Args:
+            failed (dict[str, int]): Count of failed records by error
+        """
         if failed:
             logger.warning(
                 click.style(f"Failed to parse {len(failed)} records", bold=True)
             )
 
-        return models
-
     def _get_dates(self, models: list) -> set[date]:
         """
         Get unique month and year combinations from the models.
@@ -147,11 +891,13 @@ class Parser(Loader):
         Returns:
             set[datetime.date]: Set of dates (year, month, day)
         """
-        return {rec.start_date.date for rec in models}
+        return {rec.start_date.date() for rec in models}
 
     def _map_record_keys_to_flags(self) -> dict[str, set]:
         """
-        Map record keys (e.g. `unit`, `value`, `creationDate`) for each flag.
+        Map record keys (e.g. `unit`, `value`, `creationDate`) for each flag, from the
+        manifest of its records (see `get_flag_manifest`), or from the cache if the
+        records are not read from the export.
 
         For example:
 
@@ -164,109 +910,547 @@ class Parser(Loader):
         Returns:
             dict[str, set]: Dictionary with flags as keys and set of record keys as values
         """
+        # The database does not keep the attributes of the records
+        if self.from_cache and not all(
+            "keys" in self.manifest["data"][flag] for flag in self._get_selected_flags()
+        ):
+            logger.info("Record keys missing from the cache, parsing the export...")
+            self._load_records()
         return {
-            flag: {
-                k
-                for rec in self.records["HKQuantityTypeIdentifierActiveEnergyBurned"]
-                for k in rec.attrib.keys()
-            }
-            for flag in self.flags
+            flag: self._get_record_keys(flag) for flag in self._get_selected_flags()
         }
 
+    def _get_record_keys(self, flag: str) -> set[str]:
+        """
+        Get the record keys of a flag, including those of the previous export if the
+        records are appended to it.
+
+        Args:
+            flag (str): Flag of the records
+
+        Returns:
+            set[str]: Record keys of the flag
+        """
+        if self.from_cache:
+            return set(self.manifest["data"][flag]["keys"])
+        keys = set(self._get_ingest_manifest(flag).keys)
+        if self._has_previous(flag):
+            keys.update(self.previous_manifest["data"][flag].get("keys", []))
+        return keys
+
+    def _get_record_digest(self, flag: str) -> str | None:
+        """
+        Get the digest of the records of a flag (see `RecordStore.get_digest`), including
+        those of the previous export if the records are appended to it.
+
+        Args:
+            flag (str): Flag of the records
+
+        Returns:
+            str | None: Digest of the records, or None if the previous export has none
+        """
+        digest = self._get_store(flag).get_digest()
+        if not self._has_previous(flag):
+            return digest
+        previous = self.previous_manifest["data"][flag].get("digest")
+        return None if previous is None else add_digests(previous, digest)
+
+    def _build_flags(
+        self, flags: list[str], workers: int, validation: str
+    ) -> dict[str, tuple[pd.DataFrame, set[date], dict[str, int]] | Exception]:
+        """
+        Build the records of several flags in parallel (see `build_flags_parallel`).
+
+        Flags which are already parsed (in lazy mode) or cached are not built again.
+
+        Args:
+            flags (list[str]): Flags to parse the records
+            workers (int): Number of processes to build the records with
+            validation (str): Validation mode of the records
+
+        Returns:
+            dict[str, tuple[pd.DataFrame, set[date], dict[str, int]] | Exception]: Records, dates and count of failed records by error, or error, by flag
+        """
+        built: dict[
+            str, tuple[pd.DataFrame, set[date], dict[str, int]] | Exception
+        ] = {}
+        stores: dict[str, RecordStore] = {}
+        for flag in dict.fromkeys(flags):
+            if (
+                flag in self.parsed
+                or (self.cache is not None and self.cache.has(self.cache_key, flag))
+                or self._in_database(flag)
+            ):
+                continue
+            try:
+                stores[flag] = self._get_store(flag)
+            except Exception as exc:
+                built[flag] = exc
+
+        built.update(
+            build_flags_parallel(
+                stores, workers=workers, builder=self.builder, validation=validation
+            )
+        )
+        return built
+
+    def _in_database(self, flag: str) -> bool:
+        """
+        Check whether the records of a flag are loaded from the database.
+
+        Args:
+            flag (str): Flag of the records
+
+        Returns:
+            bool: True if the records of the flag are in the database of the export
+        """
+        return self.database is not None and self.database.has(self.cache_key, flag)
+
+    @staticmethod
+    def _select_records(
+        data: ParsedData,
+        start: date | datetime | str | None,
+        end: date | datetime | str | None,
+        sources: list[str] | None = None,
+    ) -> ParsedData:
+        """
+        Select the records of parsed data with a start date in `[start, end)` and one of
+        the given sources.
+
+        The sources and devices of the parsed data are the ones of the whole flag.
+
+        Args:
+            data (ParsedData): Parsed data of a flag
+            start (date | datetime | str, optional): Start of the date range
+            end (date | datetime | str, optional): End of the date range (excluded)
+            sources (list[str], optional): Sources of the records, defaults to None (i.e. all sources)
+
+        Returns:
+            ParsedData: Selected parsed data (the same parsed data if nothing is selected)
+        """
+        if start is None and end is None and sources is None:
+            return data
+        records = filter_sources(
+            filter_dates(data.records, start=start, end=end), sources
+        )
+        return ParsedData(
+            flag=data.flag,
+            sources=data.sources,
+            devices=data.devices,
+            dates=set(get_local_time(records).dt.date) if len(records) else set(),
+            records=records,
+        )
+
     @overload
-    def get_flag_records(self, flag: str) -> ParsedData: ...
+    def get_flag_records(
+        self,
+        flag: str,
+        validation: str = "full",
+        workers: int = 1,
+        start: date | datetime | str | None = None,
+        end: date | datetime | str | None = None,
+        sources: list[str] | None = None,
+    ) -> ParsedData: ...
     @overload
-    def get_flag_records(self, flag: list[str]) -> dict[str, ParsedData]: ...
+    def get_flag_records(
+        self,
+        flag: list[str],
+        validation: str = "full",
+        workers: int = 1,
+        start: date | datetime | str | None = None,
+        end: date | datetime | str | None = None,
+        sources: list[str] | None = None,
+    ) -> dict[str, ParsedData]: ...
     @timeit
     def get_flag_records(
-        self, flag: str | list[str]
+        self,
+        flag: str | list[str],
+        validation: str = "full",
+        workers: int = 1,
+        start: date | datetime | str | None = None,
+        end: date | datetime | str | None = None,
+        sources: list[str] | None = None,
     ) -> ParsedData | dict[str, ParsedData]:
         """
         Get parsed data based on the given flag.
 
+        The validation mode applies to the records built from the models (i.e. with the
+        `"models"` builder, or when the `"columnar"` builder falls back to the models):
+
+        - `"full"`: a model is validated per record
+        - `"batch"`: the records of a flag are validated at once (see `validate_models`), with the same results
+        - `"none"`: the models are built without validation (see `construct_models`), for trusted exports
+
+        With a list of flags and more than one worker, the records of the flags are built
+        in parallel processes (see `build_flags_parallel`). The parsed data is identical
+        to the serial parse, and the flags are returned in the given order. A flag which
+        fails to parse is logged and left out, without cancelling the other flags.
+
+        With `start` and/or `end`, only the records with a start date in `[start, end)`
+        are returned (see `filter_dates`), e.g. `start="2024-01-01", end="2025-01-01"`.
+        Naive bounds are local times. With `sources`, only the records of these sources
+        are returned. The other records are skipped before they are built (see `query`),
+        so a year of a ten-year export costs about a tenth of the whole flag, unless the
+        whole flag is kept (in lazy mode or with a cache). Flags in the database of the
+        export are loaded from it, reading only the records in the date range.
+
         Args:
             flag (str | list[str]): Flag to parse the records (e.g., `"HKQuantityTypeIdentifierHeartRate"`)
+            validation (str): Validation mode of the records (`"full"`, `"batch"` or `"none"`), defaults to `"full"`
+            workers (int): Number of processes to build the records of a list of flags with, defaults to 1
+            start (date | datetime | str, optional): Start of the date range of the records, defaults to None
+            end (date | datetime | str, optional): End of the date range of the records (excluded), defaults to None
+            sources (list[str], optional): Sources of the records, defaults to None (i.e. all sources)
+
+        Raises:
+            InvalidValidation: Validation mode is not allowed
 
         Returns:
             ParsedData | dict[str, ParsedData]: Parsed data based on the flag(s)
         """
+        if validation not in VALIDATIONS:
+            raise InvalidValidation(validation)
+
+        # Records built in parallel, by flag (see `_build_flags`)
+        prebuilt: dict[
+            str, tuple[pd.DataFrame, set[date], dict[str, int]] | Exception
+        ] = {}
+
+        def _build_flag_records(flag: str) -> tuple[pd.DataFrame, set[date]]:
+            built = None
+            if self.builder == Builders.COLUMNAR:
+                built = self._build_columns(flag=flag)
+            if built is not None:
+                return built
+            if validation == Validations.FULL:
+                models = self._build_models(flag=flag)
+            else:
+                models = self._build_models_in_batch(flag=flag, validation=validation)
+            return get_records_frame(models), self._get_dates(models=models)
+
+        def _parse_flag_records(flag: str) -> ParsedData:
+            if self.cache is not None:
+                cached = self.cache.load(self.cache_key, flag)
+                if cached is not None:
+                    logger.info(f"Loaded {flag} from the cache")
+                    return cached
 
-        def _get_parsed_data(flag: str) -> ParsedData:
             sources = self.get_sources(flag=flag)
             devices = self.get_devices(flag=flag)
-            models = self._build_models(flag=flag)
-            dates = self._get_dates(models=models)
-
-            records = pd.DataFrame([model.model_dump() for model in models])
-            return ParsedData(
+            built = prebuilt.pop(flag, None)
+            if isinstance(built, Exception):
+                raise built
+            if built is not None:
+                records, dates, failed = built
+                self._log_failed(failed)
+            else:
+                records, dates = _build_flag_records(flag=flag)
+            records = add_device_columns(records)
+            parsed = ParsedData(
                 flag=flag,
                 sources=sources,
                 devices=devices,
                 dates=dates,
                 records=records,
             )
+            if self._has_previous(flag):
+                previous = self.cache.load(self.previous, flag)
+                if previous is None:
+                    logger.warning(
+                        "Previous export evicted from the cache, "
+                        "parsing the whole export..."
+                    )
+                    self.previous_manifest = None
+                    self._load_records()
+                    return _parse_flag_records(flag=flag)
+                parsed = ParsedData(
+                    flag=flag,
+                    sources=sources,
+                    devices=devices,
+                    dates=previous.dates | dates,
+                    records=self._concat_records(previous.records, records),
+                )
+            if self.cache is not None:
+                self.cache.store(
+                    self.cache_key,
+                    parsed,
+                    keys=self._get_record_keys(flag),
+                    digest=self._get_record_digest(flag),
+                )
+            return parsed
+
+        def _is_selected_early(flag: str) -> bool:
+            # Whole flags are kept in lazy mode and in the cache, so they are built whole
+            return (
+                (start is not None or end is not None or sources is not None)
+                and not self.lazy
+                and self.cache is None
+                and self._can_select(flag)
+            )
+
+        def _get_parsed_data(flag: str) -> ParsedData:
+            # In lazy mode, the parsed data of each flag is only built once
+            if flag in self.parsed:
+                return self._select_records(self.parsed[flag], start, end, sources)
+            if self._in_database(flag):
+                loaded = self.database.load(self.cache_key, flag, start=start, end=end)
+                return self._select_records(loaded, None, None, sources)
+            if _is_selected_early(flag):
+                return self._build_selected(flag, start, end, sources, validation)
+            parsed = _parse_flag_records(flag=flag)
+            if self.lazy:
+                self.parsed[flag] = parsed
+            return self._select_records(parsed, start, end, sources)
 
         if isinstance(flag, str):
             return _get_parsed_data(flag=flag)
 
         elif isinstance(flag, list):
-            return {f: _get_parsed_data(flag=f) for f in flag}
+            if workers <= 1:
+                return {f: _get_parsed_data(flag=f) for f in flag}
 
-    def get_devices(self, flag: str | None = None) -> list[str] | dict[str, list[str]]:
+            prebuilt.update(
+                self._build_flags(
+                    [f for f in flag if not _is_selected_early(f)], workers, validation
+                )
+            )
+            parsed: dict[str, ParsedData] = {}
+            for f in flag:
+                try:
+                    parsed[f] = _get_parsed_data(flag=f)
+                except Exception:
+                    logger.error(f"Error parsing flag={f!r}")
+            return parsed
+
+    def _can_select(self, flag: str) -> bool:
         """
-        Get devices for each flag or for a given flag.
+        Check whether the records of a flag can be selected before they are built, i.e.
+        whether they are read from the export and not already parsed, cached or in the
+        database.
 
         Args:
-            flag (str, optional): Get devices for the given flag, defaults to None
+            flag (str): Flag of the records
 
         Returns:
-            list[str] | dict[str, list[str]]: Dictionary with flags as keys and list of devices as values
+            bool: True if the records can be selected before they are built
         """
+        return (
+            flag in self.records
+            and flag not in self.parsed
+            and not self._has_previous(flag)
+            and not (self.cache is not None and self.cache.has(self.cache_key, flag))
+            and not self._in_database(flag)
+        )
 
-        def _get_device_name(rec: ET.Element) -> str:
-            """
-            Get the device name from the record.
+    def _build_selected(
+        self,
+        flag: str,
+        start: date | datetime | str | None,
+        end: date | datetime | str | None,
+        sources: list[str] | None,
+        validation: str,
+    ) -> ParsedData:
+        """
+        Build the records of a flag with a start date in `[start, end)` and one of the
+        given sources, without building (nor validating) the other records. In indexed
+        mode, only the slices of the records in the date range are read.
 
-            For example:
-            `'<<HKDevice: 0x9999zz000>, name:Apple Watch, manufacturer:Apple Inc., model:Watch, hardware:Watch6,7, software:10.6>'`
+        Args:
+            flag (str): Flag of the records
+            start (date | datetime | str, optional): Start of the date range
+            end (date | datetime | str, optional): End of the date range (excluded)
+            sources (list[str], optional): Sources of the records
+            validation (str): Validation mode of the records
 
-            Should return:
-            `'Apple Watch (Watch6,7; 10.6)'`
+        Returns:
+            ParsedData: Selected parsed data, with the sources and devices of the whole flag
+        """
+        indexed = self.records[flag]
+        if isinstance(indexed, IndexedRecords) and (
+            start is not None or end is not None
+        ):
+            # Only the slices of the records starting in the (widened) date range are read
+            self._check_flag(flag)
+            store = indexed.read_store(
+                start=None if start is None else get_utc_bound(start, -1),
+                end=None if end is None else get_utc_bound(end, 1),
+            )
+            sorted_records = SortedRecords(store)
+        else:
+            sorted_records = self._get_sorted_records(flag)
+        rows = sorted_records.select(start=start, end=end, sources=sources)
+        records, _, failed = build_flag(
+            flag,
+            sorted_records.store.take(rows),
+            builder=self.builder,
+            validation=validation,
+        )
+        self._log_failed(failed)
+        if records.empty:
+            # Without any (valid) selected record, the records keep the columns of the flag
+            _, values = sorted_records.store.get_codes("value")
+            records = get_empty_records(flag, values)
+        # Naive bounds also select the records within the largest UTC offset
+        records = filter_sources(
+            filter_dates(add_device_columns(records), start=start, end=end), sources
+        )
+        return ParsedData(
+            flag=flag,
+            sources=self.get_sources(flag=flag),
+            devices=self.get_devices(flag=flag),
+            dates=set(get_local_time(records).dt.date) if len(records) else set(),
+            records=records,
+        )
 
-            Args:
-                rec (ET.Element): Record from the export.xml file
+    def _get_sorted_records(self, flag: str) -> SortedRecords:
+        """
+        Get the records of a flag sorted by start date (see `SortedRecords`).
 
-            Returns:
-                str: Device name with model and software version
-            """
-            device_info = rec.attrib["device"].split(", ")
-            name = device_info[1].split(":")[1]
-            model = device_info[4].split(":")[1]
-            try:
-                software = device_info[5].split(":")[1].strip(">")
-                return f"{name} ({model}; {software})"
-            except IndexError:
-                logger.debug(f"No software version found for {name} ({model})")
-                return f"{name} ({model})"
+        Records are only sorted once (streamed or indexed records are read into a store
+        first, see `_load_store`).
 
-        if flag:
-            return sorted(
-                {
-                    _get_device_name(rec)
-                    for rec in self.records[flag]
-                    if "device" in rec.attrib
-                }
-            )
+        Args:
+            flag (str): Flag of the records
+
+        Returns:
+            SortedRecords: Sorted records of the flag
+        """
+        if flag not in self.sorted:
+            self.sorted[flag] = SortedRecords(self._get_store(flag))
+        return self.sorted[flag]
+
+    def query(
+        self,
+        flag: str,
+        start: date | datetime | str | None = None,
+        end: date | datetime | str | None = None,
+        sources: list[str] | None = None,
+        columns: list[str] | None = None,
+        validation: str = Validations.FULL,
+    ) -> pd.DataFrame:
+        """
+        Get the records of a flag with a start date in `[start, end)` (see `filter_dates`)
+        and one of the given sources, sorted by start date.
+
+        The records of the flag are sorted by start date once (see `SortedRecords`), and
+        only the records in the date range and of the sources are then built, so a year
+        of a large flag costs about a year of records. If the flag is already parsed
+        (in lazy mode), cached, in the database, or appended to a previous export, its
+        parsed records are filtered instead.
+
+        Args:
+            flag (str): Flag of the records
+            start (date | datetime | str, optional): Start of the date range, defaults to None
+            end (date | datetime | str, optional): End of the date range (excluded), defaults to None
+            sources (list[str], optional): Sources of the records, defaults to None (i.e. all sources)
+            columns (list[str], optional): Columns of the records, defaults to None (i.e. all columns)
+            validation (str): Validation mode of the records (see `get_flag_records`), defaults to `"full"`
+
+        Raises:
+            InvalidFlag: Flag is not in the export
+            DiscardedFlag: Records of the flag were discarded at ingest
+            InvalidValidation: Validation mode is not allowed
+
+        Returns:
+            pd.DataFrame: Selected records
+        """
+        if validation not in VALIDATIONS:
+            raise InvalidValidation(validation)
+
+        if self._can_select(flag):
+            data = self._build_selected(flag, start, end, sources, validation)
         else:
-            return {
-                flag: sorted(
+            data = self.get_flag_records(
+                flag, validation=validation, start=start, end=end, sources=sources
+            )
+
+        records = data.records
+        if records.empty:
+            # Records built from no model have no columns
+            return records if columns is None else records.reindex(columns=columns)
+        records = records.sort_values("start_date", kind="stable", ignore_index=True)
+        return records if columns is None else records[columns]
+
+    def _has_previous(self, flag: str) -> bool:
+        """
+        Check whether the older records of a flag come from the previous export.
+
+        Args:
+            flag (str): Flag of the records
+
+        Returns:
+            bool: True if the records of the flag are appended to the previous export
+        """
+        return (
+            self.previous_manifest is not None
+            and not self.from_cache
+            and flag in self.previous_manifest["data"]
+        )
+
+    @staticmethod
+    def _concat_records(previous: pd.DataFrame, new: pd.DataFrame) -> pd.DataFrame:
+        """
+        Append new records to the records of the previous export.
+
+        If the dtypes of the columns differ (e.g. categorical columns with other
+        categories), the columns are rebuilt so that the dtypes match those of a full parse.
+
+        Args:
+            previous (pd.DataFrame): Records of the previous export
+            new (pd.DataFrame): New records
+
+        Returns:
+            pd.DataFrame: All records
+        """
+        if new.empty:
+            return previous
+        if previous.empty:
+            return new
+        if previous.dtypes.to_dict() == new.dtypes.to_dict():
+            return pd.concat([previous, new], ignore_index=True)
+        columns = dict.fromkeys([*previous.columns, *new.columns])
+        return add_device_columns(
+            categorize(
+                pd.DataFrame(
                     {
-                        _get_device_name(rec)
-                        for rec in self.records[flag]
-                        if "device" in rec.attrib
+                        column: [
+                            *previous.get(column, [None] * len(previous)),
+                            *new.get(column, [None] * len(new)),
+                        ]
+                        for column in columns
                     }
                 )
-                for flag in self.flags
+            )
+        )
+
+    def get_devices(self, flag: str | None = None) -> list[str] | dict[str, list[str]]:
+        """
+        Get devices for each flag or for a given flag.
+
+        Args:
+            flag (str, optional): Get devices for the given flag, defaults to None
+
+        Returns:
+            list[str] | dict[str, list[str]]: Dictionary with flags as keys and list of devices as values
+        """
+
+        def _get_flag_devices(flag: str) -> list[str]:
+            if self.from_cache:
+                return self.manifest["data"].get(flag, {}).get("devices", [])
+            if flag not in self.records:
+                return []
+            devices = self._get_flag_summary(flag).devices
+            # Each distinct device string is only parsed once (see `parse_device`)
+            names = {parse_device(device).label for device in devices}
+            if self._has_previous(flag):
+                names.update(self.previous_manifest["data"][flag]["devices"])
+            return sorted(names)
+
+        if flag:
+            return _get_flag_devices(flag)
+        else:
+            return {
+                flag: _get_flag_devices(flag) for flag in self._get_selected_flags()
             }
 
     def get_sources(self, flag: str | None = None) -> list[str] | dict[str, list[str]]:
@@ -279,12 +1463,22 @@ class Parser(Loader):
         Returns:
             list[str] | dict[str, list[str]]: Dictionary with flags as keys and list of sources as values
         """
+
+        def _get_flag_sources(flag: str) -> list[str]:
+            if self.from_cache:
+                return self.manifest["data"].get(flag, {}).get("sources", [])
+            if flag not in self.records:
+                return []
+            sources = set(self._get_flag_summary(flag).sources)
+            if self._has_previous(flag):
+                sources.update(self.previous_manifest["data"][flag]["sources"])
+            return sorted(sources)
+
         if flag:
-            return sorted({rec.attrib["sourceName"] for rec in self.records[flag]})
+            return _get_flag_sources(flag)
         else:
             return {
-                flag: sorted({rec.attrib["sourceName"] for rec in self.records[flag]})
-                for flag in self.flags
+                flag: _get_flag_sources(flag) for flag in self._get_selected_flags()
             }
 
     @staticmethod
@@ -311,26 +1505,83 @@ class Parser(Loader):
         logger.info(f"Parsed data written to {filepath}")
 
     @timeit
-    def export(self, dir_name: str) -> None:
+    def export(
+        self,
+        dir_name: str,
+        workers: int = 1,
+        format: str = "csv",
+        partition: bool = False,
+    ) -> None:
         """
-        Export all parsed data to multiple CSV files.
+        Export all parsed data to multiple files, one per flag (see `write_parsed_data`).
+
+        The columnar formats (`"parquet"`, `"feather"` and `"arrow"`) require `pyarrow`.
+        They keep the dtypes of the records (e.g. categorical columns and UTC dates) and
+        are much smaller and faster to read back than CSV files.
+
+        With the `"sqlite"` format, all flags are bulk-loaded into one SQLite database
+        (`export.sqlite`, see `RecordDatabase`), which can be given back to a `Parser` to
+        load the records from it.
 
         Args:
-            dir_name (str): Directory name to export the CSV files to, defaults to current directory
+            dir_name (str): Directory name to export the files to, defaults to current directory
+            workers (int): Number of processes to build the records of the flags with, defaults to 1
+            format (str): Export format (`"csv"`, `"parquet"`, `"feather"`, `"arrow"` or `"sqlite"`), defaults to `"csv"`
+            partition (bool): Whether to partition the files by flag and year (Hive-style directories), defaults to False (not for `"sqlite"`)
+
+        Raises:
+            InvalidExportFormat: Export format is not allowed
+            MissingDependency: `pyarrow` is not installed (columnar formats)
         """
+        if format not in EXPORT_FORMATS:
+            raise InvalidExportFormat(format)
+        if format not in (ExportFormats.CSV, ExportFormats.SQLITE):
+            import_pyarrow()
+
         export_dir = Path(dir_name)
         export_dir.mkdir(exist_ok=True)
 
         logger.info(f"Exporting parsed data to {export_dir}...")
 
-        for n, flag in enumerate(self.flags):
-            try:
-                parsed = self.get_flag_records(flag=flag)
-            except Exception:
-                logger.error(f"Error parsing {flag=}")
-                continue
+        # Flags discarded at ingest have no records to export
+        flags = self._get_selected_flags()
+
+        database = None
+        if format == ExportFormats.SQLITE:
+            key = self.cache_key or self._get_export_key()
+            database = RecordDatabase(export_dir / DATABASE)
+            database.set_flags(key, self._get_flag_counts())
+
+        # With several workers, the flags which fail to parse are logged and left out
+        built = (
+            self.get_flag_records(flag=flags, workers=workers) if workers > 1 else None
+        )
+
+        for n, flag in enumerate(flags):
+            if built is not None:
+                if flag not in built:
+                    continue
+                parsed = built.pop(flag)
+            else:
+                try:
+                    parsed = self.get_flag_records(flag=flag)
+                except Exception:
+                    logger.error(f"Error parsing {flag=}")
+                    continue
+
+            if database is not None:
+                database.store(key, parsed)
+                filename = str(database.path)
+            elif format == ExportFormats.CSV and not partition:
+                filename = f"{dir_name}/{flag}.csv"
+                self.write_csv(data=parsed, filename=filename)
+            else:
+                paths = write_parsed_data(
+                    parsed, export_dir, format=format, partition=partition
+                )
+                filename = f"{len(paths)} files" if partition else str(paths[0])
 
-            filename = f"{dir_name}/{flag}.csv"
-            self.write_csv(data=parsed, filename=filename)
+            logger.info(f"Exported {n + 1}/{len(flags)} flags to {filename}")
 
-            logger.info(f"Exported {n + 1}/{len(self.flags)} flags to {filename}")
+        if database is not None:
+            database.create_indexes()
@@ -0,0 +1,159 @@
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass
+from queue import Full, Queue
+from typing import IO
+
+from apple_health_parser.utils.logging import logger
+
+DEFAULT_QUEUE_DEPTH = 8
+DEFAULT_BUFFER_SIZE = 256 * 1024
+
+# Interval at which a blocked decompression thread checks whether it should stop
+POLL_INTERVAL = 0.1
+
+
+@dataclass
+class PipelineStats:
+    """
+    Counters of a decompression pipeline, accumulated over every file it streamed.
+
+    Attributes:
+        buffers (int): Number of buffers decompressed
+        bytes (int): Number of bytes decompressed
+        decompress_time (float): Time spent decompressing (in seconds)
+        producer_stall (float): Time the decompression thread waited for room in the queue, i.e. parsing is the bottleneck (in seconds)
+        consumer_stall (float): Time the parser waited for a buffer, i.e. decompression is the bottleneck (in seconds)
+    """
+
+    buffers: int = 0
+    bytes: int = 0
+    decompress_time: float = 0.0
+    producer_stall: float = 0.0
+    consumer_stall: float = 0.0
+
+
+class DecompressionPipeline:
+    """
+    Producer/consumer pipeline overlapping the decompression and the parsing of a file.
+
+    A thread reads (i.e. inflates) the file into a bounded queue of buffers, which the
+    parser consumes through the feed interface of lxml. zlib releases the GIL while
+    inflating, so the wall time tends to the slowest of both steps instead of their sum.
+
+    The stall times in `stats` tell which step is the bottleneck: a producer stall means
+    the queue is full (parsing is slower), and a consumer stall means the queue is
+    empty (decompression is slower).
+    """
+
+    def __init__(
+        self,
+        queue_depth: int = DEFAULT_QUEUE_DEPTH,
+        buffer_size: int = DEFAULT_BUFFER_SIZE,
+    ) -> None:
+        """
+        Initialize the DecompressionPipeline.
+
+        Args:
+            queue_depth (int): Maximum number of decompressed buffers waiting to be parsed, defaults to `DEFAULT_QUEUE_DEPTH`
+            buffer_size (int): Size of the decompressed buffers (in bytes), defaults to `DEFAULT_BUFFER_SIZE`
+        """
+        self.queue_depth = queue_depth
+        self.buffer_size = buffer_size
+        self.stats = PipelineStats()
+
+    @contextmanager
+    def stream(self, file: IO[bytes]) -> Iterator[Iterator[bytes]]:
+        """
+        Stream the content of a file, read in a background thread, as buffers.
+
+        The thread is stopped when leaving the context, even if the buffers were not all
+        consumed.
+
+        Args:
+            file (IO[bytes]): File object (e.g. a file in a zip file, decompressed as it is read)
+
+        Yields:
+            Iterator[bytes]: Buffers of the file, in order
+        """
+        buffers: Queue[bytes | BaseException | None] = Queue(maxsize=self.queue_depth)
+        stop = threading.Event()
+        thread = threading.Thread(
+            target=self._produce, args=(file, buffers, stop), daemon=True
+        )
+        thread.start()
+        try:
+            yield self._consume(buffers)
+        finally:
+            stop.set()
+            thread.join()
+            logger.debug(
+                f"Decompression waited {self.stats.producer_stall:.2f}s for parsing, "
+                f"parsing waited {self.stats.consumer_stall:.2f}s for decompression"
+            )
+
+    def _produce(
+        self,
+        file: IO[bytes],
+        buffers: "Queue[bytes | BaseException | None]",
+        stop: threading.Event,
+    ) -> None:
+        """
+        Read a file into the queue of buffers, until its end (`None`) or an error.
+
+        Args:
+            file (IO[bytes]): File object
+            buffers (Queue[bytes | BaseException | None]): Queue of buffers
+            stop (threading.Event): Event set when the consumer is done
+        """
+        item: bytes | BaseException | None
+        while not stop.is_set():
+            try:
+                start = time.perf_counter()
+                item = file.read(self.buffer_size) or None
+                self.stats.decompress_time += time.perf_counter() - start
+            except BaseException as error:
+                item = error
+
+            if isinstance(item, bytes):
+                self.stats.buffers += 1
+                self.stats.bytes += len(item)
+
+            start = time.perf_counter()
+            while not stop.is_set():
+                try:
+                    buffers.put(item, timeout=POLL_INTERVAL)
+                    break
+                except Full:
+                    continue
+            self.stats.producer_stall += time.perf_counter() - start
+
+            if not isinstance(item, bytes):
+                return
+
+    def _consume(
+        self, buffers: "Queue[bytes | BaseException | None]"
+    ) -> Iterator[bytes]:
+        """
+        Consume the queue of buffers.
+
+        Args:
+            buffers (Queue[bytes | BaseException | None]): Queue of buffers
+
+        Raises:
+            BaseException: Error raised while reading the file
+
+        Yields:
+            bytes: Buffer of the file
+        """
+        while True:
+            start = time.perf_counter()
+            item = buffers.get()
+            self.stats.consumer_stall += time.perf_counter() - start
+            if item is None:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item
@@ -1,8 +1,11 @@
 import click
+import numpy as np
 import pandas as pd
 
 from apple_health_parser.interfaces.preprocessor_interface import PreprocessorInterface
 from apple_health_parser.utils.logging import logger
+from apple_health_parser.utils.results import RESULT_CACHE, ResultCache
+from apple_health_parser.utils.timestamps import DATE_COLUMNS, get_local_time
 
 
 class Preprocessor(PreprocessorInterface):
@@ -11,10 +14,16 @@ class Preprocessor(PreprocessorInterface):
 
     Additional steps:
     - Validate `flag`, `source`, `operation`, and `year`
+    - Convert the dates to the local (wall-clock) time of each record
     - Filter the records for the given year (e.g. `2024`)
     - Apply the operation to the data if provided (e.g. `"mean"` or `"sum"`)
+
+    Results are kept in a memory-bounded cache shared by the process (see `ResultCache`),
+    which can be replaced (e.g. with a larger `max_size`), or disabled with `None`.
     """
 
+    cache: ResultCache | None = RESULT_CACHE
+
     def get_dataframe(self) -> pd.DataFrame:
         """
         Get the preprocessed data in a DataFrame.
@@ -34,26 +43,15 @@ class Preprocessor(PreprocessorInterface):
         ...         ...
         ```
 
+        The records of the year (and source), with the operation applied, are cached
+        in `cache` (shared by every preprocessor, and thus by every plot), by ParsedData
+        object, year, source and operation. Heatmaps are built from the cached records.
+        Cached records are shallow copies, which can be modified without modifying the
+        cache.
+
         Returns:
             pd.DataFrame: DataFrame with the preprocessed data
         """
-        self.records = self.data.records
-
-        # Filter by source (e.g. "Apple Watch" or "iPhone")
-        if self.src:
-            self.records = self.records[self.records.source_name == self.src]
-
-        # Filter by year (e.g. 2024)
-        self.records["date"] = self.records.start_date.dt.date
-        self.records = self.records[
-            self.records.date.apply(lambda x: x.year == self.year)
-        ]
-
-        # TODO: Handle other flags with special cases
-        # Special case for HKQuantityTypeIdentifierOxygenSaturation (convert to percentage)
-        if self.flag == "HKQuantityTypeIdentifierOxygenSaturation":
-            self.records.value *= 100
-
         if self.flag == "HKCategoryTypeIdentifierSleepAnalysis":
             if self.oper:
                 logger.warning(
@@ -62,15 +60,19 @@ class Preprocessor(PreprocessorInterface):
                 )
                 self.oper = None
 
-        # Apply operation (e.g. "mean" or "sum")
-        if self.oper:
-            self.records = (
-                self.records.groupby("date")["value"]
-                .apply(getattr(pd.Series, self.oper))
-                .round()
-                .reset_index()
+        if self.cache is None:
+            self.records = self._get_records()
+        else:
+            key = (
+                type(self),
+                self.data.fingerprint,
+                self.year,
+                self.src or None,
+                self.oper,
             )
+            self.records = self.cache.get_or_compute(key, self._get_records)
 
+        if self.oper:
             logger.info(
                 f"Found {len(self.records)} records "
                 f"(flag: {click.style(self.flag, fg='magenta')}, "
@@ -97,6 +99,48 @@ class Preprocessor(PreprocessorInterface):
 
         return self.records
 
+    def _get_records(self) -> pd.DataFrame:
+        """
+        Get the records of the year (and source), with the operation applied if provided
+        (see `get_dataframe`).
+
+        Returns:
+            pd.DataFrame: Records of the year, or daily values if an operation is provided
+        """
+        records = self.data.records
+
+        # Days (and plots) follow the local time of each record, and days are kept as
+        # `datetime64` keys, so that the year is selected without any Python object
+        days = get_local_time(records).to_numpy().astype("datetime64[D]")
+        mask = days.astype("datetime64[Y]") == np.datetime64(f"{self.year:04d}", "Y")
+
+        # Filter by source (e.g. "Apple Watch" or "iPhone"), on the codes of the column
+        if self.src:
+            mask &= (records.source_name == self.src).to_numpy()
+
+        # Shallow copy of the selected records, so that the parsed records are not modified
+        records = records[mask].copy(deep=False)
+        for column in DATE_COLUMNS:
+            records[column] = get_local_time(records, column)
+        records["date"] = days[mask]
+
+        # TODO: Handle other flags with special cases
+        # Special case for HKQuantityTypeIdentifierOxygenSaturation (convert to percentage)
+        if self.flag == "HKQuantityTypeIdentifierOxygenSaturation":
+            records.value *= 100
+
+        # Apply operation (e.g. "mean" or "sum")
+        if self.oper:
+            # Built-in (cythonized) reduction per day, on the sorted day keys
+            records = (
+                records.groupby("date", sort=True)["value"]
+                .agg(self.oper)
+                .round()
+                .reset_index()
+            )
+
+        return records
+
     @staticmethod
     def get_heatmap(data: pd.DataFrame) -> pd.DataFrame:
         """
@@ -115,7 +159,27 @@ class Preprocessor(PreprocessorInterface):
         Returns:
             pd.DataFrame: Heatmap data
         """
-        data["month"] = data.date.apply(lambda x: x.month)
-        data["day"] = data.date.apply(lambda x: x.day)
-        heatmap = data.pivot(index="month", columns="day", values="value")
+        # Month and day of each day key, as positions in a 12x31 grid
+        days = data.date.to_numpy().astype("datetime64[D]")
+        months = days.astype("datetime64[M]")
+        rows = months.astype(int) % 12
+        cols = (days - months).astype(int)
+
+        values = data.value.to_numpy()
+        grid = np.full((12, 31), np.nan)
+        filled = np.zeros((12, 31), dtype=bool)
+        grid[rows, cols] = values
+        filled[rows, cols] = True
+
+        # Only months and days with some data are kept (as with a pivot of the data)
+        used_rows = filled.any(axis=1)
+        used_cols = filled.any(axis=0)
+        heatmap = pd.DataFrame(
+            grid[np.ix_(used_rows, used_cols)],
+            index=pd.Index(np.flatnonzero(used_rows) + 1, name="month"),
+            columns=pd.Index(np.flatnonzero(used_cols) + 1, name="day"),
+        )
+        # Integer values (e.g. counts) keep their dtype when no day is missing
+        if filled[np.ix_(used_rows, used_cols)].all():
+            heatmap = heatmap.astype(values.dtype)
         return heatmap
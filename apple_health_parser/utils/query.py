@@ -0,0 +1,109 @@
+from collections.abc import Iterable
+from datetime import date, datetime
+
+import numpy as np
+import pandas as pd
+
+from apple_health_parser.utils.categories import remove_unused_categories
+from apple_health_parser.utils.store import RecordStore
+from apple_health_parser.utils.timestamps import get_utc_bound
+
+
+class SortedRecords:
+    """
+    Records of a store sorted by start date, to select them before they are built.
+
+    Only the positions of the records (in order of their UTC start date) and their sorted
+    start dates are kept, so the bounds of a date range are found by binary search, and
+    the sources are selected with a bitmap over the codes of the sources. Records whose
+    start date could not be parsed when they were stored are always selected, as they
+    can only be dated once they are built.
+    """
+
+    def __init__(self, store: RecordStore) -> None:
+        """
+        Initialize the SortedRecords of the given store.
+
+        Args:
+            store (RecordStore): Store of the records of a flag
+        """
+        self.store = store
+        utc, _, parsed = store.get_dates("startDate")
+        order = np.argsort(utc, kind="stable")
+        # Positions of the records with a parsed start date, by start date
+        self.order = order[parsed[order]]
+        # UTC start dates of these records (`datetime64[us]`), sorted
+        self.times = utc[self.order]
+        self.irregular = np.flatnonzero(~parsed)
+
+    def __len__(self) -> int:
+        return len(self.store)
+
+    def _search(self, bound: date | datetime | str, sign: int) -> int:
+        """
+        Find the position of a bound of a date range in the sorted start dates.
+
+        Args:
+            bound (date | datetime | str): Bound of the date range
+            sign (int): -1 for the start of the range, 1 for its end
+
+        Returns:
+            int: Position of the first start date after the bound
+        """
+        timestamp = get_utc_bound(bound, sign).tz_convert(None)
+        return int(np.searchsorted(self.times, np.datetime64(timestamp, "us")))
+
+    def select(
+        self,
+        start: date | datetime | str | None = None,
+        end: date | datetime | str | None = None,
+        sources: Iterable[str] | None = None,
+    ) -> np.ndarray:
+        """
+        Select the records which may have a start date in `[start, end)` and one of the
+        given sources.
+
+        As naive bounds are local times, records within the largest UTC offset of the
+        range are selected as well, so the built records must then be filtered exactly
+        (see `filter_dates`).
+
+        Args:
+            start (date | datetime | str, optional): Start of the date range, defaults to None
+            end (date | datetime | str, optional): End of the date range (excluded), defaults to None
+            sources (Iterable[str], optional): Sources of the records, defaults to None (i.e. all sources)
+
+        Returns:
+            np.ndarray: Positions of the records in the store, by start date
+        """
+        first = 0 if start is None else self._search(start, -1)
+        last = len(self.times) if end is None else self._search(end, 1)
+        rows = np.concatenate([self.order[first:last], self.irregular])
+
+        if sources is not None:
+            codes, vocabulary = self.store.get_codes("sourceName")
+            selected = set(sources)
+            # Missing sources (-1) map to the last entry, which is never selected
+            bitmap = np.array(
+                [value in selected for value in vocabulary] + [False], dtype=bool
+            )
+            rows = rows[bitmap[codes[rows]]]
+        return rows
+
+
+def filter_sources(
+    records: pd.DataFrame, sources: Iterable[str] | None = None
+) -> pd.DataFrame:
+    """
+    Select the records of some sources.
+
+    Args:
+        records (pd.DataFrame): Parsed records
+        sources (Iterable[str], optional): Sources of the records, defaults to None (i.e. all sources)
+
+    Returns:
+        pd.DataFrame: Records of the sources (all records if no source is given)
+    """
+    if sources is None or records.empty:
+        return records
+    mask = records.source_name.isin(list(sources)).to_numpy()
+    return remove_unused_categories(records[mask].reset_index(drop=True))
@@ -0,0 +1,153 @@
+import threading
+from collections import OrderedDict
+from collections.abc import Callable, Hashable
+from dataclasses import dataclass
+
+import pandas as pd
+
+DEFAULT_MAX_SIZE = 512 * 1024**2
+
+
+@dataclass
+class ResultCacheStats:
+    """
+    Counters of a result cache, accumulated since it was created (or cleared).
+
+    Attributes:
+        hits (int): Number of lookups which found a result
+        misses (int): Number of lookups which did not find a result
+        evictions (int): Number of results evicted to stay within the size of the cache
+        entries (int): Number of cached results
+        size (int): Size of the cached results (in bytes)
+    """
+
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    entries: int = 0
+    size: int = 0
+
+
+class ResultCache:
+    """
+    In-memory cache of DataFrames (e.g. the results of `Preprocessor.get_dataframe`),
+    bounded by their size in bytes.
+
+    When the cache grows over `max_size`, the least recently used results are evicted,
+    and results larger than `max_size` are never cached. Lookups and updates are guarded
+    by a lock, so the cache can be shared between threads, and results are returned as
+    shallow copies, so that modifying a result never modifies the cached one.
+    """
+
+    def __init__(self, max_size: int = DEFAULT_MAX_SIZE) -> None:
+        """
+        Initialize the cache.
+
+        Args:
+            max_size (int): Maximum size of the cached results (in bytes), defaults to 512 MiB
+        """
+        self.max_size = max_size
+        self.stats = ResultCacheStats()
+        self._results: OrderedDict[Hashable, tuple[pd.DataFrame, int]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._results)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._results
+
+    def get(self, key: Hashable) -> pd.DataFrame | None:
+        """
+        Get a cached result, and mark it as recently used.
+
+        Args:
+            key (Hashable): Key of the result
+
+        Returns:
+            pd.DataFrame | None: Copy of the cached result, or None if it is not cached
+        """
+        with self._lock:
+            entry = self._results.get(key)
+            if entry is None:
+                self.stats.misses += 1
+                return None
+            self._results.move_to_end(key)
+            self.stats.hits += 1
+        return entry[0].copy(deep=False)
+
+    def put(self, key: Hashable, result: pd.DataFrame) -> None:
+        """
+        Cache a result, evicting the least recently used results if needed.
+
+        Args:
+            key (Hashable): Key of the result
+            result (pd.DataFrame): Result to cache
+        """
+        size = int(result.memory_usage(deep=True).sum())
+        if size > self.max_size:
+            return
+
+        with self._lock:
+            previous = self._results.pop(key, None)
+            if previous is not None:
+                self.stats.size -= previous[1]
+            self._results[key] = (result.copy(deep=False), size)
+            self.stats.size += size
+            self._evict()
+            self.stats.entries = len(self._results)
+
+    def get_or_compute(
+        self, key: Hashable, compute: Callable[[], pd.DataFrame]
+    ) -> pd.DataFrame:
+        """
+        Get a cached result, or compute and cache it.
+
+        The result is computed outside of the lock, so two threads missing the same key
+        at once both compute it.
+
+        Args:
+            key (Hashable): Key of the result
+            compute (Callable[[], pd.DataFrame]): Function computing the result
+
+        Returns:
+            pd.DataFrame: Result
+        """
+        result = self.get(key)
+        if result is None:
+            result = compute()
+            self.put(key, result)
+        return result
+
+    def _evict(self) -> None:
+        """
+        Evict the least recently used results until the cache fits in `max_size`.
+        """
+        while self.stats.size > self.max_size and self._results:
+            _, (_, size) = self._results.popitem(last=False)
+            self.stats.size -= size
+            self.stats.evictions += 1
+
+    def resize(self, max_size: int) -> None:
+        """
+        Change the maximum size of the cache, evicting results if needed.
+
+        Args:
+            max_size (int): Maximum size of the cached results (in bytes)
+        """
+        with self._lock:
+            self.max_size = max_size
+            self._evict()
+            self.stats.entries = len(self._results)
+
+    def clear(self) -> None:
+        """
+        Remove every cached result and reset the counters.
+        """
+        with self._lock:
+            self._results.clear()
+            self.stats = ResultCacheStats()
+
+
+# Cache shared by every preprocessor of the process (see `Preprocessor.cache`)
+RESULT_CACHE = ResultCache()
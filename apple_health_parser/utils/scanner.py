@@ -0,0 +1,267 @@
+import gc
+import mmap
+import re
+from collections.abc import Iterator
+from contextlib import contextmanager
+from html import unescape
+from pathlib import Path
+
+import lxml.etree as ET
+
+from apple_health_parser.decorators import timeit
+from apple_health_parser.utils.batch import RecordBatch
+from apple_health_parser.utils.index import (
+    ATTRIBUTES,
+    RECORD_START,
+    TYPE,
+    get_attribute,
+    iter_record_chunks,
+)
+from apple_health_parser.utils.loader import Loader, ZipMember
+from apple_health_parser.utils.logging import logger
+
+# Record with its attributes and content (i.e. everything up to its end tag), if any
+RECORD_ELEMENT = re.compile(
+    RECORD_START + ATTRIBUTES + rb"\s*(?:/>|>([^<]*(?:<(?!/Record>)[^<]*)*)</Record>)"
+)
+# Text between two attribute values (e.g. `" sourceName="`)
+ATTRIBUTE_NAME = re.compile(r"\s+([^\s=<>'\"]+)\s*=\s*")
+METADATA_ENTRY = re.compile(rb'<MetadataEntry\s+key="[^"]*"\s+value="([^"]*)"\s*/>')
+
+
+@contextmanager
+def _pause_gc() -> Iterator[None]:
+    """
+    Pause the garbage collector.
+
+    Scanning allocates millions of (acyclic) strings and tuples, which would otherwise
+    trigger many collections of a growing heap for nothing.
+    """
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+@contextmanager
+def _open_buffer(xml_file: Path | ZipMember) -> Iterator[bytes | mmap.mmap]:
+    """
+    Open an XML file as a buffer: memory-mapped from disk, or decompressed in memory.
+
+    Args:
+        xml_file (Path | ZipMember): Path to the XML file, or XML file in a zip file
+
+    Yields:
+        bytes | mmap.mmap: Content of the XML file
+    """
+    if isinstance(xml_file, Path):
+        with (
+            open(xml_file, "rb") as file,
+            mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data,
+        ):
+            yield data
+    else:
+        with Loader._open_xml(xml_file) as file:
+            yield file.read()
+
+
+class RecordScanner:
+    """
+    Scanner of the records of an export.xml file, working on their raw bytes.
+
+    Records of a flag (and source) share the same attributes, so the attribute names of
+    each layout of start tag are only worked out once. Attribute values with entities
+    (e.g. the `&lt;&lt;HKDevice...&gt;` devices) are repeated as well, and are only
+    unescaped once.
+    """
+
+    def __init__(self) -> None:
+        """
+        Initialize the RecordScanner.
+        """
+        self.layouts: dict[tuple[str, ...], tuple[str, ...] | None] = {}
+        self.unescaped: dict[str, str] = {}
+
+    def scan(
+        self, attributes: bytes, body: bytes
+    ) -> tuple[tuple[str, ...], tuple[str, ...], str | None] | None:
+        """
+        Extract the attributes and first metadata value of a record, without parsing it.
+
+        Only regular records are handled: double-quoted attributes, and `MetadataEntry`
+        children only. None is returned for anything else, so that the record can be
+        parsed with lxml instead.
+
+        Args:
+            attributes (bytes): Attributes of the start tag of the record (e.g. `b' type="..." value="..."'`)
+            body (bytes): Content of the record, between its start and end tags
+
+        Returns:
+            tuple[tuple[str, ...], tuple[str, ...], str | None] | None: Attribute names, attribute values and first metadata value, or None if irregular
+        """
+        text = attributes.decode()
+        pieces = text.split('"')
+        layout = tuple(pieces[::2])
+        names = self.layouts.get(layout, ())
+        if names == ():
+            names = self.layouts[layout] = self._get_names(layout)
+        if names is None:
+            return None
+
+        # Whitespace in attribute values is normalized by lxml (and `<` is not allowed)
+        if "\n" in text or "\t" in text or "\r" in text or "<" in text:
+            return None
+        values = pieces[1::2]
+        # Entities are rare, but for the devices (e.g. `&lt;&lt;HKDevice...&gt;`)
+        amp = text.find("&")
+        while amp != -1:
+            n = text.count('"', 0, amp) // 2
+            values[n] = self._unescape(values[n])
+            amp = text.find("&", text.find('"', amp))
+
+        metadata = None
+        if body:
+            entries = METADATA_ENTRY.findall(body)
+            if body.count(b"<") != len(entries):
+                return None
+            if entries:
+                metadata = entries[0].decode()
+                if "&" in metadata:
+                    metadata = unescape(metadata)
+
+        return names, tuple(values), metadata
+
+    @staticmethod
+    def _get_names(layout: tuple[str, ...]) -> tuple[str, ...] | None:
+        """
+        Get the attribute names of a layout of start tag.
+
+        Args:
+            layout (tuple[str, ...]): Text around the attribute values of a start tag
+
+        Returns:
+            tuple[str, ...] | None: Attribute names, or None if the layout is irregular
+        """
+        # e.g. (' type=', ' sourceName=', ..., ' value=', '')
+        *parts, tail = layout
+        matches = [ATTRIBUTE_NAME.fullmatch(part) for part in parts]
+        # Single-quoted attributes do not split into such a layout
+        if not all(matches) or tail:
+            return None
+        return tuple(match.group(1) for match in matches if match)
+
+    def _unescape(self, value: str) -> str:
+        """
+        Unescape the entities of an attribute value.
+
+        Args:
+            value (str): Attribute value
+
+        Returns:
+            str: Unescaped attribute value
+        """
+        unescaped = self.unescaped.get(value)
+        if unescaped is None:
+            unescaped = self.unescaped[value] = unescape(value)
+        return unescaped
+
+
+@timeit
+def scan_xml(
+    xml_file: Path | ZipMember,
+    include_flags: set[str] | None = None,
+    exclude_flags: set[str] | None = None,
+) -> tuple[dict[str, RecordBatch], dict[str, int]]:
+    """
+    Scan the records of an XML file into per-flag batches, without building lxml trees.
+
+    The top-level records are matched with a byte-level pattern, a chunk at a time (see
+    `iter_record_chunks`), and their attributes are split out of their start tags (see
+    `RecordScanner`).
+    Irregular records are parsed with lxml instead, so the result is identical to
+    the lxml engine.
+
+    Args:
+        xml_file (Path | ZipMember): Path to the XML file, or XML file in a zip file
+        include_flags (set[str], optional): Flags to keep the records of, defaults to None (i.e. all flags)
+        exclude_flags (set[str], optional): Flags to discard the records of, defaults to None
+
+    Returns:
+        tuple[dict[str, RecordBatch], dict[str, int]]: Batches by flag, and count of discarded records by flag
+    """
+    logger.info(f"Scanning {xml_file}...")
+
+    scanner = RecordScanner()
+    batches: dict[str, RecordBatch] = {}
+    # Consecutive rows of each flag with the same attributes, appended to the batch as columns
+    runs: dict[
+        str, tuple[tuple[str, ...], list[tuple[str, ...]], list[str | None]]
+    ] = {}
+    discarded: dict[str, int] = {}
+    fallbacks = 0
+    first: int | None = None
+
+    with _open_buffer(xml_file) as data, _pause_gc():
+        for pos, endpos in iter_record_chunks(data):
+            if first is None:
+                first = pos
+            for attributes, body in RECORD_ELEMENT.findall(data, pos, endpos):
+                flag = get_attribute(attributes, TYPE).decode()
+                if (include_flags is not None and flag not in include_flags) or (
+                    exclude_flags and flag in exclude_flags
+                ):
+                    discarded[flag] = discarded.get(flag, 0) + 1
+                    continue
+
+                if flag not in batches:
+                    batches[flag] = RecordBatch(flag)
+                    runs[flag] = ((), [], [])
+
+                row = scanner.scan(attributes, body)
+                names, values, metadata = row or ((), (), None)
+                run = runs[flag]
+                if row is None or names != run[0]:
+                    _flush_run(batches[flag], *run)
+                    run = runs[flag] = (names, [], [])
+                if row is None:
+                    fallbacks += 1
+                    batches[flag].append(
+                        ET.fromstring(b"<Record%s>%s</Record>" % (attributes, body))
+                    )
+                else:
+                    run[1].append(values)
+                    run[2].append(metadata)
+
+    for flag, run in runs.items():
+        _flush_run(batches[flag], *run)
+
+    Loader._log_header(xml_file, first)
+    if fallbacks:
+        logger.debug(f"Parsed {fallbacks:,} irregular records with lxml")
+
+    return batches, discarded
+
+
+def _flush_run(
+    batch: RecordBatch,
+    names: tuple[str, ...],
+    rows: list[tuple[str, ...]],
+    metadata: list[str | None],
+) -> None:
+    """
+    Append rows with the same attributes to a batch, as columns.
+
+    Args:
+        batch (RecordBatch): Batch of the flag of the rows
+        names (tuple[str, ...]): Attribute names of the rows
+        rows (list[tuple[str, ...]]): Attribute values of each row
+        metadata (list[str | None]): First metadata value of each row
+    """
+    if not rows:
+        return
+    columns: dict[str, list[str | None]] = dict(zip(names, map(list, zip(*rows))))
+    columns[RecordBatch.METADATA] = metadata
+    batch.extend_columns(columns, len(rows))
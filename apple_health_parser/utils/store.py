@@ -0,0 +1,509 @@
+from collections.abc import Iterable, Iterator
+from hashlib import blake2b
+
+import lxml.etree as ET
+import numpy as np
+import pandas as pd
+
+from apple_health_parser.utils.batch import RecordBatch
+from apple_health_parser.utils.timestamps import format_dates, parse_dates
+
+# Attributes of the records kept as dates (the others are kept as strings)
+DATE_KEYS = ("creationDate", "startDate", "endDate")
+# Number of records buffered as raw strings before they are encoded
+CHUNK_SIZE = 65_536
+
+# Code of a missing string
+MISSING = -1
+# Digest of a store without records (see `RecordStore.get_digest`)
+EMPTY_DIGEST = f"{0:016x}"
+
+
+def _mix(values: np.ndarray) -> np.ndarray:
+    """
+    Mix the bits of 64-bit hashes (finalizer of SplitMix64), wrapping on overflow.
+
+    Args:
+        values (np.ndarray): Hashes (`uint64`)
+
+    Returns:
+        np.ndarray: Mixed hashes (`uint64`)
+    """
+    values = values ^ (values >> np.uint64(30))
+    values = values * np.uint64(0xBF58476D1CE4E5B9)
+    values = values ^ (values >> np.uint64(27))
+    values = values * np.uint64(0x94D049BB133111EB)
+    return values ^ (values >> np.uint64(31))
+
+
+def _hash_strings(values: Iterable[str]) -> np.ndarray:
+    """
+    Hash strings into 64-bit hashes, which (unlike `hash`) do not change across runs.
+
+    Args:
+        values (Iterable[str]): Strings
+
+    Returns:
+        np.ndarray: Hashes (`uint64`)
+    """
+    return np.array(
+        [
+            int.from_bytes(blake2b(value.encode(), digest_size=8).digest(), "little")
+            for value in values
+        ],
+        dtype=np.uint64,
+    )
+
+
+def add_digests(*digests: str) -> str:
+    """
+    Get the digest of records from the digests of their parts (see `get_digest`).
+
+    Args:
+        digests (str): Digests of the parts of the records
+
+    Returns:
+        str: Digest of the records
+    """
+    return f"{sum(int(digest, 16) for digest in digests) % 2**64:016x}"
+
+
+class RecordStore:
+    """
+    Compact columnar store of the records of a single flag.
+
+    Records are appended as raw attributes (from lxml elements, or from batches), and
+    encoded by chunks of `CHUNK_SIZE` records into typed arrays:
+
+    - strings are dictionary-encoded: each distinct value is kept once in the vocabulary
+      of its attribute, and each record only holds its code (`int32`, `MISSING` if the
+      record does not have the attribute)
+    - dates (see `DATE_KEYS`) are parsed into UTC epoch times (in seconds, `int64`) and
+      UTC offsets (in minutes, `int16`); the few dates which are not formatted as
+      `YYYY-MM-DD HH:MM:SS +HHMM` (or are missing) are kept as they are
+
+    The raw attributes of the records can be read back as they were (see `rows`), so
+    the store can replace the elements of the export.xml file once they are read.
+    """
+
+    METADATA = RecordBatch.METADATA
+
+    def __init__(self, flag: str) -> None:
+        """
+        Initialize an empty RecordStore for the given flag.
+
+        Args:
+            flag (str): Flag of the records (e.g. `"HKQuantityTypeIdentifierHeartRate"`)
+        """
+        self.flag = flag
+        self.count = 0
+        # Distinct values (in order of their codes) of each string attribute
+        self.vocabularies: dict[str, dict[str, int]] = {}
+        # Codes (of string attributes), or epoch times and offsets (of dates), by chunk
+        self.chunks: dict[str, list[np.ndarray]] = {}
+        # Raw dates which could not be parsed, by attribute and record
+        self.irregular: dict[str, dict[int, str | None]] = {}
+        # Records appended since the last chunk was encoded
+        self._attribs: list[dict[str, str]] = []
+        self._metadata: list[str | None] = []
+        self._encoded = 0
+
+    @classmethod
+    def from_batch(cls, batch: RecordBatch) -> "RecordStore":
+        """
+        Build a store from a batch of records.
+
+        Args:
+            batch (RecordBatch): Batch of the records
+
+        Returns:
+            RecordStore: Store of the records
+        """
+        store = cls(batch.flag)
+        store.extend(batch)
+        return store
+
+    def append(self, rec: ET.Element) -> None:
+        """
+        Append a record to the store.
+
+        Args:
+            rec (ET.Element): Record from the export.xml file
+        """
+        # Looking up children is only needed for the (few) records that have some
+        metadata = rec.find("MetadataEntry") if len(rec) else None
+        self.append_row(
+            dict(rec.items()), None if metadata is None else metadata.get("value")
+        )
+
+    def append_row(self, attrib: dict[str, str], metadata: str | None) -> None:
+        """
+        Append the attributes of a record to the store.
+
+        Args:
+            attrib (dict[str, str]): Attributes of the record
+            metadata (str | None): Value of the first `MetadataEntry` of the record
+        """
+        self._attribs.append(attrib)
+        self._metadata.append(metadata)
+        self.count += 1
+        if len(self._attribs) >= CHUNK_SIZE:
+            self.flush()
+
+    def extend(self, batch: RecordBatch) -> None:
+        """
+        Append the records of a batch (of the same flag) to the store.
+
+        Args:
+            batch (RecordBatch): Batch to append
+        """
+        self.flush()
+        self._encode_columns(batch.columns, batch.count)
+        self.count += batch.count
+
+    def flush(self) -> None:
+        """
+        Encode the records appended since the last chunk (e.g. once parsing is done).
+        """
+        if not self._attribs:
+            return
+        attribs, metadata = self._attribs, self._metadata
+        self._attribs, self._metadata = [], []
+        # Building each column at once is much faster than appending record by record
+        keys = dict.fromkeys(attribs[0])
+        keys.update(dict.fromkeys(set().union(*attribs) - keys.keys()))
+        columns = {key: [attrib.get(key) for attrib in attribs] for key in keys}
+        columns[self.METADATA] = metadata
+        self._encode_columns(columns, len(attribs))
+
+    def _encode_columns(self, columns: dict[str, list[str | None]], count: int) -> None:
+        """
+        Encode records, given as columns of raw attributes, and append them to the chunks.
+
+        Args:
+            columns (dict[str, list[str | None]]): Column of each attribute (and of the `METADATA`), with one value per record
+            count (int): Number of records in the columns
+        """
+        if not count:
+            return
+
+        for key in columns:
+            if key not in self.chunks:
+                self._add_key(key)
+
+        for key, chunks in self.chunks.items():
+            values = np.empty(count, dtype=object)
+            values[:] = columns.get(key, [None] * count)
+            if key in DATE_KEYS:
+                utc, offsets, parsed = parse_dates(values)
+                times = utc.astype("datetime64[s]").astype(np.int64)
+                chunks.append(np.rec.fromarrays([times, offsets], names="time,offset"))
+                irregular = self.irregular[key]
+                for n in np.flatnonzero(~parsed):
+                    irregular[self._encoded + int(n)] = values[n]
+            else:
+                chunks.append(self._encode_strings(key, values))
+
+        self._encoded += count
+
+    def _add_key(self, key: str) -> None:
+        """
+        Add an attribute to the store, missing from the records encoded so far.
+
+        Args:
+            key (str): Attribute name (e.g. `"sourceName"`)
+        """
+        if key in DATE_KEYS:
+            self.irregular[key] = dict.fromkeys(range(self._encoded))
+            empty = np.zeros(self._encoded, dtype=np.int64)
+            chunk = np.rec.fromarrays(
+                [empty, empty.astype(np.int16)], names="time,offset"
+            )
+        else:
+            self.vocabularies[key] = {}
+            chunk = np.full(self._encoded, MISSING, dtype=np.int32)
+        self.chunks[key] = [chunk]
+
+    def _encode_strings(self, key: str, values: np.ndarray) -> np.ndarray:
+        """
+        Encode strings with the vocabulary of their attribute, extending it if needed.
+
+        Args:
+            key (str): Attribute name
+            values (np.ndarray): Strings (or None)
+
+        Returns:
+            np.ndarray: Codes of the strings (`int32`)
+        """
+        codes, uniques = pd.factorize(values)
+        vocabulary = self.vocabularies[key]
+        mapping = [vocabulary.setdefault(value, len(vocabulary)) for value in uniques]
+        # Missing values (-1) map to the last code, i.e. MISSING
+        return np.array([*mapping, MISSING], dtype=np.int32)[codes]
+
+    def _get_chunk(self, key: str) -> np.ndarray:
+        """
+        Get the encoded column of an attribute, merging its chunks.
+
+        Args:
+            key (str): Attribute name
+
+        Returns:
+            np.ndarray: Codes (of a string attribute), or epoch times and offsets (of a date)
+        """
+        self.flush()
+        chunks = self.chunks[key]
+        if len(chunks) > 1:
+            chunks[:] = [np.concatenate(chunks)]
+        return chunks[0]
+
+    def get_digest(self) -> str:
+        """
+        Get a digest of the content of the records, which does not depend on their order.
+
+        Each record is hashed from its attributes and metadata value, and the hashes of
+        the records are summed, so the digest of records split in several stores is
+        the sum of their digests (see `add_digests`).
+
+        Returns:
+            str: Digest of the records (64 bits, as hexadecimal)
+        """
+        self.flush()
+        hashes = np.zeros(self.count, dtype=np.uint64)
+        for key in self.chunks:
+            chunk = self._get_chunk(key)
+            if key in DATE_KEYS:
+                missing = np.zeros(self.count, dtype=bool)
+                # Offsets fit in the 16 bits above the epoch times
+                values = _mix(
+                    chunk["time"].astype(np.uint64)
+                    ^ (chunk["offset"].astype(np.uint64) << np.uint64(48))
+                )
+                for n, value in self.irregular[key].items():
+                    if value is None:
+                        missing[n] = True
+                    else:
+                        values[n] = _hash_strings([value])[0]
+            else:
+                missing = chunk == MISSING
+                # Missing values (MISSING) index the last hash
+                values = np.append(_hash_strings(self.vocabularies[key]), np.uint64(0))[
+                    chunk
+                ]
+            # Values of different attributes are hashed apart, and missing ones ignored
+            values = _mix(values ^ _hash_strings([key])[0])
+            values[missing] = 0
+            hashes += values
+        return f"{int(_mix(hashes).sum(dtype=np.uint64)):016x}"
+
+    def take(self, rows: np.ndarray) -> "RecordStore":
+        """
+        Get a store of some of the records, without decoding them.
+
+        The encoded columns are indexed with the positions of the records, and the
+        vocabularies are shared with this store (so they may hold unused values).
+
+        Args:
+            rows (np.ndarray): Positions of the records, in the order to keep them
+
+        Returns:
+            RecordStore: Store of the records
+        """
+        self.flush()
+        rows = np.asarray(rows, dtype=np.int64)
+        store = RecordStore(self.flag)
+        store.count = store._encoded = len(rows)
+        store.vocabularies = self.vocabularies
+        store.chunks = {key: [self._get_chunk(key)[rows]] for key in self.chunks}
+
+        # Positions of the irregular dates in the new store
+        positions = np.full(self.count, -1, dtype=np.int64)
+        positions[rows] = np.arange(len(rows))
+        store.irregular = {
+            key: {
+                int(positions[n]): value
+                for n, value in irregular.items()
+                if positions[n] >= 0
+            }
+            for key, irregular in self.irregular.items()
+        }
+        return store
+
+    def get_strings(self, key: str) -> np.ndarray:
+        """
+        Get the values of a string attribute.
+
+        Args:
+            key (str): Attribute name (e.g. `"sourceName"`, or `METADATA`)
+
+        Returns:
+            np.ndarray: Values (object dtype, None if a record does not have the attribute)
+        """
+        self.flush()
+        if key not in self.vocabularies:
+            return np.full(self.count, None, dtype=object)
+        values = np.empty(len(self.vocabularies[key]) + 1, dtype=object)
+        values[:-1] = list(self.vocabularies[key])
+        return values[self._get_chunk(key)]
+
+    def get_codes(self, key: str) -> tuple[np.ndarray, list[str]]:
+        """
+        Get the codes of a string attribute, and its vocabulary.
+
+        Args:
+            key (str): Attribute name (e.g. `"sourceName"`, or `METADATA`)
+
+        Returns:
+            tuple[np.ndarray, list[str]]: Codes (`MISSING` if a record does not have the attribute) and distinct values
+        """
+        self.flush()
+        if key not in self.vocabularies:
+            return np.full(self.count, MISSING, dtype=np.int32), []
+        return self._get_chunk(key), list(self.vocabularies[key])
+
+    def get_dates(self, key: str) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Get the dates of a date attribute.
+
+        Args:
+            key (str): Attribute name (e.g. `"startDate"`)
+
+        Returns:
+            tuple[np.ndarray, np.ndarray, np.ndarray]: UTC dates (`datetime64[us]`), UTC offsets (in minutes) and mask of the parsed dates
+        """
+        self.flush()
+        if key not in self.irregular:
+            empty = np.zeros(self.count, dtype=np.int64)
+            return (
+                empty.astype("datetime64[us]"),
+                empty.astype(np.int16),
+                np.zeros(self.count, dtype=bool),
+            )
+        chunk = self._get_chunk(key)
+        parsed = np.ones(self.count, dtype=bool)
+        parsed[list(self.irregular[key])] = False
+        utc = chunk["time"].astype("datetime64[s]").astype("datetime64[us]")
+        return utc, chunk["offset"], parsed
+
+    def get_column(self, key: str) -> np.ndarray:
+        """
+        Get the raw values of an attribute, as they were in the export.xml file.
+
+        Args:
+            key (str): Attribute name (e.g. `"startDate"`)
+
+        Returns:
+            np.ndarray: Raw values (object dtype, None if a record does not have the attribute)
+        """
+        if key not in DATE_KEYS:
+            return self.get_strings(key)
+
+        utc, offsets, _ = self.get_dates(key)
+        values = format_dates(utc, offsets).astype(object)
+        for n, value in self.irregular.get(key, {}).items():
+            values[n] = value
+        return values
+
+    def get_row(self, n: int) -> tuple[dict[str, str], str | None]:
+        """
+        Get a record of the store.
+
+        Args:
+            n (int): Position of the record
+
+        Returns:
+            tuple[dict[str, str], str | None]: Attributes and metadata value of the record
+        """
+        return next(self.get_rows([n]))
+
+    def get_rows(
+        self, positions: Iterable[int]
+    ) -> Iterator[tuple[dict[str, str], str | None]]:
+        """
+        Iterate over some records of the store (e.g. the irregular records of a flag).
+
+        The vocabularies are only listed once, and only the values of the given records
+        are decoded, so getting K records does not decode whole columns K times.
+
+        Args:
+            positions (Iterable[int]): Positions of the records
+
+        Yields:
+            tuple[dict[str, str], str | None]: Attributes and metadata value of a record
+        """
+        self.flush()
+        # Codes (or dates) and distinct values of each attribute
+        columns = {
+            key: (self._get_chunk(key), list(self.vocabularies.get(key, ())))
+            for key in self.chunks
+        }
+        for n in positions:
+            attrib: dict[str, str] = {}
+            metadata = None
+            for key, (chunk, values) in columns.items():
+                if key in self.irregular:
+                    if n in self.irregular[key]:
+                        value = self.irregular[key][n]
+                    else:
+                        record = chunk[n : n + 1]
+                        utc = record["time"].astype("datetime64[s]")
+                        value = str(format_dates(utc, record["offset"])[0])
+                else:
+                    code = chunk[n]
+                    value = None if code == MISSING else values[code]
+                if key == self.METADATA:
+                    metadata = value
+                elif value is not None:
+                    attrib[key] = value
+            yield attrib, metadata
+
+    def rows(self) -> Iterator[tuple[dict[str, str], str | None]]:
+        """
+        Iterate over the records of the store.
+
+        Yields:
+            tuple[dict[str, str], str | None]: Attributes and metadata value of a record
+        """
+        metadata = self.get_strings(self.METADATA)
+        keys = [key for key in self.chunks if key != self.METADATA]
+        columns = [self.get_column(key) for key in keys]
+        for n, values in enumerate(zip(*columns)):
+            attrib = {
+                key: value for key, value in zip(keys, values) if value is not None
+            }
+            yield attrib, metadata[n]
+
+    @property
+    def keys(self) -> set[str]:
+        """
+        Attribute names of the records (e.g. `{"sourceName", "unit", ...}`).
+        """
+        self.flush()
+        return {key for key in self.chunks if key != self.METADATA}
+
+    @property
+    def sources(self) -> set[str]:
+        """
+        Distinct sources of the records.
+        """
+        self.flush()
+        return set(self.vocabularies.get("sourceName", {}))
+
+    @property
+    def devices(self) -> set[str]:
+        """
+        Distinct device strings of the records.
+        """
+        self.flush()
+        return set(self.vocabularies.get("device", {}))
+
+    @property
+    def nbytes(self) -> int:
+        """
+        Size of the encoded records (in bytes), without the vocabularies.
+        """
+        self.flush()
+        return sum(chunk.nbytes for chunks in self.chunks.values() for chunk in chunks)
+
+    def __len__(self) -> int:
+        return self.count
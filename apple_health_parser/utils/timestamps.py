@@ -0,0 +1,294 @@
+from datetime import date, datetime, timedelta, timezone
+
+import numpy as np
+import pandas as pd
+
+from apple_health_parser.utils.categories import remove_unused_categories
+
+# Date columns of the records, stored in UTC (`datetime64[ns, UTC]`)
+DATE_COLUMNS = ["creation_date", "start_date", "end_date"]
+# Suffix of the column with the UTC offset (in minutes, `int16`) of each date column
+OFFSET_SUFFIX = "_offset"
+
+# Dates are formatted as `YYYY-MM-DD HH:MM:SS +HHMM` (see `DATE_FORMAT`)
+DATE_LENGTH = 25
+DATE_DIGITS = [0, 1, 2, 3, 5, 6, 8, 9, 11, 12, 14, 15, 17, 18, 21, 22, 23, 24]
+DATE_SEPARATORS = {4: "-", 7: "-", 10: " ", 13: ":", 16: ":", 19: " "}
+
+# Largest UTC offset of a time zone (UTC+14:00), i.e. local times are at most this far
+# from their UTC time
+MAX_OFFSET = pd.Timedelta(hours=14)
+
+
+def get_offset_column(column: str) -> str:
+    """
+    Get the name of the column with the UTC offsets of a date column.
+
+    Args:
+        column (str): Date column (e.g. `"start_date"`)
+
+    Returns:
+        str: Offset column (e.g. `"start_date_offset"`)
+    """
+    return f"{column}{OFFSET_SUFFIX}"
+
+
+def get_local_time(records: pd.DataFrame, column: str = "start_date") -> pd.Series:
+    """
+    Get the local (wall-clock) time of a date column, with the UTC offset of each record.
+
+    For example, `2024-03-31 01:30:00+00:00` with an offset of 120 minutes is
+    `2024-03-31 03:30:00`.
+
+    Args:
+        records (pd.DataFrame): Records, with the date column and its offset column
+        column (str): Date column, defaults to `"start_date"`
+
+    Returns:
+        pd.Series: Local times (`datetime64[ns]`, without timezone)
+    """
+    # Offsets are cast to seconds (a unit of pandas) with NumPy, rather than through
+    # `pd.to_timedelta`, which is much slower on large frames
+    offsets = records[get_offset_column(column)].to_numpy(dtype=np.int64) * 60
+    offsets = offsets.astype("timedelta64[s]")
+    return records[column].dt.tz_convert(None) + offsets
+
+
+def filter_dates(
+    records: pd.DataFrame,
+    start: date | datetime | str | None = None,
+    end: date | datetime | str | None = None,
+    column: str = "start_date",
+) -> pd.DataFrame:
+    """
+    Select the records with a date in `[start, end)`.
+
+    Naive bounds (e.g. `"2024-03-31"` or `date(2024, 3, 31)`) are compared with the local
+    time of the records (see `get_local_time`), and bounds with a timezone with their
+    UTC time.
+
+    Args:
+        records (pd.DataFrame): Records, with the date column and its offset column
+        start (date | datetime | str, optional): Start of the date range, defaults to None
+        end (date | datetime | str, optional): End of the date range (excluded), defaults to None
+        column (str): Date column, defaults to `"start_date"`
+
+    Returns:
+        pd.DataFrame: Records in the date range (all records if no bound is given)
+    """
+    if (start is None and end is None) or records.empty:
+        return records
+
+    mask = np.ones(len(records), dtype=bool)
+    for bound, is_start in ((start, True), (end, False)):
+        if bound is None:
+            continue
+        timestamp = pd.Timestamp(bound)
+        if timestamp.tz is None:
+            times = get_local_time(records, column)
+        else:
+            times = records[column]
+            timestamp = timestamp.tz_convert("UTC")
+        mask &= (times >= timestamp if is_start else times < timestamp).to_numpy()
+
+    return remove_unused_categories(records[mask].reset_index(drop=True))
+
+
+def get_utc_bound(bound: date | datetime | str, sign: int) -> pd.Timestamp:
+    """
+    Get the UTC bound of the start dates of a date range (see `filter_dates`).
+
+    Naive bounds are local times, so the bound is widened by the largest UTC offset
+    (see `MAX_OFFSET`), and the records must then be filtered exactly.
+
+    Args:
+        bound (date | datetime | str): Bound of the date range
+        sign (int): -1 for the start of the range, 1 for its end
+
+    Returns:
+        pd.Timestamp: UTC bound of the start dates
+    """
+    timestamp = pd.Timestamp(bound)
+    if timestamp.tz is None:
+        return timestamp.tz_localize("UTC") + sign * MAX_OFFSET
+    return timestamp.tz_convert("UTC")
+
+
+def get_utc_time(local: pd.Series, offsets: pd.Series) -> pd.Series:
+    """
+    Get the UTC time of local (wall-clock) times, i.e. the inverse of `get_local_time`.
+
+    Args:
+        local (pd.Series): Local times (`datetime64`, without timezone)
+        offsets (pd.Series): UTC offset of each time (in minutes)
+
+    Returns:
+        pd.Series: UTC times (`datetime64[ns, UTC]`)
+    """
+    delta = pd.to_timedelta(offsets.to_numpy(dtype=np.int64), unit="min").to_numpy()
+    return (local - delta).dt.tz_localize("UTC")
+
+
+def split_dates(dates: pd.Series) -> tuple[pd.Series, np.ndarray]:
+    """
+    Split dates with their own UTC offsets into UTC dates and offsets.
+
+    Args:
+        dates (pd.Series): Dates with a timezone, or datetimes with mixed UTC offsets (object dtype)
+
+    Returns:
+        tuple[pd.Series, np.ndarray]: UTC dates (`datetime64[ns, UTC]`), and UTC offsets (in minutes, `int16`)
+    """
+    minute = timedelta(minutes=1)
+    offset = (
+        dates.dt.tz.utcoffset(None)
+        if isinstance(dates.dtype, pd.DatetimeTZDtype)
+        else None
+    )
+    if offset is not None:
+        offsets = np.full(len(dates), offset // minute, dtype=np.int16)
+    else:
+        # Dates share a few timezones, so each offset is only worked out once
+        tzinfos = [date.tzinfo for date in dates]
+        minutes = {tz: tz.utcoffset(None) // minute for tz in set(tzinfos)}
+        offsets = np.fromiter(map(minutes.__getitem__, tzinfos), dtype=np.int16)
+    utc = pd.to_datetime(dates, utc=True).dt.as_unit("ns")
+    return utc, offsets
+
+
+def normalize_dates(records: pd.DataFrame) -> pd.DataFrame:
+    """
+    Convert the dates of records with their own UTC offsets to UTC and offset columns.
+
+    The offset columns are inserted after the last date column, e.g. `end_date`,
+    `creation_date_offset`, `start_date_offset`, `end_date_offset`, `value`.
+
+    Args:
+        records (pd.DataFrame): Records with dates with their own UTC offsets
+
+    Returns:
+        pd.DataFrame: Records with UTC dates and offset columns
+    """
+    if records.empty:
+        return records
+
+    columns: dict[str, pd.Series | np.ndarray] = {}
+    offsets: dict[str, np.ndarray] = {}
+    for column in records.columns:
+        if column not in DATE_COLUMNS:
+            columns[column] = records[column]
+            continue
+        columns[column], offsets[get_offset_column(column)] = split_dates(
+            records[column]
+        )
+        if len(offsets) == len(DATE_COLUMNS):
+            columns.update(offsets)
+    return pd.DataFrame(columns)
+
+
+def localize_dates(utc: np.ndarray, offsets: np.ndarray) -> pd.Series:
+    """
+    Convert UTC dates to dates with their own UTC offsets.
+
+    With a single offset, the dates have a `datetime64[us, UTC+HH:MM]` dtype, as when
+    pandas builds them from datetimes. With mixed offsets (e.g. across DST changes),
+    the dates are kept as datetimes, in an object column.
+
+    Args:
+        utc (np.ndarray): UTC dates (`datetime64`, without timezone)
+        offsets (np.ndarray): UTC offset of each date (in minutes)
+
+    Returns:
+        pd.Series: Dates with their UTC offsets
+    """
+    unique = np.unique(offsets)
+    if len(unique) == 1:
+        tz = timezone(timedelta(minutes=int(unique[0])))
+        return pd.Series(utc).dt.tz_localize("UTC").dt.tz_convert(tz)
+
+    dates = pd.DatetimeIndex(utc).tz_localize("UTC")
+    result = np.empty(len(utc), dtype=object)
+    for offset in unique:
+        mask = offsets == offset
+        tz = timezone(timedelta(minutes=int(offset)))
+        result[mask] = dates[mask].tz_convert(tz).to_pydatetime()
+    return pd.Series(result, dtype=object)
+
+
+def parse_dates(values: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Parse a column of dates with integer arithmetic on their characters.
+
+    Only dates formatted exactly as `YYYY-MM-DD HH:MM:SS +HHMM` (and valid) are parsed,
+    the others are left to the model of the record.
+
+    Args:
+        values (np.ndarray): Dates as strings (or None)
+
+    Returns:
+        tuple[np.ndarray, np.ndarray, np.ndarray]: UTC dates, UTC offsets (in minutes) and mask of the parsed dates
+    """
+    # One more character than a date, to tell longer strings apart
+    text = np.where(pd.isna(values), "", values).astype(f"U{DATE_LENGTH + 1}")
+    chars = text.view(np.uint32).reshape(len(text), DATE_LENGTH + 1)
+
+    parsed = (chars[:, DATE_LENGTH - 1] != 0) & (chars[:, DATE_LENGTH] == 0)
+    for position, separator in DATE_SEPARATORS.items():
+        parsed &= chars[:, position] == ord(separator)
+    parsed &= (chars[:, 20] == ord("+")) | (chars[:, 20] == ord("-"))
+    # Characters before "0" wrap around to large unsigned integers
+    digits = (chars[:, DATE_DIGITS] - ord("0")).astype(np.int64)
+    parsed &= (digits < 10).all(axis=1)
+    digits[~parsed] = 0
+
+    def number(start: int, length: int) -> np.ndarray:
+        result = np.zeros(len(digits), dtype=np.int64)
+        for n in range(start, start + length):
+            result = result * 10 + digits[:, n]
+        return result
+
+    year, month, day = number(0, 4), number(4, 2), number(6, 2)
+    hour, minute, second = number(8, 2), number(10, 2), number(12, 2)
+    offset_hour, offset_minute = number(14, 2), number(16, 2)
+    parsed &= (year >= 1) & (month >= 1) & (month <= 12) & (day >= 1)
+    parsed &= (hour <= 23) & (minute <= 59) & (second <= 59)
+    parsed &= (offset_hour <= 23) & (offset_minute <= 59)
+
+    months = np.where(parsed, (year - 1970) * 12 + month - 1, 0).astype("datetime64[M]")
+    first = months.astype("datetime64[D]")
+    parsed &= day <= (months + 1).astype("datetime64[D]") - first
+
+    offsets = np.where(chars[:, 20] == ord("-"), -1, 1) * (
+        offset_hour * 60 + offset_minute
+    )
+    seconds = ((day - 1) * 24 + hour) * 3600 + minute * 60 + second - offsets * 60
+    utc = first.astype("datetime64[us]") + seconds * 1_000_000
+
+    return utc, np.where(parsed, offsets, 0).astype(np.int16), parsed
+
+
+def format_dates(utc: np.ndarray, offsets: np.ndarray) -> np.ndarray:
+    """
+    Format UTC dates with their UTC offsets as `YYYY-MM-DD HH:MM:SS +HHMM`, i.e. the
+    inverse of `parse_dates`.
+
+    Args:
+        utc (np.ndarray): UTC dates (`datetime64`, without timezone)
+        offsets (np.ndarray): UTC offset of each date (in minutes)
+
+    Returns:
+        np.ndarray: Dates as strings
+    """
+    minutes = offsets.astype(np.int64)
+    local = utc.astype("datetime64[s]") + minutes.astype("timedelta64[m]")
+    text = np.datetime_as_string(local, unit="s").astype(f"U{DATE_LENGTH}")
+    chars = text.view(np.uint32).reshape(len(text), DATE_LENGTH)
+
+    chars[:, 10] = chars[:, 19] = ord(" ")
+    chars[:, 20] = np.where(minutes < 0, ord("-"), ord("+"))
+    hours, minutes = np.divmod(np.abs(minutes), 60)
+    for position, digit in zip(
+        (21, 22, 23, 24), (hours // 10, hours % 10, minutes // 10, minutes % 10)
+    ):
+        chars[:, position] = ord("0") + digit
+    return text
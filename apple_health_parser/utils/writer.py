@@ -0,0 +1,201 @@
+from collections.abc import Iterator
+from pathlib import Path
+from types import ModuleType
+
+import numpy as np
+import pandas as pd
+
+from apple_health_parser.config.definitions import ExportFormats
+from apple_health_parser.consts import EXPORT_FORMATS
+from apple_health_parser.exceptions import InvalidExportFormat, MissingDependency
+from apple_health_parser.models.parsed import ParsedData
+from apple_health_parser.utils.timestamps import get_local_time
+
+# Number of records per row group (Parquet) or record batch (Arrow IPC / Feather), i.e.
+# the number of records converted at once while writing
+ROW_GROUP_SIZE = 1 << 20
+
+# Compression of the columnar formats
+COMPRESSION = "zstd"
+
+
+def import_pyarrow() -> ModuleType:
+    """
+    Import `pyarrow`, which is only required for the columnar formats.
+
+    Raises:
+        MissingDependency: `pyarrow` is not installed
+
+    Returns:
+        ModuleType: `pyarrow` module
+    """
+    try:
+        import pyarrow
+        import pyarrow.ipc
+        import pyarrow.parquet
+    except ImportError as exc:
+        raise MissingDependency(
+            "pyarrow", "the columnar export formats", extra="arrow"
+        ) from exc
+    return pyarrow
+
+
+def get_export_path(
+    export_dir: str | Path, flag: str, format: str, year: int | None = None
+) -> Path:
+    """
+    Get the path of the file of the records of a flag.
+
+    Records partitioned by year are written in Hive-style directories, which can be read
+    back as a single dataset (e.g. `pyarrow.dataset.dataset(export_dir, partitioning="hive")`):
+
+    ```bash
+    <export_dir>/<flag>.parquet
+    <export_dir>/flag=<flag>/year=<year>/part-0.parquet
+    ```
+
+    Args:
+        export_dir (str | Path): Directory to export the records to
+        flag (str): Flag of the records
+        format (str): Export format (`"csv"`, `"parquet"`, `"feather"` or `"arrow"`)
+        year (int, optional): Year of the partition of the records, defaults to None (i.e. not partitioned)
+
+    Returns:
+        Path: Path of the file
+    """
+    if year is None:
+        return Path(export_dir) / f"{flag}.{format}"
+    return Path(export_dir) / f"flag={flag}" / f"year={year}" / f"part-0.{format}"
+
+
+def iter_slices(
+    records: pd.DataFrame,
+    rows: np.ndarray | None = None,
+    size: int = ROW_GROUP_SIZE,
+) -> Iterator[pd.DataFrame]:
+    """
+    Iterate over consecutive slices of the records (at least one, even if empty).
+
+    Args:
+        records (pd.DataFrame): Records
+        rows (np.ndarray, optional): Positions of the records to slice, defaults to None (i.e. all records)
+        size (int): Number of records per slice, defaults to `ROW_GROUP_SIZE`
+
+    Yields:
+        pd.DataFrame: Slice of the records
+    """
+    n_rows = len(records) if rows is None else len(rows)
+    for start in range(0, max(n_rows, 1), size):
+        if rows is None:
+            yield records.iloc[start : start + size]
+        else:
+            yield records.iloc[rows[start : start + size]]
+
+
+def write_records(
+    records: pd.DataFrame,
+    path: Path,
+    format: str,
+    rows: np.ndarray | None = None,
+    row_group_size: int = ROW_GROUP_SIZE,
+) -> None:
+    """
+    Write records to a file, slice by slice (see `iter_slices`).
+
+    Only a slice of the records is converted at once, so that large flags are never
+    copied as a whole. In the columnar formats, categorical columns are written as
+    dictionary-encoded columns, and the dtypes (e.g. the UTC dates) are restored when
+    the file is read back with pandas.
+
+    Args:
+        records (pd.DataFrame): Records to write
+        path (Path): Path of the file
+        format (str): Export format (`"csv"`, `"parquet"`, `"feather"` or `"arrow"`)
+        rows (np.ndarray, optional): Positions of the records to write, defaults to None (i.e. all records)
+        row_group_size (int): Number of records per row group, defaults to `ROW_GROUP_SIZE`
+
+    Raises:
+        InvalidExportFormat: Export format is not allowed
+        MissingDependency: `pyarrow` is not installed (columnar formats)
+    """
+    # SQLite databases hold all flags (see `RecordDatabase`)
+    if format not in EXPORT_FORMATS or format == ExportFormats.SQLITE:
+        raise InvalidExportFormat(format)
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    slices = iter_slices(records, rows=rows, size=row_group_size)
+
+    if format == ExportFormats.CSV:
+        for n, chunk in enumerate(slices):
+            chunk.to_csv(path, index=False, header=n == 0, mode="w" if n == 0 else "a")
+        return
+
+    pa = import_pyarrow()
+    schema = pa.Schema.from_pandas(records, preserve_index=False)
+    if format == ExportFormats.PARQUET:
+        writer = pa.parquet.ParquetWriter(
+            path, schema, compression=COMPRESSION, use_dictionary=True
+        )
+    else:
+        # Feather (V2) files are Arrow IPC files
+        writer = pa.ipc.new_file(
+            path, schema, options=pa.ipc.IpcWriteOptions(compression=COMPRESSION)
+        )
+    with writer:
+        for chunk in slices:
+            table = pa.Table.from_pandas(chunk, schema=schema, preserve_index=False)
+            writer.write_table(table, row_group_size)
+
+
+def write_parsed_data(
+    data: ParsedData,
+    export_dir: str | Path,
+    format: str = ExportFormats.CSV,
+    partition: bool = False,
+    row_group_size: int = ROW_GROUP_SIZE,
+) -> list[Path]:
+    """
+    Write the records of a flag to one file, or to one file per year (see `get_export_path`).
+
+    The records are partitioned by the local year of their start date.
+
+    Args:
+        data (ParsedData): Parsed data of a flag
+        export_dir (str | Path): Directory to export the records to
+        format (str): Export format (`"csv"`, `"parquet"`, `"feather"` or `"arrow"`), defaults to `"csv"`
+        partition (bool): Whether to partition the records by flag and year, defaults to False
+        row_group_size (int): Number of records per row group, defaults to `ROW_GROUP_SIZE`
+
+    Raises:
+        InvalidExportFormat: Export format is not allowed
+        MissingDependency: `pyarrow` is not installed (columnar formats)
+
+    Returns:
+        list[Path]: Paths of the written files
+    """
+    # SQLite databases hold all flags (see `RecordDatabase`)
+    if format not in EXPORT_FORMATS or format == ExportFormats.SQLITE:
+        raise InvalidExportFormat(format)
+
+    records = data.records
+    if not partition:
+        path = get_export_path(export_dir, data.flag, format)
+        write_records(records, path, format, row_group_size=row_group_size)
+        return [path]
+
+    if records.empty:
+        return []
+
+    years = get_local_time(records).dt.year.to_numpy()
+    paths = []
+    for year in np.unique(years):
+        path = get_export_path(export_dir, data.flag, format, year=int(year))
+        write_records(
+            records,
+            path,
+            format,
+            rows=np.flatnonzero(years == year),
+            row_group_size=row_group_size,
+        )
+        paths.append(path)
+    return paths
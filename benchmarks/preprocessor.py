@@ -0,0 +1,153 @@
+"""
+Benchmark of `Preprocessor.get_dataframe` against its previous implementation.
+
+A synthetic flag is generated (two sources over three years, with mixed UTC offsets),
+and the records of one year and source are preprocessed with each operation, with
+the current `Preprocessor` and with the previous implementation (a Python date per
+record, `apply` reductions and a `pivot` heatmap), which is kept below as a reference.
+Both results are checked to be equal.
+
+```bash
+python benchmarks/preprocessor.py --rows 3000000 --repeat 3
+```
+"""
+
+import time
+from collections.abc import Callable
+
+import click
+import numpy as np
+import pandas as pd
+
+from apple_health_parser.models.parsed import ParsedData
+from apple_health_parser.utils.logging import logger
+from apple_health_parser.utils.preprocessor import Preprocessor
+from apple_health_parser.utils.timestamps import DATE_COLUMNS, get_offset_column
+
+FLAG = "HKQuantityTypeIdentifierHeartRate"
+SOURCES = ["Apple Watch", "iPhone"]
+# Operation and heatmap flag of each run
+RUNS = [(None, False), ("mean", False), ("median", False), ("sum", True)]
+
+
+def make_data(rows: int, seed: int = 0) -> ParsedData:
+    """
+    Generate the parsed data of a synthetic flag, sorted by start date.
+
+    Args:
+        rows (int): Number of records
+        seed (int): Seed of the random generator, defaults to 0
+
+    Returns:
+        ParsedData: Parsed data of the flag
+    """
+    rng = np.random.default_rng(seed)
+    seconds = np.sort(rng.integers(0, 3 * 365 * 86400, rows))
+    dates = pd.DatetimeIndex(
+        np.datetime64("2022-01-01T00:00:00", "s") + seconds.astype("timedelta64[s]")
+    ).tz_localize("UTC")
+    offsets = rng.choice(np.array([60, 120, -300], dtype=np.int16), rows)
+    records = pd.DataFrame(
+        {
+            "source_name": pd.Categorical(rng.choice(SOURCES, rows)),
+            **{column: dates for column in DATE_COLUMNS},
+            **{get_offset_column(column): offsets for column in DATE_COLUMNS},
+            "value": rng.random(rows) * 100,
+        }
+    )
+    return ParsedData(
+        flag=FLAG, sources=SOURCES, devices=[], dates=set(), records=records
+    )
+
+
+def legacy_local_time(records: pd.DataFrame, column: str) -> pd.Series:
+    offsets = records[get_offset_column(column)].to_numpy(dtype=np.int64)
+    return (
+        records[column].dt.tz_convert(None)
+        + pd.to_timedelta(offsets, unit="min").to_numpy()
+    )
+
+
+def legacy_dataframe(
+    data: ParsedData, year: int, source: str, oper: str | None, hmap: bool
+) -> pd.DataFrame:
+    """
+    Previous implementation of `Preprocessor.get_dataframe`, as a reference.
+    """
+    records = data.records.copy(deep=False)
+    records = records[records.source_name == source]
+    for column in DATE_COLUMNS:
+        records[column] = legacy_local_time(records, column)
+    records["date"] = records.start_date.dt.date
+    records = records[records.date.apply(lambda x: x.year == year)]
+    if not oper:
+        return records
+
+    records = (
+        records.groupby("date")["value"]
+        .apply(getattr(pd.Series, oper))
+        .round()
+        .reset_index()
+    )
+    if not hmap:
+        return records
+    records["month"] = records.date.apply(lambda x: x.month)
+    records["day"] = records.date.apply(lambda x: x.day)
+    return records.pivot(index="month", columns="day", values="value")
+
+
+def assert_equal(result: pd.DataFrame, expected: pd.DataFrame, hmap: bool) -> None:
+    if hmap:
+        pd.testing.assert_frame_equal(
+            result, expected, check_index_type=False, check_column_type=False
+        )
+        return
+    # Days were Python dates, they are now `datetime64` keys
+    expected = expected.assign(
+        date=pd.to_datetime(expected.date).astype(result.date.dtype)
+    )
+    pd.testing.assert_frame_equal(result, expected)
+
+
+def best_of(repeat: int, function: Callable[[], pd.DataFrame]) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+@click.command()
+@click.option("--rows", default=3_000_000, help="Number of records of the flag")
+@click.option("--year", default=2023, help="Year of the records to preprocess")
+@click.option("--repeat", default=3, help="Number of timings to keep the best of")
+def main(rows: int, year: int, repeat: int) -> None:
+    """
+    Time the preprocessing of a synthetic flag, before and after vectorization.
+    """
+    # Results are not cached, so that every run computes them
+    Preprocessor.cache = None
+    logger.propagate = False
+    data = make_data(rows)
+    source = SOURCES[0]
+
+    click.echo(f"{rows:,} records, year {year}, source {source!r}")
+    click.echo(f"{'operation':<16} {'before':>8} {'after':>8} {'speedup':>8}")
+    for oper, hmap in RUNS:
+
+        def current() -> pd.DataFrame:
+            return Preprocessor(data, year, source, oper, hmap).get_dataframe()
+
+        def legacy() -> pd.DataFrame:
+            return legacy_dataframe(data, year, source, oper, hmap)
+
+        assert_equal(current(), legacy(), hmap)
+        before = best_of(repeat, legacy)
+        after = best_of(repeat, current)
+        name = f"{oper or 'none (raw)'}{' + heatmap' if hmap else ''}"
+        click.echo(f"{name:<16} {before:>7.2f}s {after:>7.2f}s {before / after:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -22,6 +22,24 @@ def export_file() -> str:
     return "tests/data/export.zip"
 
 
+@pytest.fixture
+def correlation_xml_file(xml_file: Path, tmp_path: Path) -> Path:
+    """
+    XML file fixture with a Correlation element (with nested records) between records.
+    """
+    content = xml_file.read_text()
+    first, rest = content.split("    <Record", 1)[0], content.split("    <Record", 1)[1]
+    correlation = (
+        '    <Correlation type="HKCorrelationTypeIdentifierBloodPressure">\n'
+        + '        <Record type="HKQuantityTypeIdentifierBloodPressureSystolic" />\n'
+        * 50
+        + "    </Correlation>\n"
+    )
+    xml = tmp_path / "export.xml"
+    xml.write_text(first + correlation + "    <Record" + rest)
+    return xml
+
+
 @pytest.fixture
 def root(xml_file: Path) -> ET.Element:
     """
@@ -0,0 +1,299 @@
+from pathlib import Path
+from unittest import mock
+
+import pandas as pd
+import pytest
+from pydantic import TypeAdapter, ValidationError
+
+from apple_health_parser.exceptions import InvalidBuilder, InvalidValidation
+from apple_health_parser.utils.builder import (
+    build_flag,
+    build_model,
+    build_records,
+    construct_models,
+    get_empty_records,
+    get_error_key,
+    validate_models,
+)
+from apple_health_parser.utils.categories import categorize
+from apple_health_parser.utils.parser import Parser
+from apple_health_parser.utils.store import RecordStore
+from apple_health_parser.utils.timestamps import normalize_dates
+
+HEART_RATE = "HKQuantityTypeIdentifierHeartRate"
+SLEEP_ANALYSIS = "HKCategoryTypeIdentifierSleepAnalysis"
+
+
+def _make_store(flag: str, rows: list[tuple[dict, str | None]]) -> RecordStore:
+    store = RecordStore(flag)
+    for attrib, metadata in rows:
+        store.append_row(attrib, metadata)
+    return store
+
+
+def _build_from_models(flag: str, store: RecordStore) -> tuple:
+    models, failed = [], {}
+    for attrib, metadata in store.rows():
+        try:
+            models.append(build_model(flag, attrib, metadata))
+        except ValidationError as exc:
+            failed[get_error_key(exc)] = failed.get(get_error_key(exc), 0) + 1
+    records = categorize(
+        normalize_dates(pd.DataFrame([model.model_dump() for model in models]))
+    )
+    return records, {model.start_date.date() for model in models}, failed
+
+
+def _record(start: str, end: str, value: str, **attrib: str) -> dict:
+    return {
+        "type": "flag",
+        "sourceName": "Watch",
+        "creationDate": end,
+        "startDate": start,
+        "endDate": end,
+        "value": value,
+        **attrib,
+    }
+
+
+ROWS = [
+    (
+        "HKQuantityTypeIdentifierStepCount",
+        [
+            (
+                _record(
+                    "2024-03-31 01:30:00 +0100",
+                    "2024-03-31 03:30:00 +0200",
+                    "12",
+                    unit="count",
+                ),
+                None,
+            ),
+            (
+                _record(
+                    "2024-03-31 04:00:00 +0200",
+                    "2024-03-31 04:10:00 +0200",
+                    "1e3",
+                    sourceVersion="17.1",
+                ),
+                None,
+            ),
+            (
+                _record("2024-03-31 05:00:00 +0200", "2024-03-31 05:10:00", "5"),
+                None,
+            ),
+            (
+                _record(
+                    "2024-03-31 06:00:00 +0200",
+                    "2024-03-31 06:10:00 +0200",
+                    "none",
+                ),
+                None,
+            ),
+        ],
+    ),
+    (
+        HEART_RATE,
+        [
+            (
+                _record(
+                    "2024-01-01 10:00:00 +0000",
+                    "2024-01-01 10:00:00 +0000",
+                    "60",
+                    device="<<HKDevice>>",
+                ),
+                "1",
+            ),
+            (
+                _record(
+                    "2024-01-01 10:01:00 +0000",
+                    "2024-01-01 10:01:00 +0000",
+                    "61",
+                    device="<<HKDevice>>",
+                ),
+                None,
+            ),
+            (
+                _record(
+                    "2024-01-01 10:02:00 +0000",
+                    "2024-01-01 10:02:00 +0000",
+                    "62",
+                ),
+                "2",
+            ),
+            (
+                _record(
+                    "2024-01-01 10:03:00 +0000",
+                    "2024-01-01 10:03:00 +0000",
+                    "63",
+                    device="<<HKDevice>>",
+                ),
+                "3",
+            ),
+        ],
+    ),
+    (
+        SLEEP_ANALYSIS,
+        [
+            (
+                _record(
+                    "2024-01-01 23:00:00 +0100",
+                    "2024-01-02 07:00:00 +0100",
+                    "HKCategoryValueSleepAnalysisInBed",
+                ),
+                "Europe/Paris",
+            ),
+            (
+                _record(
+                    "2024-01-02 07:00:00 +0100",
+                    "2024-01-02 07:10:00 +0100",
+                    "HKCategoryValueSleepAnalysisAwake",
+                ),
+                None,
+            ),
+        ],
+    ),
+]
+
+
+class TestBuilder:
+    @pytest.mark.parametrize("flag, rows", ROWS)
+    def test_build_records_matches_models(
+        self, flag: str, rows: list[tuple[dict, str | None]]
+    ) -> None:
+        store = _make_store(flag, rows)
+        expected, expected_dates, expected_failed = _build_from_models(flag, store)
+
+        with mock.patch.object(
+            RecordStore, "get_rows", autospec=True, side_effect=RecordStore.get_rows
+        ) as mock_get_rows:
+            records, dates, failed = build_records(flag, store)
+
+        pd.testing.assert_frame_equal(records, expected)
+        assert dates == expected_dates
+        assert failed == expected_failed
+        assert failed
+        # Irregular records are decoded together, not one store lookup each
+        mock_get_rows.assert_called_once()
+
+    @pytest.mark.parametrize("flag, rows", ROWS)
+    def test_validate_models(
+        self, flag: str, rows: list[tuple[dict, str | None]]
+    ) -> None:
+        store = _make_store(flag, rows)
+        expected, _, expected_failed = _build_from_models(flag, store)
+
+        with mock.patch.object(
+            TypeAdapter,
+            "validate_python",
+            autospec=True,
+            side_effect=TypeAdapter.validate_python,
+        ) as mock_validate:
+            models, failed = validate_models(flag, store.rows())
+
+        pd.testing.assert_frame_equal(
+            categorize(
+                normalize_dates(pd.DataFrame([model.model_dump() for model in models]))
+            ),
+            expected,
+        )
+        assert failed == expected_failed
+        # Valid records are not validated again when others fail
+        mock_validate.assert_called_once()
+
+    # Sleep records without timezone are counted as missing, not as a type error
+    @pytest.mark.parametrize("flag, rows", ROWS[:2])
+    def test_construct_models(
+        self, flag: str, rows: list[tuple[dict, str | None]]
+    ) -> None:
+        store = _make_store(flag, rows)
+        expected, _, expected_failed = _build_from_models(flag, store)
+
+        models, failed = construct_models(flag, store.rows())
+
+        pd.testing.assert_frame_equal(
+            categorize(
+                normalize_dates(pd.DataFrame([model.model_dump() for model in models]))
+            ),
+            expected,
+        )
+        assert failed == expected_failed
+
+    def test_build_records_irregular(self) -> None:
+        flag = "HKQuantityTypeIdentifierStepCount"
+        # Dates which are not zero-padded are still valid for the models
+        store = _make_store(
+            flag,
+            [
+                (
+                    _record(
+                        "2024-3-31 04:00:00 +0200", "2024-3-31 04:10:00 +0200", "5"
+                    ),
+                    None,
+                )
+            ],
+        )
+
+        assert build_records(flag, store) is None
+
+    def test_build_records_empty(self) -> None:
+        date = "2024-01-01 10:00:00 +0000"
+        store = _make_store(HEART_RATE, [(_record(date, date, "60"), None)])
+
+        records, dates, failed = build_records(HEART_RATE, store)
+
+        assert records.empty
+        assert dates == set()
+        assert failed == {"missing_('device',)": 1}
+
+    @pytest.mark.parametrize("values", [True, False])
+    def test_get_empty_records(self, parser: Parser, values: bool) -> None:
+        for flag in parser.flags:
+            store = parser._get_store(flag)
+            expected, _, _ = build_flag(flag, store)
+
+            records = get_empty_records(
+                flag, store.get_codes("value")[1] if values else None
+            )
+
+            assert records.empty
+            assert records.columns.equals(expected.columns)
+            dtypes = records.dtypes.astype(str)
+            expected_dtypes = expected.dtypes.astype(str)
+            if not values and expected_dtypes["value"] == "int64":
+                # Without values, numbers are floats
+                expected_dtypes["value"] = "float64"
+            assert dtypes.equals(expected_dtypes)
+
+
+class TestParserBuilders:
+    def test_parser_columnar(
+        self, parser: Parser, export_file: str, tmp_path: Path
+    ) -> None:
+        columnar = Parser(
+            export_file=export_file,
+            output_dir=tmp_path / "columnar",
+            builder="columnar",
+        )
+
+        for flag in parser.flags:
+            expected = parser.get_flag_records(flag)
+            result = columnar.get_flag_records(flag)
+            pd.testing.assert_frame_equal(result.records, expected.records)
+            assert result.dates == expected.dates
+
+    def test_parser_invalid_builder(self, export_file: str, tmp_path: Path) -> None:
+        with pytest.raises(InvalidBuilder):
+            Parser(export_file=export_file, output_dir=tmp_path, builder="arrow")
+
+    @pytest.mark.parametrize("validation", ["batch", "none"])
+    def test_parser_validation(self, parser: Parser, validation: str) -> None:
+        for flag in parser.flags:
+            expected = parser.get_flag_records(flag)
+            result = parser.get_flag_records(flag, validation=validation)
+            pd.testing.assert_frame_equal(result.records, expected.records)
+            assert result.dates == expected.dates
+
+    def test_parser_invalid_validation(self, parser: Parser) -> None:
+        with pytest.raises(InvalidValidation):
+            parser.get_flag_records(HEART_RATE, validation="partial")
@@ -0,0 +1,300 @@
+import json
+import os
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from unittest import mock
+from zipfile import ZipFile
+
+import pandas as pd
+import pytest
+
+from apple_health_parser.exceptions import MissingPreviousExport
+from apple_health_parser.models.parsed import ParsedData
+from apple_health_parser.utils.cache import MANIFEST, ParseCache
+from apple_health_parser.utils.parser import Parser
+
+
+@pytest.fixture
+def cache(tmp_path: Path) -> ParseCache:
+    """
+    Parse cache fixture.
+    """
+    return ParseCache(cache_dir=tmp_path / "cache")
+
+
+class TestParseCache:
+    def test_fingerprint(self, export_file: str, xml_file: Path) -> None:
+        key = ParseCache.fingerprint(export_file)
+
+        assert key == ParseCache.fingerprint(Path(export_file))
+        with Parser.open_zip(export_file) as member:
+            assert key == ParseCache.fingerprint(member)
+        assert key != ParseCache.fingerprint(xml_file)
+
+        with mock.patch(
+            "apple_health_parser.utils.cache.get_version", return_value="0.0.0"
+        ):
+            assert key != ParseCache.fingerprint(export_file)
+
+    def test_store_load(self, cache: ParseCache, parser: Parser) -> None:
+        assert cache.load("key", parser.flags[0]) is None
+
+        for flag in parser.flags:
+            parsed = parser.get_flag_records(flag)
+            cache.store("key", parsed)
+            cached = cache.load("key", flag)
+
+            assert cache.has("key", flag)
+            assert cached.sources == parsed.sources
+            assert cached.devices == parsed.devices
+            assert cached.dates == parsed.dates
+            pd.testing.assert_frame_equal(cached.records, parsed.records)
+
+    def test_store_load_mixed_offsets(self, cache: ParseCache) -> None:
+        dates = [
+            datetime(2024, 3, 31, 1, 30, tzinfo=timezone(timedelta(hours=1))),
+            datetime(2024, 3, 31, 3, 30, tzinfo=timezone(timedelta(hours=2))),
+        ]
+        records = pd.DataFrame(
+            {"start_date": dates, "unit": [None, None], "value": ["a", None]}
+        )
+        cache.store(
+            "key",
+            ParsedData(
+                flag="flag", sources=[], devices=[], dates=set(), records=records
+            ),
+        )
+
+        cached = cache.load("key", "flag").records
+        assert cached["start_date"].tolist() == dates
+        assert [d.utcoffset() for d in cached["start_date"]] == [
+            d.utcoffset() for d in dates
+        ]
+        pd.testing.assert_frame_equal(cached, records)
+
+    def test_invalidate(self, cache: ParseCache, parser: Parser) -> None:
+        parsed = parser.get_flag_records(parser.flags[0])
+        cache.store("a", parsed)
+        cache.store("b", parsed)
+
+        cache.invalidate("a")
+        assert cache.get_manifest("a") is None
+        assert cache.has("b", parsed.flag)
+
+        cache.invalidate()
+        assert cache.size == 0
+
+    def test_evict(self, cache: ParseCache, parser: Parser) -> None:
+        parsed = parser.get_flag_records(parser.flags[0])
+        cache.store("a", parsed)
+        cache.max_size = cache.size
+
+        # The least recently used export is evicted, but never the one being stored
+        cache.store("b", parsed)
+        assert cache.get_manifest("a") is None
+        assert cache.has("b", parsed.flag)
+
+        cache.max_size = 0
+        cache.store("c", parsed)
+        assert cache.get_manifest("b") is None
+        assert cache.has("c", parsed.flag)
+
+    def test_manifest_reads(self, cache: ParseCache, parser: Parser) -> None:
+        parsed = parser.get_flag_records(parser.flags[0])
+        cache.store("a", parsed)
+        manifest = cache.cache_dir / "a" / MANIFEST
+        os.utime(manifest, ns=(0, 0))
+
+        # Manifests are only read again when they change, and lookups do not touch them
+        with mock.patch(
+            "apple_health_parser.utils.cache.json.loads", wraps=json.loads
+        ) as mock_loads:
+            for _ in range(3):
+                assert cache.has("a", parsed.flag)
+                assert cache.get_manifest("a") is not None
+        mock_loads.assert_called_once()
+        assert manifest.stat().st_mtime_ns == 0
+
+        # Loading the records marks the export as recently used
+        cache.load("a", parsed.flag)
+        assert manifest.stat().st_mtime_ns > 0
+
+        # Sizes are read from the manifest
+        directory = (
+            cache.cache_dir
+            / "a"
+            / cache.get_manifest("a")["data"][parsed.flag]["directory"]
+        )
+        with mock.patch("apple_health_parser.utils.cache._get_size") as mock_get_size:
+            assert cache.size == sum(f.stat().st_size for f in directory.iterdir())
+        mock_get_size.assert_not_called()
+
+
+class TestParserCache:
+    def test_parser_cache(
+        self, cache: ParseCache, parser: Parser, export_file: str, tmp_path: Path
+    ) -> None:
+        cold = Parser(
+            export_file=export_file, output_dir=tmp_path / "cold", cache=cache
+        )
+        assert not cold.from_cache
+        expected = {flag: cold.get_flag_records(flag) for flag in cold.flags}
+
+        with mock.patch.object(Parser, "_get_records") as mock_get_records:
+            warm = Parser(
+                export_file=export_file, output_dir=tmp_path / "warm", cache=cache
+            )
+            mock_get_records.assert_not_called()
+
+        # Every flag is cached, so the export is neither extracted nor parsed
+        assert warm.from_cache
+        assert warm.xml_file is None
+        assert not (tmp_path / "warm").exists()
+        assert warm.flags == parser.flags
+        assert warm.get_sources() == parser.get_sources()
+        assert warm.get_devices() == parser.get_devices()
+        assert warm._map_record_keys_to_flags() == parser._map_record_keys_to_flags()
+        for flag, parsed in expected.items():
+            pd.testing.assert_frame_equal(
+                warm.get_flag_records(flag).records, parsed.records
+            )
+
+    def test_parser_cache_miss(
+        self, cache: ParseCache, export_file: str, tmp_path: Path
+    ) -> None:
+        flag = "HKQuantityTypeIdentifierHeartRate"
+        Parser(export_file=export_file, cache=cache, flags=[flag], extract=False)
+        parser = Parser(
+            export_file=export_file, cache=cache, flags=[flag], extract=False
+        )
+        # The flag was never requested, so it is not cached yet
+        assert not parser.from_cache
+        parser.get_flag_records(flag)
+
+        parser = Parser(
+            export_file=export_file, cache=cache, flags=[flag], extract=False
+        )
+        assert parser.from_cache
+        assert set(parser.discarded) == set(parser.flags) - {flag}
+
+        # Flags which are not cached are parsed on demand
+        cache.invalidate(parser.cache_key)
+        assert len(parser.get_flag_records(flag).records) == 2
+        assert not parser.from_cache
+
+
+@pytest.fixture
+def previous_export_file(xml_file: Path, tmp_path: Path) -> Path:
+    """
+    Export zip file fixture of an older export, without the last record.
+    """
+    content = xml_file.read_text()
+    content = content.replace("2024-06-01 08:10:05 +0200", "2024-01-01 23:00:00 +0200")
+    # Drop the only record created after the export date (on 2024-01-02)
+    records = content.split("    <Record")
+    content = "    <Record".join(
+        record for record in records if 'creationDate="2024-01-02' not in record
+    )
+    zip_file = tmp_path / "previous.zip"
+    with ZipFile(zip_file, "w") as archive:
+        archive.writestr("apple_health_export/export.xml", content)
+    return zip_file
+
+
+class TestIncrementalIngest:
+    flag = "HKQuantityTypeIdentifierActiveEnergyBurned"
+
+    def _parse_previous(self, cache: ParseCache, export_file: Path) -> str:
+        previous = Parser(export_file=export_file, cache=cache, extract=False)
+        for flag in previous.flags:
+            previous.get_flag_records(flag)
+        return previous.cache_key
+
+    def test_incremental(
+        self,
+        cache: ParseCache,
+        parser: Parser,
+        export_file: str,
+        previous_export_file: Path,
+    ) -> None:
+        previous = self._parse_previous(cache, previous_export_file)
+        assert cache.latest() == previous
+
+        incremental = Parser(
+            export_file=export_file, cache=cache, extract=False, previous=previous
+        )
+        # Only the record created after the previous export date is parsed
+        assert sum(len(rec) for rec in incremental.records.values()) == 1
+        assert len(incremental.records[self.flag]) == 1
+        assert incremental.history[self.flag] == 1
+        assert incremental.flags == parser.flags
+        assert incremental.get_sources() == parser.get_sources()
+        assert incremental.get_devices() == parser.get_devices()
+
+        for flag in parser.flags:
+            expected = parser.get_flag_records(flag)
+            parsed = incremental.get_flag_records(flag)
+            assert parsed.dates == expected.dates
+            pd.testing.assert_frame_equal(parsed.records, expected.records)
+
+        # The newer export is now fully cached, with the digests of all its records
+        assert cache.latest() == incremental.cache_key
+        data = cache.get_manifest(incremental.cache_key)["data"]
+        for flag in parser.flags:
+            assert data[flag]["digest"] == parser._get_store(flag).get_digest()
+        assert Parser(export_file=export_file, cache=cache).from_cache
+
+    def test_incremental_history_changed(
+        self, cache: ParseCache, parser: Parser, export_file: str, tmp_path: Path
+    ) -> None:
+        # The previous export has a heart rate record which was since deleted
+        content = Path("tests/data/export.xml").read_text()
+        heart_rate = content.split("    <Record")[1]
+        content = content.replace(heart_rate, heart_rate + "    <Record" + heart_rate)
+        content = content.replace("2024-06-01 08:10:05", "2024-01-03 00:00:00")
+        previous_export_file = tmp_path / "previous.zip"
+        with ZipFile(previous_export_file, "w") as archive:
+            archive.writestr("apple_health_export/export.xml", content)
+        previous = self._parse_previous(cache, previous_export_file)
+
+        incremental = Parser(
+            export_file=export_file, cache=cache, extract=False, previous=previous
+        )
+        assert incremental.previous_manifest is None
+        assert not incremental.history
+        for flag in parser.flags:
+            pd.testing.assert_frame_equal(
+                incremental.get_flag_records(flag).records,
+                parser.get_flag_records(flag).records,
+            )
+
+    def test_incremental_history_edited(
+        self, cache: ParseCache, parser: Parser, export_file: str, tmp_path: Path
+    ) -> None:
+        # The previous export has the same number of records, but a different value
+        content = Path("tests/data/export.xml").read_text()
+        content = content.replace('value="74"', 'value="80"', 1)
+        content = content.replace("2024-06-01 08:10:05", "2024-01-03 00:00:00")
+        previous_export_file = tmp_path / "previous.zip"
+        with ZipFile(previous_export_file, "w") as archive:
+            archive.writestr("apple_health_export/export.xml", content)
+        previous = self._parse_previous(cache, previous_export_file)
+
+        incremental = Parser(
+            export_file=export_file, cache=cache, extract=False, previous=previous
+        )
+        assert incremental.previous_manifest is None
+        for flag in parser.flags:
+            pd.testing.assert_frame_equal(
+                incremental.get_flag_records(flag).records,
+                parser.get_flag_records(flag).records,
+            )
+
+    def test_incremental_missing_previous(
+        self, cache: ParseCache, export_file: str
+    ) -> None:
+        with pytest.raises(MissingPreviousExport):
+            Parser(export_file=export_file, cache=cache, previous="missing")
+
+        with pytest.raises(MissingPreviousExport):
+            Parser(export_file=export_file, previous="missing")
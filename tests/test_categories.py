@@ -0,0 +1,52 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from apple_health_parser.utils.categories import (
+    CATEGORY_COLUMNS,
+    categorize,
+    encode_categories,
+)
+from apple_health_parser.utils.parser import Parser
+
+
+class TestCategories:
+    @pytest.mark.parametrize(
+        "values",
+        [["Watch", None, "iPhone", "Watch"], [None, None], []],
+    )
+    def test_encode_categories(self, values: list[str | None]) -> None:
+        codes, uniques = pd.factorize(np.array(values, dtype=object))
+        # Unused values of the vocabulary are not kept as categories
+        vocabulary = [*uniques.tolist(), "Unused"]
+
+        categorical = encode_categories(codes.astype(np.int32), vocabulary)
+
+        expected = categorize(pd.DataFrame({"source_name": values}, dtype=object))
+        pd.testing.assert_series_equal(
+            pd.Series(categorical, name="source_name"), expected.source_name
+        )
+
+    def test_encode_categories_mapped(self) -> None:
+        # Codes mapping to the same value share a category, and None is missing
+        categorical = encode_categories(
+            np.array([0, 1, 2, -1], dtype=np.int32), ["Active", "Active", None]
+        )
+
+        assert categorical.categories.tolist() == ["Active"]
+        assert categorical.codes.tolist() == [0, 0, -1, -1]
+
+        # NaN (e.g. from a str column) is missing too
+        categorical = encode_categories(
+            np.array([0, 1, -1], dtype=np.int32), ["Watch", float("nan")]
+        )
+
+        assert categorical.categories.tolist() == ["Watch"]
+        assert categorical.codes.tolist() == [0, -1, -1]
+
+    def test_parser_categories(self, parser: Parser) -> None:
+        for flag in parser.flags:
+            records = parser.get_flag_records(flag).records
+            for column in CATEGORY_COLUMNS:
+                if column in records.columns:
+                    assert isinstance(records[column].dtype, pd.CategoricalDtype)
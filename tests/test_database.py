@@ -0,0 +1,118 @@
+import sqlite3
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+from apple_health_parser.exceptions import InvalidDatabase
+from apple_health_parser.utils.database import DATABASE, RecordDatabase
+from apple_health_parser.utils.parser import Parser
+
+FLAG = "HKQuantityTypeIdentifierHeartRate"
+
+
+@pytest.fixture
+def database(parser: Parser, tmp_path: Path) -> RecordDatabase:
+    parser.export(dir_name=str(tmp_path / "export"), format="sqlite")
+    return RecordDatabase(tmp_path / "export" / DATABASE)
+
+
+class TestRecordDatabase:
+    def test_schema(self, database: RecordDatabase) -> None:
+        with sqlite3.connect(database.path) as connection:
+            tables = {
+                name
+                for (name,) in connection.execute(
+                    "SELECT name FROM sqlite_master WHERE type = 'table'"
+                )
+            }
+            indexes = {
+                name
+                for (name,) in connection.execute(
+                    "SELECT name FROM sqlite_master WHERE type = 'index' "
+                    "AND tbl_name = 'records'"
+                )
+            }
+            motion_contexts = connection.execute(
+                "SELECT DISTINCT key, metadata.value FROM metadata"
+                " JOIN records USING (record_id) WHERE type = ?",
+                (FLAG,),
+            ).fetchall()
+
+        assert {"records", "sources", "devices", "metadata"} <= tables
+        assert indexes == {"records_type_start_date", "records_type_source_id"}
+        assert motion_contexts == [("motion_context", "Unset")]
+
+    def test_load(
+        self, parser: Parser, database: RecordDatabase, tmp_path: Path
+    ) -> None:
+        key = parser._get_export_key()
+
+        assert database.get_manifest(key)["flags"] == {
+            flag: len(parser.records[flag]) for flag in parser.flags
+        }
+        for flag in parser.flags:
+            expected = parser.get_flag_records(flag)
+            loaded = database.load(key, flag)
+
+            assert loaded.sources == expected.sources
+            assert loaded.devices == expected.devices
+            assert loaded.dates == expected.dates
+            pd.testing.assert_frame_equal(loaded.records, expected.records)
+
+        assert database.load("other", FLAG) is None
+        assert database.load(key, "Invalid") is None
+
+    def test_store_replaces(self, parser: Parser, database: RecordDatabase) -> None:
+        key = parser._get_export_key()
+        data = parser.get_flag_records(FLAG)
+
+        database.store(key, data, batch_size=1)
+
+        pd.testing.assert_frame_equal(database.load(key, FLAG).records, data.records)
+
+    def test_other_export(self, parser: Parser, database: RecordDatabase) -> None:
+        database.set_flags("other", {FLAG: 0})
+
+        assert database.get_manifest(parser._get_export_key()) is None
+        assert database.get_manifest("other") == {"flags": {FLAG: 0}, "data": {}}
+        assert not database.has("other", FLAG)
+        with pytest.raises(InvalidDatabase):
+            database.store(parser._get_export_key(), parser.get_flag_records(FLAG))
+
+    @pytest.mark.parametrize(
+        "start, end",
+        [
+            ("2024-01-01", None),
+            (None, "2024-01-01"),
+            ("2024-03-31", "2024-04-01"),
+            (pd.Timestamp("2024-03-31 01:00", tz="UTC"), None),
+        ],
+    )
+    def test_parser_database(
+        self,
+        start: str | None,
+        end: str | None,
+        parser: Parser,
+        database: RecordDatabase,
+        export_file: str,
+        tmp_path: Path,
+    ) -> None:
+        loaded = Parser(
+            export_file=export_file, output_dir=tmp_path / "db", database=database
+        )
+
+        # The export is not parsed when every flag is in the database
+        assert loaded.from_cache
+        assert loaded.flags == parser.flags
+        assert loaded.get_sources() == parser.get_sources()
+        for flag in parser.flags:
+            expected = parser.get_flag_records(flag, start=start, end=end)
+            data = loaded.get_flag_records(flag, start=start, end=end)
+
+            assert data.dates == expected.dates
+            pd.testing.assert_frame_equal(data.records, expected.records)
+
+        # The attributes of the records are not in the database, so they are parsed
+        assert loaded._map_record_keys_to_flags() == parser._map_record_keys_to_flags()
+        assert not loaded.from_cache
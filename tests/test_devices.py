@@ -0,0 +1,133 @@
+from pathlib import Path
+from zipfile import ZipFile
+
+import pandas as pd
+import pytest
+
+from apple_health_parser.utils.database import DATABASE, RecordDatabase
+from apple_health_parser.utils.devices import (
+    DEVICE_COLUMNS,
+    Device,
+    add_device_columns,
+    get_device_table,
+    parse_device,
+)
+from apple_health_parser.utils.parser import Parser
+
+WATCH = (
+    "<<HKDevice: 0x3008d6850>, name:Apple Watch, manufacturer:Apple Inc., "
+    "model:Watch, hardware:Watch6,7, software:10.2>"
+)
+PHONE = (
+    "<<HKDevice: 0x3012772a0>, name:iPhone, manufacturer:Apple Inc., model:iPhone, "
+    "hardware:iPhone14,2, software:17.1, localIdentifier:ABC>"
+)
+# Third-party device, without hardware and software versions
+STRAP = "<<HKDevice: 0x1>, name:Polar H10, manufacturer:Polar Electro Oy>"
+HEART_RATE = "HKQuantityTypeIdentifierHeartRate"
+
+
+@pytest.fixture
+def mixed_export_file(xml_file: Path, tmp_path: Path) -> Path:
+    """
+    Export zip file fixture, with heart rate records from a watch and a chest strap.
+    """
+    content = xml_file.read_text()
+    watch = content[content.index("&lt;&lt;HKDevice") : content.index("10.2&gt;") + 8]
+    strap = STRAP.replace("<", "&lt;").replace(">", "&gt;")
+    # Only the second heart rate record is from the chest strap
+    head, tail = content.split(watch, 1)
+    content = head + watch + tail.replace(watch, strap, 1)
+    zip_file = tmp_path / "mixed.zip"
+    with ZipFile(zip_file, "w") as archive:
+        archive.writestr("apple_health_export/export.xml", content)
+    return zip_file
+
+
+class TestDevices:
+    def test_parse_device(self) -> None:
+        assert parse_device(WATCH) == Device(
+            name="Apple Watch",
+            manufacturer="Apple Inc.",
+            model="Watch",
+            hardware="Watch6,7",
+            software="10.2",
+        )
+        assert parse_device(WATCH).label == "Apple Watch (Watch6,7; 10.2)"
+        assert parse_device(PHONE).label == "iPhone (iPhone14,2; 17.1)"
+
+    def test_parse_device_missing_fields(self) -> None:
+        device = parse_device("<<HKDevice: 0x1>, name:Scale, hardware:1>")
+
+        assert device == Device(name="Scale", hardware="1")
+        assert device.label == "Scale (1)"
+        assert parse_device("<<HKDevice>>") == Device()
+
+    def test_parse_device_memoized(self) -> None:
+        parse_device(WATCH)
+        hits = parse_device.cache_info().hits
+
+        parse_device(WATCH)
+
+        assert parse_device.cache_info().hits == hits + 1
+
+    def test_device_table(self) -> None:
+        devices = pd.Series([PHONE, WATCH, None, PHONE], dtype="category")
+
+        table = get_device_table(devices)
+
+        assert table.index.name == "device_id"
+        assert table.name.tolist() == ["Apple Watch", "iPhone"]
+        # Records reference the table by the codes of the device column
+        assert table.name[devices.cat.codes[0]] == "iPhone"
+
+    def test_add_device_columns(self) -> None:
+        records = pd.DataFrame({"device": [PHONE, WATCH, None], "value": [1, 2, 3]})
+
+        result = add_device_columns(records)
+
+        assert result.columns.tolist() == ["device", *DEVICE_COLUMNS, "value"]
+        assert result.device_name.tolist()[:2] == ["iPhone", "Apple Watch"]
+        assert result.device_name.isna().tolist() == [False, False, True]
+        assert result.device_software.cat.categories.tolist() == ["10.2", "17.1"]
+        pd.testing.assert_frame_equal(add_device_columns(result), result)
+        assert add_device_columns(records.drop(columns="device")).equals(
+            records.drop(columns="device")
+        )
+
+    def test_add_device_columns_mixed(self) -> None:
+        records = pd.DataFrame({"device": [WATCH, STRAP, None]})
+
+        result = add_device_columns(records)
+
+        assert result.device_manufacturer.tolist()[:2] == [
+            "Apple Inc.",
+            "Polar Electro Oy",
+        ]
+        assert result.device_software.isna().tolist() == [False, True, True]
+        assert result.device_software.cat.categories.tolist() == ["10.2"]
+
+    def test_parser_mixed_devices(
+        self, mixed_export_file: Path, tmp_path: Path
+    ) -> None:
+        parser = Parser(export_file=mixed_export_file, output_dir=tmp_path / "export")
+
+        records = parser.get_flag_records(HEART_RATE).records
+
+        assert records.device_name.tolist() == ["Apple Watch", "Polar H10"]
+        assert records.device_hardware.isna().tolist() == [False, True]
+
+        # Records with mixed devices are loaded back from the database
+        parser.export(dir_name=str(tmp_path / "db"), format="sqlite")
+        database = RecordDatabase(tmp_path / "db" / DATABASE)
+        loaded = database.load(parser._get_export_key(), HEART_RATE)
+        pd.testing.assert_frame_equal(loaded.records, records)
+
+    def test_parser_device_columns(self, parser: Parser) -> None:
+        records = parser.get_flag_records("HKQuantityTypeIdentifierHeartRate").records
+
+        assert records.device_name.unique().tolist() == ["Apple Watch"]
+        assert records.device_hardware.unique().tolist() == ["Watch6,7"]
+        assert parser.get_devices("HKQuantityTypeIdentifierHeartRate") == [
+            "Apple Watch (Watch6,7; 10.2)"
+        ]
@@ -0,0 +1,147 @@
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+from unittest import mock
+
+import pandas as pd
+
+from apple_health_parser.utils.index import IndexedRecords, RecordIndex
+from apple_health_parser.utils.loader import Loader
+from apple_health_parser.utils.parser import Parser
+from apple_health_parser.utils.store import RecordStore
+
+
+class TestRecordIndex:
+    def test_build(self, correlation_xml_file: Path) -> None:
+        expected: dict[str, list[dict]] = {}
+        for rec in Loader.read_xml(correlation_xml_file):
+            expected.setdefault(rec.attrib["type"], []).append(dict(rec.attrib))
+
+        index = RecordIndex.build(correlation_xml_file)
+
+        # Records nested in the Correlation element are not top-level records
+        assert index.flags == list(expected.keys())
+        assert index.counts == {flag: len(recs) for flag, recs in expected.items()}
+        for flag, records in expected.items():
+            assert [dict(rec.attrib) for rec in index.read(flag)] == records
+            assert index.get_sources(flag) == sorted(
+                {rec["sourceName"] for rec in records}
+            )
+            assert index.get_devices(flag) == sorted(
+                {rec["device"] for rec in records if "device" in rec}
+            )
+
+        # Children of the records are kept
+        heart_rate = index.read("HKQuantityTypeIdentifierHeartRate")
+        assert heart_rate[0].find("MetadataEntry").attrib["value"] == "0"
+        assert index.read("HKQuantityTypeIdentifierStepCount") == []
+
+    def test_select(self, xml_file: Path) -> None:
+        index = RecordIndex.build(xml_file)
+        flag = "HKQuantityTypeIdentifierActiveEnergyBurned"
+
+        assert len(index.select(flag)) == 2
+        # Start dates are compared in UTC (i.e. 2024-01-02 01:52:27 +0200)
+        assert len(index.select(flag, start=date(2024, 1, 2))) == 0
+        assert len(index.select(flag, start="2024-01-01 23:52:27")) == 1
+        assert len(index.select(flag, end="2024-01-01 23:52:27")) == 1
+        since = datetime(2024, 1, 2, 1, 52, 27, tzinfo=timezone(timedelta(hours=2)))
+        (position,) = index.select(flag, start=since)
+        [rec] = index.iter_records([position])
+        assert rec.attrib["startDate"] == "2024-01-02 01:52:27 +0200"
+
+    def test_get(self, xml_file: Path, tmp_path: Path) -> None:
+        xml = tmp_path / "export.xml"
+        xml.write_bytes(xml_file.read_bytes())
+
+        index = RecordIndex.get(xml)
+        assert RecordIndex.get_path(xml).exists()
+
+        with mock.patch.object(RecordIndex, "build") as mock_build:
+            loaded = RecordIndex.get(xml)
+            mock_build.assert_not_called()
+        assert loaded.flags == index.flags
+        assert (loaded.offsets == index.offsets).all()
+        assert (loaded.start_dates == index.start_dates).all()
+        assert loaded.sources == index.sources
+        assert loaded.devices == index.devices
+        assert (loaded.device_ids == index.device_ids).all()
+
+        # The index is rebuilt when the XML file changes
+        xml.write_bytes(xml_file.read_bytes() + b"\n")
+        assert RecordIndex.load(xml) is None
+
+
+class TestParserIndexed:
+    def test_parser_indexed(
+        self, parser: Parser, export_file: str, tmp_path: Path
+    ) -> None:
+        indexed = Parser(
+            export_file=export_file, output_dir=tmp_path / "indexed", indexed=True
+        )
+
+        assert indexed.flags == parser.flags
+        assert all(isinstance(rec, IndexedRecords) for rec in indexed.records.values())
+        assert RecordIndex.get_path(indexed.xml_file).exists()
+        assert indexed.get_sources() == parser.get_sources()
+        assert indexed.get_devices() == parser.get_devices()
+        for flag in parser.flags:
+            pd.testing.assert_frame_equal(
+                indexed.get_flag_records(flag).records,
+                parser.get_flag_records(flag).records,
+            )
+
+    def test_parser_indexed_flags(self, export_file: str, tmp_path: Path) -> None:
+        flag = "HKQuantityTypeIdentifierHeartRate"
+        indexed = Parser(
+            export_file=export_file,
+            output_dir=tmp_path,
+            indexed=True,
+            flags=[flag],
+        )
+
+        assert list(indexed.records) == [flag]
+        assert indexed.discarded["HKQuantityTypeIdentifierActiveEnergyBurned"] == 2
+        assert len(indexed.get_flag_records(flag).records) == 2
+
+    def test_parser_indexed_date_range(self, export_file: str, tmp_path: Path) -> None:
+        flag = "HKQuantityTypeIdentifierActiveEnergyBurned"
+        since = datetime(2024, 1, 2, 1, 52, 27, tzinfo=timezone(timedelta(hours=2)))
+        indexed = Parser(export_file=export_file, output_dir=tmp_path, indexed=True)
+        expected = indexed.get_flag_records(flag).records
+        indexed = Parser(export_file=export_file, output_dir=tmp_path, indexed=True)
+
+        with mock.patch.object(
+            RecordIndex,
+            "iter_records",
+            autospec=True,
+            side_effect=RecordIndex.iter_records,
+        ) as mock_iter:
+            data = indexed.get_flag_records(flag, start=since)
+
+        # Only the slice of the record in the date range is read
+        assert [len(call.args[1]) for call in mock_iter.call_args_list] == [1]
+        assert len(indexed.records[flag]) == 2
+        pd.testing.assert_frame_equal(
+            data.records, expected[expected.start_date >= since].reset_index(drop=True)
+        )
+
+        # Without any record in the date range, the records keep their columns
+        empty = indexed.get_flag_records(flag, start="2030-01-01")
+        assert empty.records.empty
+        assert list(empty.records.columns) == list(expected.columns)
+
+    def test_indexed_records_store(self, xml_file: Path) -> None:
+        flag = "HKQuantityTypeIdentifierHeartRate"
+        index = RecordIndex.build(xml_file)
+        records = IndexedRecords(index, flag)
+
+        store = records.read_store()
+
+        assert isinstance(store, RecordStore)
+        assert len(store) == len(records) == 2
+        assert [dict(attrib) for attrib, _ in store.rows()] == [
+            dict(rec.attrib) for rec in index.read(flag)
+        ]
+        assert len(records.read_store(limit=1)) == 1
+        # Parsed elements are not kept
+        assert list(vars(records)) == ["index", "flag", "positions"]
@@ -1,11 +1,14 @@
+from io import BytesIO
 from pathlib import Path
 from tempfile import TemporaryDirectory
 from unittest import mock
 from zipfile import ZipFile
 
 import lxml.etree as ET
+import pytest
 
-from apple_health_parser.utils.loader import Loader
+from apple_health_parser.exceptions import MissingExportFile
+from apple_health_parser.utils.loader import Loader, RecordStream, ZipMember
 
 
 def test_extract_zip() -> None:
@@ -25,6 +28,81 @@ def test_extract_zip() -> None:
                 assert result.exists()
 
 
+def _write_export_zip(zip_path: Path, xml: str = "test data") -> None:
+    with ZipFile(zip_path, "w") as zip_file:
+        zip_file.writestr("apple_health_export/export.xml", xml)
+        zip_file.writestr("apple_health_export/export_cda.xml", "cda")
+        zip_file.writestr("apple_health_export/workout-routes/route.gpx", "gpx")
+
+
+def test_extract_zip_only_export_xml(tmp_path: Path) -> None:
+    zip_path = tmp_path / "test.zip"
+    _write_export_zip(zip_path)
+
+    result = Loader.extract_zip(zip_path, tmp_path / "data")
+
+    export_dir = tmp_path / "data/apple_health_export"
+    assert result == (export_dir / "export.xml").resolve()
+    assert sorted(path.name for path in export_dir.iterdir()) == [
+        Loader.EXTRACTION_MANIFEST,
+        "export.xml",
+    ]
+
+    Loader.extract_zip(
+        zip_path, tmp_path / "data", overwrite=True, members=["workout-routes"]
+    )
+
+    assert (export_dir / "workout-routes/route.gpx").read_text() == "gpx"
+    assert not (export_dir / "export_cda.xml").exists()
+
+
+def test_extract_zip_reuses_extraction(tmp_path: Path) -> None:
+    zip_path = tmp_path / "test.zip"
+    _write_export_zip(zip_path)
+    Loader.extract_zip(zip_path, tmp_path, overwrite=True)
+
+    with (
+        mock.patch("apple_health_parser.utils.loader.rmtree") as mock_rmtree,
+        mock.patch.object(ZipFile, "extract") as mock_extract,
+    ):
+        result = Loader.extract_zip(zip_path, tmp_path, overwrite=True)
+        mock_rmtree.assert_not_called()
+        mock_extract.assert_not_called()
+    assert result.read_text() == "test data"
+
+    # A new export (or a modified extraction) is extracted again
+    _write_export_zip(zip_path, xml="new data")
+    assert Loader.extract_zip(zip_path, tmp_path, overwrite=True).read_text() == (
+        "new data"
+    )
+    result.write_text("truncated")
+    assert Loader.extract_zip(zip_path, tmp_path, overwrite=True).read_text() == (
+        "new data"
+    )
+
+
+def test_open_zip(export_file: str, tmp_path: Path) -> None:
+    with open(export_file, "rb") as file:
+        for zip_file in (export_file, Path(export_file), BytesIO(file.read())):
+            with Loader.open_zip(zip_file) as member:
+                assert isinstance(member, ZipMember)
+                assert member.name == "apple_health_export/export.xml"
+                assert len(Loader.read_xml(member)) == 8
+                with pytest.raises(ValueError, match="'rb'"):
+                    member.open("w")
+            assert member.archive.fp is None
+
+    zip_path = tmp_path / "test.zip"
+    with ZipFile(zip_path, "w") as zip_file:
+        zip_file.writestr("apple_health_export/export_cda.xml", "test data")
+
+    with pytest.raises(MissingExportFile):
+        Loader.open_zip(zip_path)
+
+    # Nothing is extracted
+    assert list(tmp_path.iterdir()) == [zip_path]
+
+
 @mock.patch("apple_health_parser.utils.loader.Loader._log_metadata")
 def test_read_xml(mock_log_metadata, xml_file: Path) -> None:
     loader = Loader()
@@ -35,6 +113,39 @@ def test_read_xml(mock_log_metadata, xml_file: Path) -> None:
     assert all(isinstance(item, ET.Element) for item in result)
 
 
+@mock.patch("apple_health_parser.utils.loader.Loader._log_metadata")
+def test_iter_xml(mock_log_metadata, xml_file: Path) -> None:
+    expected = [dict(rec.attrib) for rec in Loader.read_xml(xml_file=xml_file)]
+    mock_log_metadata.reset_mock()
+
+    result = []
+    for rec in Loader.iter_xml(xml_file=xml_file):
+        assert isinstance(rec, ET.Element)
+        result.append(dict(rec.attrib))
+        # Previously consumed records are cleared and detached from the tree
+        assert all(
+            not prev.attrib for prev in rec.itersiblings("Record", preceding=True)
+        )
+
+    mock_log_metadata.assert_called_once()
+    assert result == expected
+
+
+def test_record_stream(xml_file: Path) -> None:
+    flag = "HKQuantityTypeIdentifierHeartRate"
+    stream = RecordStream(xml_file=xml_file, flag=flag)
+    for rec in Loader.iter_xml(xml_file=xml_file, log_metadata=False):
+        if rec.attrib["type"] == flag:
+            stream.add(rec)
+
+    assert len(stream) == 2
+    assert stream.sources == {"Alexandre's Apple Watch"}
+    assert len(stream.devices) == 1
+    # The stream can be iterated several times
+    for _ in range(2):
+        assert [rec.attrib["value"] for rec in stream] == ["74", "75"]
+
+
 @mock.patch("apple_health_parser.utils.logging.logger.info")
 def test_log_metadata(mock_logger_info, xml_file: Path, root: ET.Element) -> None:
     with open(xml_file, "r") as _:
@@ -0,0 +1,91 @@
+from datetime import datetime
+from pathlib import Path
+
+import lxml.etree as ET
+import pytest
+
+from apple_health_parser.utils.cache import ParseCache
+from apple_health_parser.utils.manifest import (
+    FlagManifest,
+    get_elements_manifest,
+    get_records_manifest,
+)
+from apple_health_parser.utils.parser import Parser
+from apple_health_parser.utils.store import RecordStore
+
+HEART_RATE = "HKQuantityTypeIdentifierHeartRate"
+SLEEP = "HKCategoryTypeIdentifierSleepAnalysis"
+
+
+class TestManifest:
+    def test_store_manifest(self, parser: Parser) -> None:
+        assert isinstance(parser.records[HEART_RATE], RecordStore)
+        manifest = parser.get_flag_manifest(HEART_RATE)
+
+        assert manifest.count == 2
+        assert manifest.first == datetime(2024, 1, 1, 1, 1, 36)
+        assert manifest.last == datetime(2024, 1, 1, 1, 1, 37)
+        assert manifest.years == [2024]
+        assert manifest.sources == ["Alexandre's Apple Watch"]
+        assert manifest.units == ["count/min"]
+        assert len(manifest.devices) == 1
+        assert "device" in manifest.keys
+
+    def test_manifest_without_units(self, parser: Parser) -> None:
+        manifest = parser.get_flag_manifest(SLEEP)
+
+        assert manifest.sources == ["Alexandre's Apple Watch", "Alexandre's iPhone"]
+        assert manifest.devices == []
+        assert manifest.units == []
+        assert "unit" not in manifest.keys
+
+    @pytest.mark.parametrize("mode", ["streaming", "indexed"])
+    def test_manifest_modes(
+        self, export_file: str, parser: Parser, tmp_path: Path, mode: str
+    ) -> None:
+        other = Parser(
+            export_file=export_file, output_dir=tmp_path / mode, **{mode: True}
+        )
+
+        for flag in parser.flags:
+            assert other.get_flag_manifest(flag) == parser.get_flag_manifest(flag)
+
+    def test_elements_manifest(self, root: ET.Element) -> None:
+        records = root.findall(f"Record[@type='{SLEEP}']")
+
+        manifest = get_elements_manifest(SLEEP, records)
+
+        assert manifest.count == 2
+        assert manifest.years == [2024]
+        assert get_elements_manifest(SLEEP, []) == FlagManifest(
+            SLEEP, 0, None, None, [], [], [], [], []
+        )
+
+    def test_records_manifest(self, parser: Parser) -> None:
+        data = parser.get_flag_records(HEART_RATE)
+        ingest = parser.get_flag_manifest(HEART_RATE)
+
+        assert data.manifest is data.manifest
+        assert data.manifest.count == ingest.count
+        assert data.manifest.first == ingest.first
+        assert data.manifest.last == ingest.last
+        assert data.manifest.years == ingest.years
+        assert data.manifest.sources == ingest.sources
+        assert data.manifest.units == ingest.units
+        assert data.manifest.keys == data.records.columns.tolist()
+        assert get_records_manifest(SLEEP, data.records.iloc[:0]).count == 0
+
+    def test_manifest_from_cache(self, export_file: str, tmp_path: Path) -> None:
+        cache = ParseCache(tmp_path / "cache")
+        Parser(
+            export_file=export_file, output_dir=tmp_path, cache=cache
+        ).get_flag_records(HEART_RATE)
+        cached = Parser(
+            export_file=export_file,
+            output_dir=tmp_path,
+            cache=cache,
+            flags=[HEART_RATE],
+        )
+
+        assert cached.from_cache
+        assert cached.get_flag_manifest(HEART_RATE).years == [2024]
@@ -1,3 +1,8 @@
+from datetime import datetime
+
+import pytest
+
+from apple_health_parser.models.records import DATE_FORMAT, parse_date
 from apple_health_parser.utils.parser import Parser
 
 
@@ -6,6 +11,30 @@ def test_parsed_data(parser: Parser) -> None:
     parsed = parser.get_flag_records(flag)
 
     assert parsed.flag == flag
-    assert len(parsed.dates) == 2
+    assert len(parsed.dates) == 1
     assert len(parsed.sources) == 1
     assert len(parsed.records) == 2
+
+
+@pytest.mark.parametrize(
+    "value",
+    [
+        "2024-05-29 22:20:35 +0200",
+        "2024-05-29 22:20:35 +0000",
+        "2024-05-29 22:20:35 -0930",
+        "2024-5-29 22:20:35 +0200",
+        "2024-05-29 22:20:35 +0260",
+        "2024-05-29 22:20:60 +0200",
+        "2024-02-30 22:20:35 +0200",
+        "2024-05-29T22:20:35 +0200",
+    ],
+)
+def test_parse_date(value: str) -> None:
+    try:
+        expected = datetime.strptime(value, DATE_FORMAT)
+    except ValueError:
+        with pytest.raises(ValueError):
+            parse_date(value)
+    else:
+        assert parse_date(value) == expected
+        assert parse_date(value).tzinfo == expected.tzinfo
@@ -66,3 +66,12 @@ class TestOverviews:
         fmt = "tiff"
         with pytest.raises(InvalidImageFormat):
             overview.plot(show=False, save=True, format=fmt)
+
+    def test_from_parser(self, parser: Parser, flags: list[str]) -> None:
+        overview = Overview.from_parser(parser, overview_type="activity", year=2024)
+
+        assert list(overview.dataframes) == flags
+        with pytest.raises(InvalidOverviewType):
+            Overview.from_parser(parser, overview_type="fake-overview", year=2024)
+        with pytest.raises(MissingFlag):
+            Overview.from_parser(parser, overview_type="body", year=2024)
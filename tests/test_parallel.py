@@ -0,0 +1,129 @@
+from pathlib import Path
+from unittest import mock
+
+import pandas as pd
+import pytest
+
+from apple_health_parser.utils.batch import RecordBatch
+from apple_health_parser.utils.loader import Loader
+from apple_health_parser.utils.parallel import (
+    build_flags_parallel,
+    get_chunks,
+    parse_chunk,
+    read_xml_parallel,
+)
+from apple_health_parser.utils.parser import Parser
+from apple_health_parser.utils.store import RecordStore
+
+
+class TestParallel:
+    def test_get_chunks(self, correlation_xml_file: Path) -> None:
+        data = correlation_xml_file.read_bytes()
+
+        assert len(get_chunks(correlation_xml_file, n_chunks=8)) == 1
+
+        chunks = get_chunks(correlation_xml_file, n_chunks=8, min_chunk_size=0)
+        assert len(chunks) > 1
+        # Chunks are contiguous and start at top-level records
+        assert all(end == start for (_, end), (start, _) in zip(chunks, chunks[1:]))
+        assert all(data[start:].startswith(b"<Record") for start, _ in chunks)
+        assert data[chunks[-1][1] :].startswith(b"</HealthData>")
+        # No chunk starts in the Correlation element
+        correlation_start = data.find(b"<Correlation")
+        correlation_end = data.find(b"</Correlation>")
+        assert not any(
+            correlation_start < start < correlation_end for start, _ in chunks
+        )
+
+    def test_parse_chunk(self, xml_file: Path) -> None:
+        (start, end), *_ = get_chunks(xml_file, n_chunks=1)
+        batches, discarded = parse_chunk(
+            xml_file, start, end, exclude_flags={"HKQuantityTypeIdentifierHeartRate"}
+        )
+
+        assert discarded == {"HKQuantityTypeIdentifierHeartRate": 2}
+        assert all(isinstance(batch, RecordBatch) for batch in batches.values())
+        assert len(batches["HKQuantityTypeIdentifierActiveEnergyBurned"]) == 2
+
+        sleep = batches["HKCategoryTypeIdentifierSleepAnalysis"]
+        assert [metadata for _, metadata in sleep.rows()] == ["Europe/Amsterdam"] * 2
+        assert "unit" not in sleep.keys
+        assert sleep.devices == set()
+
+    def test_read_xml_parallel(self, correlation_xml_file: Path) -> None:
+        expected: dict[str, list[dict]] = {}
+        for rec in Loader.read_xml(correlation_xml_file):
+            expected.setdefault(rec.attrib["type"], []).append(dict(rec.attrib))
+
+        with mock.patch("apple_health_parser.utils.parallel.MIN_CHUNK_SIZE", 0):
+            batches, discarded = read_xml_parallel(correlation_xml_file, workers=2)
+
+        assert not discarded
+        # Records nested in the Correlation element are not top-level records
+        assert list(batches.keys()) == list(expected.keys())
+        for flag, batch in batches.items():
+            assert [attrib for attrib, _ in batch.rows()] == expected[flag]
+
+    def test_parser_workers(
+        self, parser: Parser, export_file: str, tmp_path: Path
+    ) -> None:
+        with mock.patch("apple_health_parser.utils.parallel.MIN_CHUNK_SIZE", 0):
+            parallel = Parser(
+                export_file=export_file, output_dir=tmp_path / "parallel", workers=2
+            )
+
+        assert parallel.flags == parser.flags
+        assert all(isinstance(rec, RecordStore) for rec in parallel.records.values())
+        assert parallel.get_sources() == parser.get_sources()
+        assert parallel.get_devices() == parser.get_devices()
+        for flag in parser.flags:
+            pd.testing.assert_frame_equal(
+                parallel.get_flag_records(flag).records,
+                parser.get_flag_records(flag).records,
+            )
+
+    def test_build_flags_parallel(self, parser: Parser) -> None:
+        flags = list(parser.flags)
+        stores = {flag: parser._get_store(flag) for flag in flags}
+        # A flag which fails to build does not cancel the other flags
+        stores["Invalid"] = "not a store"  # type: ignore[assignment]
+
+        results = build_flags_parallel(
+            stores, workers=2, builder="models", validation="full"
+        )
+
+        assert list(results.keys()) == [*flags, "Invalid"]
+        assert isinstance(results["Invalid"], AttributeError)
+        for flag in flags:
+            records, dates, failed = results[flag]
+            assert dates == parser.get_flag_records(flag).dates
+            assert not failed
+
+    @pytest.mark.parametrize("builder", ["models", "columnar"])
+    def test_get_flag_records_workers(
+        self, builder: str, export_file: str, tmp_path: Path
+    ) -> None:
+        parser = Parser(export_file=export_file, output_dir=tmp_path, builder=builder)
+        flags = list(reversed(parser.flags))
+
+        with mock.patch("apple_health_parser.utils.logging.logger.error") as error:
+            parallel = parser.get_flag_records([*flags, "Invalid"], workers=2)
+
+        error.assert_called_once_with("Error parsing flag='Invalid'")
+        assert list(parallel.keys()) == flags
+        for flag in flags:
+            serial = parser.get_flag_records(flag)
+            assert parallel[flag].sources == serial.sources
+            assert parallel[flag].devices == serial.devices
+            assert parallel[flag].dates == serial.dates
+            pd.testing.assert_frame_equal(parallel[flag].records, serial.records)
+
+    def test_export_workers(self, parser: Parser, tmp_path: Path) -> None:
+        parser.export(dir_name=str(tmp_path / "serial"))
+        parser.export(dir_name=str(tmp_path / "parallel"), workers=2)
+
+        for flag in parser.flags:
+            filename = f"{flag}.csv"
+            assert (tmp_path / "parallel" / filename).read_text() == (
+                tmp_path / "serial" / filename
+            ).read_text()
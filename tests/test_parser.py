@@ -2,18 +2,21 @@ from datetime import date
 from pathlib import Path
 from unittest import mock
 
-import lxml.etree as ET
 import pandas as pd
 import pytest
 
 from apple_health_parser.exceptions import (
+    DiscardedFlag,
     InvalidFileFormat,
     InvalidFlag,
     MissingRecords,
 )
 from apple_health_parser.models.parsed import ParsedData
 from apple_health_parser.models.records import HealthData, HeartRateData
+from apple_health_parser.utils.index import RecordIndex
+from apple_health_parser.utils.loader import Loader, RecordStream, ZipMember
 from apple_health_parser.utils.parser import Parser
+from apple_health_parser.utils.store import RecordStore
 
 
 class TestParser:
@@ -45,12 +48,200 @@ class TestParser:
 
         assert isinstance(records, dict)
         assert all(flag in records for flag in expected_flags)
-        assert all(
-            isinstance(rec, ET.Element)
-            for rec_list in records.values()
-            for rec in rec_list
+        assert all(isinstance(rec, RecordStore) for rec in records.values())
+
+    @pytest.mark.parametrize(
+        "options, warnings",
+        [
+            ({"lazy": True, "indexed": True}, []),
+            (
+                {"indexed": True, "workers": 4},
+                ["Reading the records with indexed=True, ignoring workers=4..."],
+            ),
+            (
+                {"lazy": True, "engine": "fast"},
+                ['Reading the records with lazy=True, ignoring engine="fast"...'],
+            ),
+            (
+                {"indexed": True, "extract": False},
+                [
+                    "Indexed parsing requires an extracted export.xml file, "
+                    "ignoring indexed=True..."
+                ],
+            ),
+            (
+                {"workers": 4, "extract": False},
+                [
+                    "Parallel parsing requires an extracted export.xml file, "
+                    "ignoring workers=4..."
+                ],
+            ),
+        ],
+    )
+    def test_conflicting_options(
+        self, export_file: str, tmp_path: Path, options: dict, warnings: list[str]
+    ) -> None:
+        with mock.patch(
+            "apple_health_parser.utils.logging.logger.warning"
+        ) as mock_logger_warning:
+            Parser(export_file=export_file, output_dir=tmp_path, **options)
+
+        assert [call.args[0] for call in mock_logger_warning.call_args_list] == warnings
+
+    def test_invalid_workers(self, export_file: str, tmp_path: Path) -> None:
+        with pytest.raises(ValueError, match="at least 1"):
+            Parser(export_file=export_file, output_dir=tmp_path, workers=0)
+
+    def test_no_extract(self, parser: Parser, export_file: str, tmp_path: Path) -> None:
+        with open(export_file, "rb") as file:
+            for unzipped in (
+                Parser(
+                    export_file=export_file, output_dir=tmp_path / "zip", extract=False
+                ),
+                Parser(export_file=file, output_dir=tmp_path / "file"),
+                Parser(export_file=export_file, streaming=True, extract=False),
+            ):
+                assert unzipped.flags == parser.flags
+                for flag in parser.flags:
+                    pd.testing.assert_frame_equal(
+                        unzipped.get_flag_records(flag).records,
+                        parser.get_flag_records(flag).records,
+                    )
+            # The given file object is left open
+            assert not file.closed
+
+        assert not (tmp_path / "zip").exists()
+        assert not (tmp_path / "file").exists()
+
+    def test_no_extract_closed(self, export_file: str) -> None:
+        members: list[ZipMember] = []
+
+        def open_zip(zip_file: str) -> ZipMember:
+            members.append(Loader.open_zip(zip_file))
+            return members[-1]
+
+        with mock.patch.object(Parser, "open_zip", side_effect=open_zip):
+            parser = Parser(export_file=export_file, extract=False)
+
+        # The zip file is closed once the records are read
+        assert len(members) == 1
+        assert members[0].archive.fp is None
+        assert parser.xml_file is None
+
+        # Streamed records keep the zip file open until the parser is closed
+        streamed = Parser(export_file=export_file, streaming=True, extract=False)
+        member = streamed.xml_file
+        assert isinstance(member, ZipMember)
+        assert member.archive.fp is not None
+
+        streamed.close()
+        assert member.archive.fp is None
+        assert streamed.xml_file is None
+
+    def test_streaming(self, parser: Parser, export_file: str, tmp_path: Path) -> None:
+        streamed = Parser(
+            export_file=export_file, output_dir=tmp_path / "stream", streaming=True
+        )
+
+        assert streamed.flags == parser.flags
+        assert all(isinstance(rec, RecordStream) for rec in streamed.records.values())
+        assert streamed.get_sources() == parser.get_sources()
+        assert streamed.get_devices() == parser.get_devices()
+        for flag in parser.flags:
+            pd.testing.assert_frame_equal(
+                streamed.get_flag_records(flag).records,
+                parser.get_flag_records(flag).records,
+            )
+
+    @pytest.mark.parametrize("mode", ["streaming", "lazy", "indexed"])
+    def test_store_memoized(self, export_file: str, tmp_path: Path, mode: str) -> None:
+        flag = "HKQuantityTypeIdentifierHeartRate"
+        other = Parser(export_file=export_file, output_dir=tmp_path, **{mode: True})
+        read = (
+            mock.patch.object(
+                RecordIndex,
+                "iter_records",
+                autospec=True,
+                wraps=RecordIndex.iter_records,
+            )
+            if mode == "indexed"
+            else mock.patch.object(Loader, "iter_xml", wraps=Loader.iter_xml)
+        )
+
+        with read as mock_read:
+            expected = other.get_flag_records(flag).records
+            other.query(flag, start="2024-01-01")
+            other.get_flag_manifest(flag)
+            records = other.get_flag_records(flag, validation="batch").records
+
+        # The records of the flag are only read once, into their store
+        mock_read.assert_called_once()
+        assert isinstance(other.records[flag], RecordStore)
+        pd.testing.assert_frame_equal(records, expected)
+
+    def test_lazy(self, parser: Parser, export_file: str, tmp_path: Path) -> None:
+        flag = "HKQuantityTypeIdentifierHeartRate"
+        lazy = Parser(export_file=export_file, output_dir=tmp_path / "lazy", lazy=True)
+
+        assert lazy.flags == parser.flags
+        assert not lazy.parsed
+        assert lazy.get_sources() == parser.get_sources()
+
+        with mock.patch.object(
+            Parser, "_build_models", wraps=lazy._build_models
+        ) as mock_build_models:
+            parsed = lazy.get_flag_records(flag)
+            assert lazy.get_flag_records(flag) is parsed
+            assert lazy.get_flag_records([flag])[flag] is parsed
+            mock_build_models.assert_called_once_with(flag=flag)
+
+        assert list(lazy.parsed) == [flag]
+        pd.testing.assert_frame_equal(
+            parsed.records, parser.get_flag_records(flag).records
         )
 
+    def test_flag_pushdown(
+        self, parser: Parser, export_file: str, tmp_path: Path
+    ) -> None:
+        heart_rate = "HKQuantityTypeIdentifierHeartRate"
+        active_energy = "HKQuantityTypeIdentifierActiveEnergyBurned"
+
+        for streaming in (False, True):
+            included = Parser(
+                export_file=export_file,
+                output_dir=tmp_path / "included",
+                overwrite=True,
+                streaming=streaming,
+                flags=[heart_rate],
+            )
+            excluded = Parser(
+                export_file=export_file,
+                output_dir=tmp_path / "excluded",
+                overwrite=True,
+                streaming=streaming,
+                exclude_flags=[heart_rate],
+            )
+
+            # Every flag in the export is still listed
+            assert sorted(included.flags) == sorted(parser.flags)
+            assert sorted(excluded.flags) == sorted(parser.flags)
+            assert list(included.records.keys()) == [heart_rate]
+            assert heart_rate not in excluded.records
+            assert included.discarded[active_energy] == 2
+            assert excluded.discarded == {heart_rate: 2}
+
+            pd.testing.assert_frame_equal(
+                included.get_flag_records(heart_rate).records,
+                parser.get_flag_records(heart_rate).records,
+            )
+            assert included.get_sources() == {
+                heart_rate: parser.get_sources(heart_rate)
+            }
+            with pytest.raises(DiscardedFlag):
+                included.get_flag_records(active_energy)
+            with pytest.raises(DiscardedFlag):
+                excluded.get_flag_records(heart_rate)
+
     def test_build_models(self, parser: Parser) -> None:
         heart_rate_models = parser._build_models("HKQuantityTypeIdentifierHeartRate")
         active_energy_models = parser._build_models(
@@ -87,9 +278,8 @@ class TestParser:
             "HKQuantityTypeIdentifierActiveEnergyBurned"
         )
         dates = parser._get_dates(active_energy_models)
-        actual_dates = {method() for method in dates}
 
-        assert actual_dates == {date(2024, 1, 1), date(2024, 1, 2)}
+        assert dates == {date(2024, 1, 1), date(2024, 1, 2)}
 
     def test_map_record_keys_to_flags(self, parser: Parser) -> None:
         flags = [
@@ -113,8 +303,12 @@ class TestParser:
         flag_map = parser._map_record_keys_to_flags()
         # Check if the flags are in the flag_map
         assert sorted(flag_map.keys()) == flags
-        # Check if the record keys are as expected
-        assert all(record_keys == i for i in flag_map.values())
+        # Check if the record keys of each flag are as expected
+        assert flag_map[flags[0]] == record_keys - {"device", "unit"}
+        assert flag_map[flags[1]] == record_keys
+        assert flag_map[flags[2]] == record_keys
+        assert flag_map[flags[3]] == record_keys - {"device"}
+        assert flag_map[flags[4]] == record_keys
 
     def test_get_flag_records(self, parser: Parser) -> None:
         with (
@@ -0,0 +1,111 @@
+from io import BytesIO
+from pathlib import Path
+from unittest import mock
+
+import pandas as pd
+import pytest
+
+from apple_health_parser.utils.loader import Loader
+from apple_health_parser.utils.parser import Parser
+from apple_health_parser.utils.pipeline import DecompressionPipeline
+
+
+class FailingFile(BytesIO):
+    def read(self, size: int | None = -1) -> bytes:
+        raise OSError("Corrupted zip file")
+
+
+class TestDecompressionPipeline:
+    def test_stream(self, xml_file: Path) -> None:
+        content = xml_file.read_bytes()
+        pipeline = DecompressionPipeline(queue_depth=2, buffer_size=100)
+
+        with pipeline.stream(BytesIO(content)) as buffers:
+            result = list(buffers)
+
+        assert b"".join(result) == content
+        assert all(len(buffer) <= 100 for buffer in result)
+        assert pipeline.stats.buffers == len(result)
+        assert pipeline.stats.bytes == len(content)
+        assert pipeline.stats.consumer_stall >= 0
+
+    def test_stream_stops_early(self, xml_file: Path) -> None:
+        pipeline = DecompressionPipeline(queue_depth=1, buffer_size=10)
+
+        with pipeline.stream(BytesIO(xml_file.read_bytes())) as buffers:
+            assert next(buffers)
+
+        # The thread is stopped even though the queue was full
+        assert pipeline.stats.bytes < xml_file.stat().st_size
+
+    def test_stream_error(self) -> None:
+        pipeline = DecompressionPipeline()
+
+        with pytest.raises(OSError, match="Corrupted"):
+            with pipeline.stream(FailingFile()) as buffers:
+                list(buffers)
+
+    def test_read_xml(self, export_file: str) -> None:
+        with Loader.open_zip(export_file) as member:
+            expected = [dict(rec.attrib) for rec in Loader.read_xml(member)]
+            pipeline = DecompressionPipeline(buffer_size=256)
+
+            assert [
+                dict(rec.attrib) for rec in Loader.read_xml(member, pipeline=pipeline)
+            ] == expected
+            assert [
+                dict(rec.attrib) for rec in Loader.iter_xml(member, pipeline=pipeline)
+            ] == expected
+            size = member.archive.getinfo(member.name).file_size
+        assert pipeline.stats.bytes == 2 * size
+
+
+class TestParserPipeline:
+    @pytest.mark.parametrize("flags", [None, ["HKQuantityTypeIdentifierHeartRate"]])
+    def test_parser_pipeline(
+        self, parser: Parser, export_file: str, flags: list[str] | None
+    ) -> None:
+        pipeline = DecompressionPipeline(queue_depth=2, buffer_size=256)
+        piped = Parser(
+            export_file=export_file, extract=False, flags=flags, pipeline=pipeline
+        )
+
+        assert pipeline.stats.buffers > 0
+        for flag in piped.records:
+            pd.testing.assert_frame_equal(
+                piped.get_flag_records(flag).records,
+                parser.get_flag_records(flag).records,
+            )
+
+    @mock.patch("apple_health_parser.utils.logging.logger.warning")
+    def test_parser_fast_engine(
+        self, mock_logger_warning, parser: Parser, export_file: str
+    ) -> None:
+        pipeline = DecompressionPipeline()
+        scanned = Parser(
+            export_file=export_file, extract=False, engine="fast", pipeline=pipeline
+        )
+
+        mock_logger_warning.assert_called_once()
+        assert pipeline.stats.buffers == 0
+        assert set(scanned.records) == set(parser.records)
+
+    @mock.patch("apple_health_parser.utils.logging.logger.warning")
+    def test_parser_streaming_fast_engine(
+        self, mock_logger_warning, parser: Parser, export_file: str
+    ) -> None:
+        pipeline = DecompressionPipeline()
+        streamed = Parser(
+            export_file=export_file,
+            extract=False,
+            streaming=True,
+            engine="fast",
+            pipeline=pipeline,
+        )
+
+        # The records are streamed through the pipeline, the fast engine is ignored
+        mock_logger_warning.assert_called_once_with(
+            'Reading the records with streaming=True, ignoring engine="fast"...'
+        )
+        assert set(streamed.records) == set(parser.records)
+        assert pipeline.stats.buffers > 0
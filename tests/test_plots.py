@@ -57,3 +57,17 @@ class TestPlot:
         fmt = "tiff"
         with pytest.raises(InvalidImageFormat):
             overview.plot(show=False, save=True, format=fmt)
+
+    def test_from_parser(self, parser: Parser) -> None:
+        plot = Plot.from_parser(
+            parser, "HKQuantityTypeIdentifierHeartRate", year=2024, operation="mean"
+        )
+
+        assert isinstance(plot, Plot)
+        assert plot.dataframe.equals(
+            Plot(
+                data=parser.get_flag_records("HKQuantityTypeIdentifierHeartRate"),
+                year=2024,
+                operation="mean",
+            ).dataframe
+        )
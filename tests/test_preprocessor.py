@@ -48,6 +48,8 @@ class TestPreprocessor:
 
         assert isinstance(df, pd.DataFrame)
         assert df.shape == (2, 2)
+        assert pd.api.types.is_datetime64_dtype(df.date)
+        assert df.date.is_monotonic_increasing
 
         heatmap = True
         preprocessor = Preprocessor(data, year, source, operation, heatmap)
@@ -68,3 +70,41 @@ class TestPreprocessor:
         assert heatmap.shape == (1, 2)
         assert heatmap.columns.name == "day"
         assert heatmap.index.name == "month"
+
+    def test_get_heatmap_grid(self) -> None:
+        data = pd.DataFrame(
+            {
+                "date": pd.to_datetime(["2024-01-31", "2024-03-02", "2024-03-31"]),
+                "value": [1, 2, 3],
+            }
+        )
+        heatmap = Preprocessor.get_heatmap(data)
+
+        expected = data.assign(month=data.date.dt.month, day=data.date.dt.day).pivot(
+            index="month", columns="day", values="value"
+        )
+        pd.testing.assert_frame_equal(
+            heatmap, expected, check_index_type=False, check_column_type=False
+        )
+        assert heatmap.loc[3, 2] == 2
+        assert pd.isna(heatmap.loc[1, 2])
+
+        # Integer values keep their dtype when no day is missing
+        assert Preprocessor.get_heatmap(data.iloc[:1]).dtypes.iloc[0] == "int64"
+
+    def test_from_parser(self, parser: Parser) -> None:
+        flag = "HKQuantityTypeIdentifierActiveEnergyBurned"
+        source = "Alexandre's Apple Watch"
+        data = parser.get_flag_records(flag)
+
+        preprocessor = Preprocessor.from_parser(parser, flag, 2024, source, "sum")
+
+        assert len(preprocessor.data.records) == len(data.records)
+        pd.testing.assert_frame_equal(
+            preprocessor.get_dataframe(),
+            Preprocessor(data, 2024, source, "sum").get_dataframe(),
+        )
+        with pytest.raises(MissingYear, match=r"\[2024\]"):
+            Preprocessor.from_parser(parser, flag, 2020)
+        with pytest.raises(InvalidSource):
+            Preprocessor.from_parser(parser, flag, 2024, source="Invalid Source")
@@ -0,0 +1,156 @@
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from unittest import mock
+from zipfile import ZipFile
+
+import pandas as pd
+import pytest
+
+from apple_health_parser.utils.parser import Parser
+from apple_health_parser.utils.query import SortedRecords, filter_sources
+from apple_health_parser.utils.store import RecordStore
+from apple_health_parser.utils.timestamps import filter_dates
+
+HEART_RATE = "HKQuantityTypeIdentifierHeartRate"
+SLEEP = "HKCategoryTypeIdentifierSleepAnalysis"
+WATCH = "Alexandre's Apple Watch"
+UTC_PLUS_2 = timezone(timedelta(hours=2))
+
+
+def _expected(
+    parser: Parser, flag: str, start=None, end=None, sources=None
+) -> pd.DataFrame:
+    records = parser.get_flag_records(flag).records
+    records = filter_sources(filter_dates(records, start, end), sources)
+    return records.sort_values("start_date", kind="stable", ignore_index=True)
+
+
+@pytest.fixture
+def invalid_export_file(xml_file: Path, tmp_path: Path) -> Path:
+    """
+    Export zip file fixture, with an invalid value for the first heart rate record.
+    """
+    content = xml_file.read_text().replace('value="74"', 'value="invalid"', 1)
+    zip_file = tmp_path / "invalid.zip"
+    with ZipFile(zip_file, "w") as archive:
+        archive.writestr("apple_health_export/export.xml", content)
+    return zip_file
+
+
+class TestQuery:
+    def test_sorted_records(self, parser: Parser) -> None:
+        sorted_records = SortedRecords(parser._get_store(SLEEP))
+
+        assert len(sorted_records) == 2
+        assert sorted_records.times.tolist() == sorted(sorted_records.times.tolist())
+        assert len(sorted_records.select()) == 2
+        assert len(sorted_records.select(sources=[WATCH])) == 1
+        assert len(sorted_records.select(sources=["Unknown"])) == 0
+        assert len(sorted_records.select(start="2025-01-01")) == 0
+
+    @pytest.mark.parametrize("builder", ["models", "columnar"])
+    @pytest.mark.parametrize(
+        "start, end, sources",
+        [
+            (None, None, None),
+            ("2024-01-01 01:01:37", None, None),
+            (None, "2024-01-01 03:00", [WATCH]),
+            (datetime(2024, 1, 1, tzinfo=timezone(timedelta(hours=1))), None, None),
+            ("2025-01-01", None, None),
+        ],
+    )
+    def test_query(
+        self, parser: Parser, builder: str, start, end, sources: list[str] | None
+    ) -> None:
+        parser.builder = builder
+        for flag in (HEART_RATE, SLEEP):
+            result = parser.query(flag, start=start, end=end, sources=sources)
+            expected = _expected(parser, flag, start, end, sources)
+
+            if expected.empty:
+                assert result.empty
+            else:
+                pd.testing.assert_frame_equal(result, expected)
+
+        assert HEART_RATE in parser.sorted
+
+    def test_query_columns(self, parser: Parser) -> None:
+        records = parser.query(SLEEP, sources=[WATCH], columns=["start_date", "value"])
+
+        assert records.columns.tolist() == ["start_date", "value"]
+        assert len(records) == 1
+        assert parser.query(
+            SLEEP, start="2025-01-01", columns=["value"]
+        ).columns.tolist() == ["value"]
+
+    def test_query_parsed(self, export_file: str, tmp_path: Path) -> None:
+        lazy = Parser(export_file=export_file, output_dir=tmp_path, lazy=True)
+        lazy.get_flag_records(SLEEP)
+
+        records = lazy.query(SLEEP, end="2024-01-01 02:00")
+
+        assert len(records) == 1
+        assert SLEEP not in lazy.sorted
+
+    @pytest.mark.parametrize("workers", [1, 2])
+    def test_get_flag_records_selected(self, parser: Parser, workers: int) -> None:
+        expected = _expected(parser, SLEEP, start="2024-01-01 01:00", sources=[WATCH])
+
+        with mock.patch.object(
+            RecordStore, "take", autospec=True, side_effect=RecordStore.take
+        ) as mock_take:
+            data = parser.get_flag_records(
+                [SLEEP], workers=workers, start="2024-01-01 01:00", sources=[WATCH]
+            )[SLEEP]
+
+        # Only the selected record is built
+        assert len(mock_take.call_args.args[1]) == 1
+        pd.testing.assert_frame_equal(data.records, expected)
+        assert data.sources == parser.get_sources(SLEEP)
+        assert data.dates == {expected.start_date[0].date()}
+
+    def test_get_flag_records_selected_empty(self, parser: Parser) -> None:
+        data = parser.get_flag_records(HEART_RATE, start="2025-01-01")
+
+        assert data.records.empty
+        assert data.records.columns.equals(
+            parser.get_flag_records(HEART_RATE).records.columns
+        )
+        assert data.dates == set()
+
+    @pytest.mark.parametrize("builder", ["models", "columnar"])
+    @pytest.mark.parametrize(
+        "start, end",
+        [
+            # No record is selected, and the first record of the flag is invalid
+            ("2030-01-01", None),
+            # Only the invalid record is selected
+            (
+                datetime(2024, 1, 1, 1, 1, 36, tzinfo=UTC_PLUS_2),
+                datetime(2024, 1, 1, 1, 1, 37, tzinfo=UTC_PLUS_2),
+            ),
+        ],
+    )
+    def test_get_flag_records_selected_invalid(
+        self, invalid_export_file: Path, tmp_path: Path, builder: str, start, end
+    ) -> None:
+        parser = Parser(
+            export_file=invalid_export_file, output_dir=tmp_path, builder=builder
+        )
+        expected = parser.get_flag_records(HEART_RATE).records
+
+        data = parser.get_flag_records(HEART_RATE, start=start, end=end)
+
+        assert len(expected) == 1
+        assert data.records.empty
+        assert data.records.columns.equals(expected.columns)
+        assert data.records.dtypes.astype(str).equals(expected.dtypes.astype(str))
+
+    def test_get_flag_records_lazy(self, export_file: str, tmp_path: Path) -> None:
+        lazy = Parser(export_file=export_file, output_dir=tmp_path, lazy=True)
+
+        data = lazy.get_flag_records(SLEEP, sources=[WATCH])
+
+        # The whole flag is parsed (and memoized) in lazy mode
+        assert len(data.records) == 1
+        assert len(lazy.parsed[SLEEP].records) == 2
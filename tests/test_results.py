@@ -0,0 +1,146 @@
+import copy
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import pytest
+
+from apple_health_parser.plot.plots import Plot
+from apple_health_parser.utils.parser import Parser
+from apple_health_parser.utils.preprocessor import Preprocessor
+from apple_health_parser.utils.results import ResultCache, ResultCacheStats
+
+FLAG = "HKQuantityTypeIdentifierActiveEnergyBurned"
+SOURCE = "Alexandre's Apple Watch"
+
+
+def _frame(rows: int) -> pd.DataFrame:
+    return pd.DataFrame({"value": range(rows)}, dtype="int64")
+
+
+@pytest.fixture
+def cache(monkeypatch: pytest.MonkeyPatch) -> ResultCache:
+    cache = ResultCache()
+    monkeypatch.setattr(Preprocessor, "cache", cache)
+    return cache
+
+
+class TestResultCache:
+    def test_get_put(self) -> None:
+        cache = ResultCache()
+        frame = _frame(10)
+
+        assert cache.get("a") is None
+        cache.put("a", frame)
+        result = cache.get("a")
+
+        pd.testing.assert_frame_equal(result, frame)
+        assert result is not frame
+        assert "a" in cache
+        assert cache.stats == ResultCacheStats(
+            hits=1,
+            misses=1,
+            evictions=0,
+            entries=1,
+            size=int(frame.memory_usage(deep=True).sum()),
+        )
+
+    def test_results_are_copies(self) -> None:
+        cache = ResultCache()
+        cache.put("a", _frame(3))
+
+        result = cache.get("a")
+        result["value"] = 0
+        result["other"] = 1
+
+        pd.testing.assert_frame_equal(cache.get("a"), _frame(3))
+
+    def test_lru_eviction(self) -> None:
+        size = int(_frame(100).memory_usage(deep=True).sum())
+        cache = ResultCache(max_size=2 * size)
+
+        cache.put("a", _frame(100))
+        cache.put("b", _frame(100))
+        cache.get("a")
+        cache.put("c", _frame(100))
+
+        assert "a" in cache and "c" in cache
+        assert "b" not in cache
+        assert cache.stats.evictions == 1
+        assert cache.stats.size == 2 * size
+
+        # Results larger than the cache are never cached
+        cache.put("d", _frame(1000))
+        assert "d" not in cache
+
+        cache.resize(size)
+        assert len(cache) == 1 and "c" in cache
+
+        cache.clear()
+        assert len(cache) == 0
+        assert cache.stats == ResultCacheStats()
+
+    def test_get_or_compute_threads(self) -> None:
+        cache = ResultCache()
+        cache.put("a", _frame(5))
+
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            results = list(
+                executor.map(
+                    lambda _: cache.get_or_compute("a", lambda: _frame(0)), range(100)
+                )
+            )
+
+        assert all(len(result) == 5 for result in results)
+        assert cache.stats.hits == 100
+
+
+class TestPreprocessorCache:
+    def test_cached_dataframe(self, parser: Parser, cache: ResultCache) -> None:
+        data = parser.get_flag_records(FLAG)
+
+        first = Preprocessor(data, 2024, SOURCE, "sum").get_dataframe()
+        preprocessor = Preprocessor(data, 2024, SOURCE, "sum")
+        second = preprocessor.get_dataframe()
+        # Heatmaps are built from the cached daily values
+        heatmap = Preprocessor(data, 2024, SOURCE, "sum", heatmap=True)
+
+        pd.testing.assert_frame_equal(first, second)
+        pd.testing.assert_frame_equal(preprocessor.records, second)
+        pd.testing.assert_frame_equal(
+            heatmap.get_dataframe(), Preprocessor.get_heatmap(first)
+        )
+        pd.testing.assert_frame_equal(heatmap.records, first)
+        assert cache.stats.hits == 2
+        assert cache.stats.misses == 1
+
+        # Other ParsedData objects (e.g. copies) are cached on their own
+        Preprocessor(copy.copy(data), 2024, SOURCE, "sum").get_dataframe()
+        assert cache.stats.misses == 2
+
+    def test_replaced_records(self, parser: Parser, cache: ResultCache) -> None:
+        data = parser.get_flag_records(FLAG)
+        assert len(Preprocessor(data, 2024).get_dataframe()) == 2
+        assert data.manifest.count == 2
+        fingerprint = data.fingerprint
+
+        data.records = data.records.iloc[:1]
+
+        # Results and the manifest of the previous records are not used anymore
+        assert data.fingerprint != fingerprint
+        assert data.manifest.count == 1
+        assert len(Preprocessor(data, 2024).get_dataframe()) == 1
+
+    def test_shared_between_plots(self, parser: Parser, cache: ResultCache) -> None:
+        data = parser.get_flag_records(FLAG)
+
+        plot = Plot(data, 2024, SOURCE, "sum")
+        other = Plot(data, 2024, SOURCE, "sum", title=True)
+
+        assert cache.stats.hits == 1
+        pd.testing.assert_frame_equal(plot.dataframe, other.dataframe)
+
+    def test_disabled(self, parser: Parser, monkeypatch: pytest.MonkeyPatch) -> None:
+        monkeypatch.setattr(Preprocessor, "cache", None)
+        data = parser.get_flag_records(FLAG)
+
+        assert isinstance(Preprocessor(data, 2024).get_dataframe(), pd.DataFrame)
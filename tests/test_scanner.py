@@ -0,0 +1,132 @@
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+from apple_health_parser.exceptions import InvalidEngine
+from apple_health_parser.utils.batch import RecordBatch
+from apple_health_parser.utils.loader import Loader
+from apple_health_parser.utils.parser import Parser
+from apple_health_parser.utils.scanner import RecordScanner, scan_xml
+from apple_health_parser.utils.store import RecordStore
+
+
+def _read_rows(xml_file: Path) -> dict[str, list[tuple[dict, str | None]]]:
+    rows: dict[str, list[tuple[dict, str | None]]] = {}
+    for rec in Loader.read_xml(xml_file):
+        metadata = rec.find("MetadataEntry")
+        rows.setdefault(rec.attrib["type"], []).append(
+            (
+                dict(rec.attrib),
+                metadata.attrib["value"] if metadata is not None else None,
+            )
+        )
+    return rows
+
+
+@pytest.fixture
+def irregular_xml_file(tmp_path: Path) -> Path:
+    xml = tmp_path / "export.xml"
+    xml.write_text(
+        """<?xml version="1.0" encoding="UTF-8"?>
+<HealthData locale="en_US">
+ <ExportDate value="2024-05-30 20:30:16 +0200"/>
+ <Record type="HKQuantityTypeIdentifierHeartRate" sourceName='Watch' unit="count/min" startDate="2024-01-01 10:00:00 +0200" value="60"/>
+ <Record type="HKQuantityTypeIdentifierHeartRate" sourceName="Tom &amp; Jerry&#39;s Watch" unit="count/min" startDate="2024-01-01 10:01:00 +0200" value="61">
+  <MetadataEntry key="HKMetadataKeyHeartRateMotionContext" value="a &lt; b"/>
+  <MetadataEntry key="HKMetadataKeySyncVersion" value="2"/>
+ </Record>
+ <Record type="HKQuantityTypeIdentifierHeartRate" sourceName="Line
+Break" unit="count/min" startDate="2024-01-01 10:02:00 +0200" value="62"/>
+ <Record type="HKCategoryTypeIdentifierSleepAnalysis" sourceName="Watch" startDate="2024-01-01 23:00:00 +0200" value="HKCategoryValueSleepAnalysisAsleepCore">
+  <!-- comment -->
+  <MetadataEntry key="HKTimeZone" value="Europe/Paris"/>
+ </Record>
+ <Record type="HKCategoryTypeIdentifierSleepAnalysis" sourceName="Watch" startDate="2024-01-02 01:00:00 +0200" value="HKCategoryValueSleepAnalysisAwake">
+  <HeartRateVariabilityMetadataList>
+   <InstantaneousBeatsPerMinute bpm="62" time="1:00:00.00 AM"/>
+  </HeartRateVariabilityMetadataList>
+ </Record>
+ <Record type="HKCategoryTypeIdentifierSleepAnalysis" sourceName="Watch" startDate="2024-01-02 02:00:00 +0200" value="HKCategoryValueSleepAnalysisAsleepREM" ></Record>
+</HealthData>
+"""
+    )
+    return xml
+
+
+class TestScanner:
+    def test_scan(self) -> None:
+        scanner = RecordScanner()
+        attributes = b' type="A" value="1"'
+        metadata = b'\n <MetadataEntry key="k" value="v"/>\n <MetadataEntry key="l" value="w"/>'
+
+        assert scanner.scan(attributes, b"") == (("type", "value"), ("A", "1"), None)
+        assert scanner.scan(attributes, metadata) == (
+            ("type", "value"),
+            ("A", "1"),
+            "v",
+        )
+        assert scanner.scan(b' type="A" value="&lt;1&gt;"', b"")[1] == ("A", "<1>")
+        assert scanner.scan(b" type='A' value=\"1\"", b"") is None
+        assert scanner.scan(b' type="A" value="1\n2"', b"") is None
+        assert scanner.scan(attributes, b"<Other/>") is None
+
+    @pytest.mark.parametrize(
+        "fixture", ["xml_file", "correlation_xml_file", "irregular_xml_file"]
+    )
+    def test_scan_xml_matches_lxml(
+        self, fixture: str, request: pytest.FixtureRequest
+    ) -> None:
+        xml_file = request.getfixturevalue(fixture)
+        expected = _read_rows(xml_file)
+
+        batches, discarded = scan_xml(xml_file)
+
+        assert discarded == {}
+        assert list(batches) == list(expected)
+        for flag, rows in expected.items():
+            assert isinstance(batches[flag], RecordBatch)
+            assert list(batches[flag].rows()) == rows
+
+    def test_scan_xml_flags(self, xml_file: Path) -> None:
+        flag = "HKQuantityTypeIdentifierHeartRate"
+
+        batches, discarded = scan_xml(xml_file, include_flags={flag})
+
+        assert list(batches) == [flag]
+        assert discarded["HKQuantityTypeIdentifierActiveEnergyBurned"] == 2
+
+    def test_scan_xml_zip(self, xml_file: Path, export_file: str) -> None:
+        with Loader.open_zip(export_file) as member:
+            batches, _ = scan_xml(member)
+
+        assert {flag: list(batch.rows()) for flag, batch in batches.items()} == (
+            _read_rows(xml_file)
+        )
+
+
+class TestParserFastEngine:
+    @pytest.mark.parametrize("extract", [True, False])
+    def test_parser_fast(
+        self, parser: Parser, export_file: str, tmp_path: Path, extract: bool
+    ) -> None:
+        fast = Parser(
+            export_file=export_file,
+            output_dir=tmp_path / "fast",
+            extract=extract,
+            engine="fast",
+        )
+
+        assert fast.flags == parser.flags
+        assert all(isinstance(rec, RecordStore) for rec in fast.records.values())
+        assert fast.get_sources() == parser.get_sources()
+        assert fast.get_devices() == parser.get_devices()
+        for flag in parser.flags:
+            pd.testing.assert_frame_equal(
+                fast.get_flag_records(flag).records,
+                parser.get_flag_records(flag).records,
+            )
+
+    def test_parser_invalid_engine(self, export_file: str, tmp_path: Path) -> None:
+        with pytest.raises(InvalidEngine):
+            Parser(export_file=export_file, output_dir=tmp_path, engine="sax")
@@ -44,3 +44,24 @@ class TestSleepPlot:
         fmt = "tiff"
         with pytest.raises(InvalidImageFormat):
             overview.plot(show=False, save=True, format=fmt)
+
+    @pytest.mark.parametrize(
+        "timerange, count",
+        [
+            (None, 2),
+            (("2024-01-01T00:00:00", "2024-01-01T02:00:00"), 1),
+            (("2024-01-01T00:00:00+00:00", "2024-01-01T01:40:23+00:00"), 1),
+        ],
+    )
+    def test_from_parser(
+        self, parser: Parser, timerange: tuple[str, str] | None, count: int
+    ) -> None:
+        records = parser.get_flag_records(flag="HKCategoryTypeIdentifierSleepAnalysis")
+
+        plot = SleepPlot.from_parser(parser, timerange=timerange)
+
+        # Only the records starting within the timerange are built
+        assert len(plot.data.records) == count
+        assert len(plot.dataframe) == len(
+            SleepPlot(data=records, timerange=timerange).dataframe
+        )
@@ -0,0 +1,163 @@
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from apple_health_parser.utils import store as store_module
+from apple_health_parser.utils.batch import RecordBatch
+from apple_health_parser.utils.loader import Loader
+from apple_health_parser.utils.parser import Parser
+from apple_health_parser.utils.store import EMPTY_DIGEST, RecordStore, add_digests
+
+FLAG = "HKQuantityTypeIdentifierStepCount"
+
+ROWS = [
+    (
+        {
+            "type": FLAG,
+            "sourceName": "Watch",
+            "startDate": "2024-03-31 01:30:00 +0100",
+            "endDate": "2024-03-31 03:30:00 +0200",
+            "value": "12",
+        },
+        None,
+    ),
+    (
+        {
+            "type": FLAG,
+            "sourceName": "iPhone",
+            "startDate": "2024-3-31 04:00:00 +0200",
+            "endDate": "2024-03-31 04:10:00 -0330",
+            "value": "5",
+            "device": "<<HKDevice>>",
+        },
+        "1",
+    ),
+    (
+        {
+            "type": FLAG,
+            "sourceName": "Watch",
+            "creationDate": "2024-03-31 05:00:00 +0000",
+            "value": "12",
+        },
+        None,
+    ),
+]
+
+
+def _sort(rows: list[tuple[dict, str | None]]) -> list[tuple[dict, str | None]]:
+    return [(dict(sorted(attrib.items())), metadata) for attrib, metadata in rows]
+
+
+class TestRecordStore:
+    @pytest.mark.parametrize("chunk_size", [1, 2, 1000])
+    def test_rows(self, chunk_size: int, monkeypatch: pytest.MonkeyPatch) -> None:
+        monkeypatch.setattr(store_module, "CHUNK_SIZE", chunk_size)
+        store = RecordStore(FLAG)
+        for attrib, metadata in ROWS:
+            store.append_row(dict(attrib), metadata)
+
+        assert len(store) == 3
+        assert _sort(list(store.rows())) == _sort(ROWS)
+        assert _sort([store.get_row(n) for n in range(3)]) == _sort(ROWS)
+        assert _sort(list(store.get_rows([2, 0]))) == _sort([ROWS[2], ROWS[0]])
+
+    def test_encoding(self) -> None:
+        store = RecordStore(FLAG)
+        for attrib, metadata in ROWS:
+            store.append_row(dict(attrib), metadata)
+
+        assert store.sources == {"Watch", "iPhone"}
+        assert store.devices == {"<<HKDevice>>"}
+        assert store.keys == {
+            "type",
+            "sourceName",
+            "creationDate",
+            "startDate",
+            "endDate",
+            "value",
+            "device",
+        }
+        assert store.vocabularies["value"] == {"12": 0, "5": 1}
+        assert store.get_strings("device").tolist() == [None, "<<HKDevice>>", None]
+
+        utc, offsets, parsed = store.get_dates("endDate")
+        assert parsed.tolist() == [True, True, False]
+        assert offsets[:2].tolist() == [120, -210]
+        assert utc[0] == np.datetime64("2024-03-31T01:30:00")
+        # Dates which are not zero-padded are kept as they are
+        assert store.get_column("startDate")[1] == "2024-3-31 04:00:00 +0200"
+
+    def test_take(self) -> None:
+        store = RecordStore(FLAG)
+        for attrib, metadata in ROWS:
+            store.append_row(dict(attrib), metadata)
+
+        taken = store.take(np.array([2, 1]))
+
+        assert len(taken) == 2
+        assert _sort(list(taken.rows())) == _sort([ROWS[2], ROWS[1]])
+        # Irregular dates follow their records
+        assert taken.irregular["startDate"] == {0: None, 1: "2024-3-31 04:00:00 +0200"}
+        assert len(store.take(np.array([], dtype=np.int64))) == 0
+
+    def test_digest(self) -> None:
+        store = RecordStore(FLAG)
+        for attrib, metadata in ROWS:
+            store.append_row(dict(attrib), metadata)
+        digest = store.get_digest()
+
+        # Digests do not depend on the order of the records, and add up
+        assert store.take(np.array([2, 0, 1])).get_digest() == digest
+        assert (
+            add_digests(
+                store.take(np.array([0])).get_digest(),
+                store.take(np.array([1, 2])).get_digest(),
+            )
+            == digest
+        )
+        assert RecordStore(FLAG).get_digest() == EMPTY_DIGEST
+
+        # Edited values, dates or metadata change the digest
+        for n, key, value in [
+            (0, "value", "13"),
+            (1, "endDate", "2024-03-31 04:10:00 -0300"),
+            (1, "startDate", "2024-03-31 04:00:00 +0200"),
+        ]:
+            edited = RecordStore(FLAG)
+            for m, (attrib, metadata) in enumerate(ROWS):
+                edited.append_row(
+                    {**attrib, key: value} if m == n else attrib, metadata
+                )
+            assert edited.get_digest() != digest
+        edited = RecordStore(FLAG)
+        for attrib, metadata in ROWS:
+            edited.append_row(dict(attrib), None)
+        assert edited.get_digest() != digest
+        # Values swapped between records too
+        swapped = RecordStore(FLAG)
+        for (attrib, metadata), other in zip(ROWS, [ROWS[1], ROWS[0], ROWS[2]]):
+            swapped.append_row({**attrib, "value": other[0]["value"]}, metadata)
+        assert swapped.get_digest() != digest
+
+    def test_from_batch(self, xml_file: Path) -> None:
+        batch = RecordBatch(FLAG)
+        for rec in Loader.read_xml(xml_file):
+            batch.append(rec)
+
+        store = RecordStore.from_batch(batch)
+
+        assert len(store) == len(batch)
+        assert list(store.rows()) == list(batch.rows())
+
+    def test_parser_store(self, parser: Parser, xml_file: Path) -> None:
+        expected: dict[str, list] = {}
+        for rec in Loader.read_xml(xml_file):
+            metadata = rec.find("MetadataEntry")
+            expected.setdefault(rec.get("type"), []).append(
+                (dict(rec.attrib), None if metadata is None else metadata.get("value"))
+            )
+
+        assert all(isinstance(rec, RecordStore) for rec in parser.records.values())
+        for flag, rows in expected.items():
+            assert _sort(list(parser._iter_rows(flag))) == _sort(rows)
@@ -0,0 +1,140 @@
+from datetime import date, datetime, timedelta, timezone
+
+import numpy as np
+import pandas as pd
+
+from apple_health_parser.utils.parser import Parser
+from apple_health_parser.utils.timestamps import (
+    filter_dates,
+    format_dates,
+    get_local_time,
+    get_utc_time,
+    normalize_dates,
+    parse_dates,
+)
+
+
+def _date(hour: int, offset: int) -> datetime:
+    return datetime(2024, 3, 31, hour, 30, tzinfo=timezone(timedelta(hours=offset)))
+
+
+class TestTimestamps:
+    def test_normalize_dates(self) -> None:
+        records = pd.DataFrame(
+            {
+                "creation_date": [_date(4, 2), _date(5, 2)],
+                "start_date": [_date(1, 1), _date(3, 2)],
+                "end_date": [_date(1, 1), _date(4, 2)],
+                "value": [1, 2],
+            }
+        )
+
+        normalized = normalize_dates(records)
+
+        assert normalized.columns.tolist() == [
+            "creation_date",
+            "start_date",
+            "end_date",
+            "creation_date_offset",
+            "start_date_offset",
+            "end_date_offset",
+            "value",
+        ]
+        assert normalized.start_date.dtype == "datetime64[ns, UTC]"
+        assert normalized.start_date_offset.dtype == np.int16
+        assert normalized.start_date_offset.tolist() == [60, 120]
+        assert normalized.creation_date_offset.tolist() == [120, 120]
+        assert normalized.start_date.tolist() == [
+            pd.Timestamp("2024-03-31 00:30", tz="UTC"),
+            pd.Timestamp("2024-03-31 01:30", tz="UTC"),
+        ]
+
+    def test_local_time(self) -> None:
+        records = normalize_dates(
+            pd.DataFrame(
+                {
+                    "creation_date": [_date(1, 1), _date(3, 2)],
+                    "start_date": [_date(1, 1), _date(3, 2)],
+                    "end_date": [_date(1, 1), _date(3, 2)],
+                }
+            )
+        )
+
+        local = get_local_time(records)
+
+        assert local.tolist() == [
+            pd.Timestamp("2024-03-31 01:30"),
+            pd.Timestamp("2024-03-31 03:30"),
+        ]
+        pd.testing.assert_series_equal(
+            get_utc_time(local, records.start_date_offset),
+            records.start_date,
+            check_names=False,
+        )
+
+    def test_filter_dates(self) -> None:
+        records = normalize_dates(
+            pd.DataFrame(
+                {
+                    "creation_date": [_date(1, 1), _date(3, 2), _date(23, -5)],
+                    "start_date": [_date(1, 1), _date(3, 2), _date(23, -5)],
+                    "end_date": [_date(1, 1), _date(3, 2), _date(23, -5)],
+                    "source_name": pd.Categorical(["Watch", "Watch", "iPhone"]),
+                }
+            )
+        )
+
+        assert filter_dates(records) is records
+        # Naive bounds are local times
+        selected = filter_dates(records, start="2024-03-31 02:00", end=date(2024, 4, 1))
+        assert selected.start_date_offset.tolist() == [120, -300]
+        assert selected.index.tolist() == [0, 1]
+        # Bounds with a timezone are compared with the UTC times
+        selected = filter_dates(records, end=pd.Timestamp("2024-03-31 01:00", tz="UTC"))
+        assert selected.start_date_offset.tolist() == [60]
+        assert selected.source_name.cat.categories.tolist() == ["Watch"]
+
+    def test_parse_dates(self) -> None:
+        values = np.array(
+            [
+                "2024-03-31 01:30:00 +0100",
+                "2024-03-31 03:30:00 +0200",
+                "1969-12-31 23:00:00 -0230",
+                "2024-02-30 10:00:00 +0200",
+                "2024-3-31 01:30:00 +0100",
+                "2024-03-31 01:30:00 +0100 ",
+                None,
+            ],
+            dtype=object,
+        )
+
+        utc, offsets, parsed = parse_dates(values)
+
+        assert parsed.tolist() == [True, True, True, False, False, False, False]
+        assert offsets[:3].tolist() == [60, 120, -150]
+        assert utc[:3].tolist() == [
+            pd.Timestamp("2024-03-31 00:30:00").to_pydatetime(),
+            pd.Timestamp("2024-03-31 01:30:00").to_pydatetime(),
+            pd.Timestamp("1970-01-01 01:30:00").to_pydatetime(),
+        ]
+
+    def test_format_dates(self) -> None:
+        values = np.array(
+            [
+                "2024-03-31 01:30:00 +0100",
+                "1969-12-31 23:00:00 -0230",
+                "0999-01-01 00:00:00 +1400",
+            ],
+            dtype=object,
+        )
+
+        utc, offsets, _ = parse_dates(values)
+
+        assert format_dates(utc, offsets).tolist() == values.tolist()
+
+    def test_parser_dates(self, parser: Parser) -> None:
+        records = parser.get_flag_records("HKQuantityTypeIdentifierHeartRate").records
+
+        assert records.start_date.dtype == "datetime64[ns, UTC]"
+        assert records.start_date_offset.dtype == np.int16
+        assert (records.start_date_offset == 120).all()
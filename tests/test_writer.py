@@ -0,0 +1,98 @@
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from apple_health_parser.exceptions import InvalidExportFormat, MissingDependency
+from apple_health_parser.utils.parser import Parser
+from apple_health_parser.utils.writer import (
+    get_export_path,
+    import_pyarrow,
+    iter_slices,
+    write_parsed_data,
+)
+
+FLAG = "HKQuantityTypeIdentifierHeartRate"
+
+
+class TestWriter:
+    def test_get_export_path(self) -> None:
+        assert get_export_path("data", FLAG, "parquet") == Path(f"data/{FLAG}.parquet")
+        assert get_export_path("data", FLAG, "arrow", year=2024) == Path(
+            f"data/flag={FLAG}/year=2024/part-0.arrow"
+        )
+
+    def test_iter_slices(self) -> None:
+        records = pd.DataFrame({"value": range(5)})
+
+        slices = list(iter_slices(records, size=2))
+        assert [chunk.value.tolist() for chunk in slices] == [[0, 1], [2, 3], [4]]
+
+        slices = list(iter_slices(records, rows=np.array([1, 3, 4]), size=2))
+        assert [chunk.value.tolist() for chunk in slices] == [[1, 3], [4]]
+
+        assert len(list(iter_slices(records.iloc[:0]))) == 1
+
+    def test_write_csv(self, parser: Parser, tmp_path: Path) -> None:
+        data = parser.get_flag_records(FLAG)
+
+        [path] = write_parsed_data(data, tmp_path, "csv")
+        parser.write_csv(data, str(tmp_path / "expected.csv"))
+
+        assert path.read_text() == (tmp_path / "expected.csv").read_text()
+        # CSV files are written in row groups too
+        write_parsed_data(data, tmp_path, "csv", row_group_size=1)
+        assert path.read_text() == (tmp_path / "expected.csv").read_text()
+
+    @pytest.mark.parametrize("format", ["parquet", "feather", "arrow"])
+    def test_write_columnar(self, format: str, parser: Parser, tmp_path: Path) -> None:
+        pytest.importorskip("pyarrow")
+        data = parser.get_flag_records(FLAG)
+
+        [path] = write_parsed_data(data, tmp_path, format, row_group_size=1)
+
+        assert path == tmp_path / f"{FLAG}.{format}"
+        read = pd.read_parquet if format == "parquet" else pd.read_feather
+        # Dtypes (e.g. categorical columns and UTC dates) are kept
+        pd.testing.assert_frame_equal(read(path), data.records)
+
+    def test_write_partitioned(self, parser: Parser, tmp_path: Path) -> None:
+        ds = pytest.importorskip("pyarrow.dataset")
+        data = parser.get_flag_records(FLAG)
+
+        export_dir = tmp_path / "export"
+
+        paths = write_parsed_data(data, export_dir, "parquet", partition=True)
+
+        assert paths == [export_dir / f"flag={FLAG}" / "year=2024" / "part-0.parquet"]
+        table = ds.dataset(export_dir, partitioning="hive").to_table()
+        assert table.num_rows == len(data.records)
+        assert set(table.column("flag").to_pylist()) == {FLAG}
+
+    def test_invalid_format(self, parser: Parser, tmp_path: Path) -> None:
+        data = parser.get_flag_records(FLAG)
+
+        with pytest.raises(InvalidExportFormat):
+            write_parsed_data(data, tmp_path, "xlsx")
+        with pytest.raises(InvalidExportFormat):
+            parser.export(dir_name=str(tmp_path), format="xlsx")
+
+    def test_missing_pyarrow(self, parser: Parser, tmp_path: Path) -> None:
+        with mock.patch.dict("sys.modules", {"pyarrow": None}):
+            with pytest.raises(
+                MissingDependency, match=r"apple-health-parser\[arrow\]"
+            ):
+                import_pyarrow()
+            with pytest.raises(MissingDependency):
+                parser.export(dir_name=str(tmp_path), format="parquet")
+
+    def test_export_partitioned(self, parser: Parser, tmp_path: Path) -> None:
+        pytest.importorskip("pyarrow")
+
+        parser.export(dir_name=str(tmp_path), format="feather", partition=True)
+
+        paths = sorted(tmp_path.rglob("*.feather"))
+        assert len(paths) == len(parser.flags)
+        assert all(path.parent.name == "year=2024" for path in paths)